@@ -0,0 +1,128 @@
+import itertools
+import threading
+import weakref
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Evenement
+
+# Durée de conservation : au-delà, un client reconnecté recharge simplement sa page
+RETENTION = getattr(settings, 'PULMOCARE_EVENEMENTS_RETENTION', 3600)
+# Secondes entre deux purges faites par les workers (radiologie_ia.taches.boucle_worker)
+INTERVALLE_PURGE = getattr(settings, 'PULMOCARE_EVENEMENTS_PURGE', 300)
+# Événements lus par le poller à chaque tour (le reste au tour suivant)
+TAILLE_LECTURE = 500
+
+
+# --- 1. PUBLICATION (un INSERT par transaction, après son commit) ---
+# Lots ouverts du thread, par pile de savepoints. Seul le rappel on_commit retient un lot : écarté par
+# un rollback, le lot disparaît avec lui ; validé, il est écrit puis retiré.
+_etat = threading.local()
+
+
+class _Lot:
+    """
+    Événements d'un bloc atomique (transaction ou savepoint). Ceux de même (type, service, cle) sont
+    fusionnés, le dernier l'emporte (ex. les compteurs ajustés dix fois dans un lot ne donnent qu'un événement).
+    """
+
+    def __init__(self, savepoints):
+        self.savepoints = savepoints
+        self.evenements = {}
+        self.rang = itertools.count()
+
+    def ajouter(self, type, donnees, service, cle):
+        self.evenements[(type, service, cle) if cle is not None else next(self.rang)] = (type, donnees, service)
+
+    def ecrire(self):
+        # Écrit une seule fois : un événement publié ensuite ouvre un nouveau lot
+        lots = getattr(_etat, 'lots', {})
+        if lots.get(self.savepoints) is self:
+            del lots[self.savepoints]
+        _inserer(self.evenements.values())
+
+
+def _inserer(evenements):
+    lignes = [
+        Evenement(type=type, donnees=donnees() if callable(donnees) else donnees, service=service)
+        for type, donnees, service in evenements
+    ]
+    if lignes:
+        Evenement.objects.bulk_create(lignes)
+
+
+def _lot_en_cours():
+    """Lot du bloc atomique en cours (None hors transaction) ; un rollback, même partiel, l'annule"""
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        return None
+    if not hasattr(_etat, 'lots'):
+        _etat.lots = weakref.WeakValueDictionary()
+    savepoints = tuple(connexion.savepoint_ids)
+    lot = _etat.lots.get(savepoints)
+    if lot is None:
+        lot = _etat.lots[savepoints] = _Lot(savepoints)
+        # robust : un échec d'écriture est journalisé, il ne fait pas échouer l'écriture déjà validée
+        transaction.on_commit(lot.ecrire, robust=True)
+    return lot
+
+
+def publier(type, donnees, service='', cle=None):
+    """
+    Un événement pour les dashboards du service ('' = tous), écrit après le commit de la transaction
+    en cours avec les autres événements de celle-ci (aussitôt hors transaction).
+    `cle` : événements de même type et même clé fusionnés dans la transaction.
+    `donnees` peut être un callable, évalué à l'écriture (valeurs validées, ex. compteurs).
+    """
+    publier_lot([(type, donnees, service, cle)])
+
+
+def publier_lot(evenements):
+    """[(type, donnees, service[, cle]), ...] : mêmes règles que publier"""
+    lot = _lot_en_cours()
+    if lot is None:
+        _inserer((type, donnees, service) for type, donnees, service, *_ in evenements)
+        return
+    for type, donnees, service, *cle in evenements:
+        lot.ajouter(type, donnees, service, cle[0] if cle else None)
+
+
+# --- 2. LECTURE (poller des flux SSE) ---
+def dernier_id():
+    return Evenement.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def lire_depuis(apres, jusqua=None, service=None, limite=TAILLE_LECTURE):
+    """Événements d'id > `apres` (et <= `jusqua`), par clé primaire croissante"""
+    qs = Evenement.objects.filter(id__gt=apres)
+    if jusqua is not None:
+        qs = qs.filter(id__lte=jusqua)
+    if service is not None:
+        qs = qs.filter(service__in=('', service))
+    return list(qs.order_by('id').values('id', 'type', 'service', 'donnees')[:limite])
+
+
+def rattrapage(apres, jusqua, service):
+    """
+    (événements, complet) manqués par un client reconnecté : id dans ]apres, jusqua].
+    Incomplet si une partie a été purgée, si l'écart dépasse une lecture ou si les id ont recommencé
+    (table vidée) : le client doit alors recharger sa page.
+    """
+    if apres >= jusqua:
+        return [], apres == jusqua
+    premier = Evenement.objects.order_by('id').values_list('id', flat=True).first()
+    if premier is None or apres < premier - 1:
+        return [], False
+    manques = lire_depuis(apres, jusqua, service, limite=TAILLE_LECTURE + 1)
+    if len(manques) > TAILLE_LECTURE:
+        return [], False
+    return manques, True
+
+
+# --- 3. PURGE (workers d'analyse, toutes les INTERVALLE_PURGE secondes ; commande purger_evenements) ---
+def purger(retention=RETENTION):
+    limite = timezone.now() - timedelta(seconds=retention)
+    return Evenement.objects.filter(date_creation__lt=limite).delete()[0]
@@ -0,0 +1,291 @@
+import csv
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from consultation.models import RendezVous
+from core import fragments
+from . import recherche
+from .models import Biomarqueur, Patient, ProfilClinique, Utilisateur
+
+FORMATS = ('csv', 'jsonl')
+VRAI = {'1', 'true', 'vrai', 'oui', 'o', 'yes', 'y', 'x'}
+FAUX = {'', '0', 'false', 'faux', 'non', 'n', 'no'}
+COLONNES_PROFIL = ('tabac_score', 'exposition_toxique', 'antecedents_familiaux')
+STATUTS_RDV = ('PREVU', 'TERMINE', 'ANNULE')
+
+
+class LigneInvalide(ValueError):
+    """Ligne rejetée : le message est écrit dans le fichier de rejets"""
+
+
+# --- 1. LECTURE EN FLUX ---
+def lire_lignes(fichier, format, delimiteur=','):
+    """(numéro, dict) pour chaque ligne de données, sans charger le fichier en mémoire"""
+    if format == 'csv':
+        # Ligne 1 = en-tête : le numéro rendu est celui de la ligne dans le fichier
+        for numero, ligne in enumerate(csv.DictReader(fichier, delimiter=delimiteur), start=2):
+            yield numero, {cle.strip(): valeur for cle, valeur in ligne.items() if cle}
+    else:
+        for numero, texte in enumerate(fichier, start=1):
+            if not texte.strip():
+                continue
+            try:
+                ligne = json.loads(texte)
+            except ValueError as erreur:
+                yield numero, LigneInvalide(f"JSON invalide : {erreur}")
+                continue
+            yield numero, ligne if isinstance(ligne, dict) else LigneInvalide("Objet JSON attendu")
+
+
+# --- 2. VALIDATION (une ligne = un patient, son profil, ses biomarqueurs et ses rendez-vous) ---
+def _texte(valeur):
+    return '' if valeur is None else str(valeur).strip()
+
+
+def _date(valeur, champ):
+    texte = _texte(valeur)
+    for format in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texte, format).date()
+        except ValueError:
+            pass
+    raise LigneInvalide(f"{champ} : date attendue (AAAA-MM-JJ ou JJ/MM/AAAA), reçu {texte!r}")
+
+
+def _moment(valeur, champ):
+    texte = _texte(valeur)
+    moment = parse_datetime(texte.replace(' ', 'T', 1)) if texte else None
+    if moment is None:
+        raise LigneInvalide(f"{champ} : date et heure ISO 8601 attendues, reçu {texte!r}")
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _reel(valeur, champ):
+    try:
+        return float(_texte(valeur).replace(',', '.'))
+    except ValueError:
+        raise LigneInvalide(f"{champ} : nombre attendu, reçu {valeur!r}")
+
+
+def _booleen(valeur, champ):
+    if isinstance(valeur, bool):
+        return valeur
+    texte = _texte(valeur).lower()
+    if texte in VRAI:
+        return True
+    if texte in FAUX:
+        return False
+    raise LigneInvalide(f"{champ} : oui/non attendu, reçu {valeur!r}")
+
+
+def _sous_lignes(ligne, cle, colonnes):
+    """
+    Liste imbriquée (JSONL) ou colonnes à plat sur la ligne (CSV : au plus un élément,
+    présent si sa première colonne est renseignée)
+    """
+    if isinstance(ligne.get(cle), list):
+        return ligne[cle]
+    if _texte(ligne.get(colonnes[0])):
+        return [{colonne: ligne.get(colonne) for colonne in colonnes}]
+    return []
+
+
+def valider(ligne, medecins):
+    """Objets (non enregistrés) d'une ligne ; `medecins` : identifiant ou matricule -> id"""
+    code = _texte(ligne.get('code_anonyme'))
+    nom = _texte(ligne.get('nom_complet'))
+    genre = _texte(ligne.get('genre')).upper()[:1]
+    if not code or len(code) > 50:
+        raise LigneInvalide("code_anonyme : obligatoire, 50 caractères au plus")
+    if not nom or len(nom) > 150:
+        raise LigneInvalide("nom_complet : obligatoire, 150 caractères au plus")
+    if genre not in ('M', 'F'):
+        raise LigneInvalide(f"genre : M ou F attendu, reçu {ligne.get('genre')!r}")
+    patient = Patient(
+        code_anonyme=code, nom_complet=nom, genre=genre,
+        date_naissance=_date(ligne.get('date_naissance'), 'date_naissance'),
+    )
+
+    profil = None
+    if any(_texte(ligne.get(colonne)) for colonne in COLONNES_PROFIL):
+        try:
+            tabac = int(_texte(ligne.get('tabac_score')) or 0)
+        except ValueError:
+            raise LigneInvalide(f"tabac_score : entier attendu, reçu {ligne.get('tabac_score')!r}")
+        profil = ProfilClinique(
+            patient=patient, tabac_score=tabac,
+            exposition_toxique=_booleen(ligne.get('exposition_toxique'), 'exposition_toxique'),
+            antecedents_familiaux=_booleen(ligne.get('antecedents_familiaux'), 'antecedents_familiaux'),
+        )
+
+    biomarqueurs = []
+    for bio in _sous_lignes(ligne, 'biomarqueurs', ('taux_CEA', 'taux_CYFRA21', 'date_examen')):
+        biomarqueur = Biomarqueur(
+            patient=patient, taux_CEA=_reel(bio.get('taux_CEA'), 'taux_CEA'),
+            taux_CYFRA21=_reel(bio.get('taux_CYFRA21'), 'taux_CYFRA21'),
+        )
+        # auto_now_add impose la date du jour : la date d'examen est rétablie après l'insertion
+        date_examen = _texte(bio.get('date_examen'))
+        biomarqueur.date_examen_source = _date(date_examen, 'date_examen') if date_examen else None
+        biomarqueurs.append(biomarqueur)
+
+    rendez_vous = []
+    for rdv in _sous_lignes(ligne, 'rendez_vous', ('date_rdv', 'medecin', 'motif', 'statut')):
+        medecin = medecins.get(_texte(rdv.get('medecin')))
+        if medecin is None:
+            raise LigneInvalide(f"medecin : compte médecin inconnu {rdv.get('medecin')!r}")
+        statut = _texte(rdv.get('statut')).upper() or 'PREVU'
+        if statut not in STATUTS_RDV:
+            raise LigneInvalide(f"statut : {', '.join(STATUTS_RDV)} attendu, reçu {rdv.get('statut')!r}")
+        rendez_vous.append(RendezVous(
+            patient=patient, medecin_id=medecin, date_rdv=_moment(rdv.get('date_rdv'), 'date_rdv'),
+            motif=_texte(rdv.get('motif')) or None, statut=statut,
+        ))
+    return patient, profil, biomarqueurs, rendez_vous
+
+
+def medecins_connus():
+    """Id, identifiant et matricule des comptes médecins -> id (résolution des rendez-vous sans requête par ligne)"""
+    index = {}
+    for pk, identifiant, matricule in Utilisateur.objects.filter(service='MEDECIN').values_list(
+        'pk', 'username', 'matricule'
+    ):
+        index[str(pk)] = index[identifiant] = pk
+        if matricule:
+            index[matricule] = pk
+    return index
+
+
+def codes_existants():
+    """Ensemble des codes anonymes déjà en base (clé de déduplication, lu par lots)"""
+    return set(Patient.objects.values_list('code_anonyme', flat=True).iterator(chunk_size=5000))
+
+
+# --- 3. REPRISE ---
+def lire_reprise(chemin):
+    try:
+        with open(chemin, encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except FileNotFoundError:
+        return None
+
+
+def ecrire_reprise(chemin, etat):
+    """Écriture atomique : un arrêt brutal laisse l'ancien point de reprise intact"""
+    dossier = os.path.dirname(os.path.abspath(chemin))
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, prefix='.reprise-')
+    with os.fdopen(descripteur, 'w', encoding='utf-8') as fichier:
+        json.dump(etat, fichier)
+    os.replace(temporaire, chemin)
+
+
+# --- 4. IMPORTATION ---
+class Importation:
+    """
+    Importation par lots : chaque lot de lignes valides est écrit par bulk_create dans sa propre
+    transaction (patients, profils, biomarqueurs, rendez-vous, index de recherche), puis le point de
+    reprise est enregistré. Un redémarrage reprend après la dernière ligne du dernier lot validé.
+    """
+
+    def __init__(self, taille_lot=1000, rapport=None, rejets=None):
+        self.taille_lot = taille_lot
+        self.rapport = rapport or (lambda stats: None)
+        self.rejets = rejets
+        self.medecins = medecins_connus()
+        self.codes = codes_existants()
+        self.stats = {'lignes': 0, 'importes': 0, 'doublons': 0, 'rejetes': 0}
+        self._rejets_lot = []
+        self.traitees, self.duree = 0, 0.0  # Lignes traitées et durée de cette exécution (hors reprise)
+
+    def rejeter(self, numero, motif):
+        self.stats['rejetes'] += 1
+        self._rejets_lot.append({'ligne': numero, 'motif': motif})
+
+    def executer(self, lignes, reprise=None, etat=None):
+        """
+        `lignes` : itérable de (numéro, dict). `etat` : point de reprise (source et compteurs) ;
+        ses `lignes` premières lignes, déjà traitées, sont relues sans être validées.
+        """
+        etat = etat or {}
+        self.stats.update({cle: etat.get(cle, 0) for cle in self.stats})
+        deja_traitees = self.stats['lignes']
+        lignes = islice(lignes, deja_traitees, None)
+        debut = time.monotonic()
+        while True:
+            lot = list(islice(lignes, self.taille_lot))
+            if not lot:
+                break
+            self.ecrire_lot(self.valider_lot(lot))
+            self.stats['lignes'] += len(lot)
+            # Rejets écrits après le commit du lot : une reprise ne les répète pas
+            if self.rejets:
+                self.rejets.writelines(json.dumps(rejet, ensure_ascii=False) + '\n' for rejet in self._rejets_lot)
+                self.rejets.flush()
+            self._rejets_lot = []
+            if reprise:
+                ecrire_reprise(reprise, {**etat, **self.stats})
+            self.traitees, self.duree = self.stats['lignes'] - deja_traitees, time.monotonic() - debut
+            self.rapport({**self.stats, 'traitees': self.traitees, 'duree': self.duree})
+        return self.stats
+
+    def valider_lot(self, lot):
+        valides = []
+        for numero, ligne in lot:
+            try:
+                if isinstance(ligne, LigneInvalide):
+                    raise ligne
+                objets = valider(ligne, self.medecins)
+            except LigneInvalide as erreur:
+                self.rejeter(numero, str(erreur))
+                continue
+            code = objets[0].code_anonyme
+            if code in self.codes:
+                self.stats['doublons'] += 1
+                continue
+            self.codes.add(code)
+            valides.append(objets)
+        return valides
+
+    def ecrire_lot(self, valides):
+        if not valides:
+            return
+        try:
+            inseres = self._inserer(valides)
+        except IntegrityError:
+            # Codes créés entre-temps par une autre source : on les relit et on réessaie sans eux
+            en_base = set(Patient.objects.filter(
+                code_anonyme__in=[objets[0].code_anonyme for objets in valides]
+            ).values_list('code_anonyme', flat=True))
+            restants = [objets for objets in valides if objets[0].code_anonyme not in en_base]
+            self.stats['doublons'] += len(valides) - len(restants)
+            inseres = self._inserer(restants) if restants else 0
+        self.stats['importes'] += inseres
+
+    def _inserer(self, valides):
+        patients = [objets[0] for objets in valides]
+        profils = [objets[1] for objets in valides if objets[1]]
+        biomarqueurs = [bio for objets in valides for bio in objets[2]]
+        rendez_vous = [rdv for objets in valides for rdv in objets[3]]
+        with transaction.atomic():
+            Patient.objects.bulk_create(patients)
+            ProfilClinique.objects.bulk_create(profils)
+            Biomarqueur.objects.bulk_create(biomarqueurs)
+            par_date = {}
+            for bio in biomarqueurs:
+                if bio.date_examen_source and bio.date_examen_source != date.today():
+                    par_date.setdefault(bio.date_examen_source, []).append(bio.pk)
+            for jour, pks in par_date.items():
+                Biomarqueur.objects.filter(pk__in=pks).update(date_examen=jour)
+            RendezVous.objects.bulk_create(rendez_vous)
+            # bulk_create n'émet pas post_save : index de recherche tenu ici
+            recherche.indexer_patients(patients)
+            fragments.invalider(Patient, RendezVous)
+        return len(patients)
@@ -0,0 +1,131 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def centile(durees, rang):
+    durees = sorted(durees)
+    return durees[min(len(durees) - 1, int(len(durees) * rang / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les dashboards WSGI (vues synchrones, un thread par requête) et ASGI "
+        "(variantes async, requêtes en parallèle) sur une base de test peuplée : p50, p99 et req/s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--requetes', type=int, default=200, help="Requêtes par dashboard et par mode")
+        parser.add_argument('--concurrence', type=int, default=8, help="Requêtes simultanées")
+        parser.add_argument('--latence', type=float, default=0.0, metavar='MS',
+                            help="Aller-retour réseau simulé par requête SQL (base ou replica distants)")
+
+    def handle(self, *args, **options):
+        from django.db import connection
+
+        from administration.peuplement import base_de_mesure, peupler
+
+        if options['requetes'] < 1 or options['concurrence'] < 1:
+            raise CommandError("--requetes et --concurrence doivent être positifs")
+
+        with base_de_mesure():
+            self.stdout.write(f"Peuplement : {options['patients']} patients...")
+            comptes = peupler(options['patients'])
+            with connection.cursor() as curseur:
+                curseur.execute('ANALYZE')
+            connection.close()
+            if options['latence']:
+                self.simuler_latence(options['latence'] / 1000)
+            self.mesurer(comptes, options['requetes'], options['concurrence'])
+
+    def simuler_latence(self, secondes):
+        """Chaque requête SQL attend `secondes` (hors GIL), sur toutes les connexions ouvertes ensuite"""
+        from django.db.backends.signals import connection_created
+
+        def latence(execute, sql, params, many, context):
+            time.sleep(secondes)
+            return execute(sql, params, many, context)
+
+        def installer(sender, connection, **kwargs):
+            if latence not in connection.execute_wrappers:
+                connection.execute_wrappers.append(latence)
+
+        connection_created.connect(installer, weak=False)
+        self.stdout.write(f"Latence simulée : {secondes * 1000:.1f} ms par requête SQL")
+
+    # --- 1. SCÉNARIOS ---
+    def mesurer(self, comptes, nb, concurrence):
+        from django.urls import reverse
+
+        scenarios = [
+            ("Médecin : dashboard", comptes['MEDECIN'], reverse('dashboard_consultation')),
+            ("Radiologie : dashboard", comptes['RADIO'], reverse('dashboard_radiologie')),
+            ("Radiologie : analytique 12 mois", comptes['RADIO'], reverse('analytique_radiologie') + '?periode=12m'),
+        ]
+        self.stdout.write(
+            f"{nb} requêtes par mode, {concurrence} simultanées\n"
+            f"{'Dashboard':<34} {'Mode':<5} {'p50 ms':>8} {'p99 ms':>8} {'moy. ms':>8} {'req/s':>8}"
+        )
+        for nom, utilisateur, url in scenarios:
+            for mode, mesure in (('WSGI', self.wsgi), ('ASGI', self.asgi)):
+                durees, total = mesure(utilisateur, url, nb, concurrence)
+                self.stdout.write(
+                    f"{nom:<34} {mode:<5} {centile(durees, 50) * 1000:>8.1f} {centile(durees, 99) * 1000:>8.1f} "
+                    f"{statistics.mean(durees) * 1000:>8.1f} {nb / total:>8.0f}"
+                )
+        self.stdout.write(self.style.SUCCESS("Mesure terminée"))
+
+    # --- 2. WSGI : un client (et une connexion) par thread ---
+    def wsgi(self, utilisateur, url, nb, concurrence):
+        import threading
+
+        from django.test import Client
+
+        local = threading.local()
+
+        def requete(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(utilisateur)
+            debut = time.perf_counter()
+            reponse = local.client.get(url)
+            duree = time.perf_counter() - debut
+            if reponse.status_code != 200:
+                raise CommandError(f"WSGI : HTTP {reponse.status_code} sur {url}")
+            return duree
+
+        with ThreadPoolExecutor(concurrence) as pool:
+            list(pool.map(requete, range(concurrence)))  # échauffement : connexions et sessions
+            debut = time.perf_counter()
+            durees = list(pool.map(requete, range(nb)))
+            total = time.perf_counter() - debut
+        return durees, total
+
+    # --- 3. ASGI : coroutines sur une boucle, au plus `concurrence` en vol ---
+    def asgi(self, utilisateur, url, nb, concurrence):
+        from django.test import AsyncClient
+
+        async def campagne():
+            client = AsyncClient()
+            await client.aforce_login(utilisateur)
+            semaphore = asyncio.Semaphore(concurrence)
+
+            async def requete():
+                async with semaphore:
+                    debut = time.perf_counter()
+                    reponse = await client.get(url)
+                    duree = time.perf_counter() - debut
+                if reponse.status_code != 200:
+                    raise CommandError(f"ASGI : HTTP {reponse.status_code} sur {url}")
+                return duree
+
+            await asyncio.gather(*(requete() for _ in range(concurrence)))  # échauffement
+            debut = time.perf_counter()
+            durees = await asyncio.gather(*(requete() for _ in range(nb)))
+            return durees, time.perf_counter() - debut
+
+        return asyncio.run(campagne())
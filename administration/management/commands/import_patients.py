@@ -0,0 +1,79 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des patients (avec profil clinique, biomarqueurs et rendez-vous) depuis un fichier "
+        "CSV ou JSONL lu en flux : validation et bulk_create par lots, une transaction par lot, "
+        "codes anonymes déjà connus ignorés, reprise après interruption."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Fichier .csv ou .jsonl")
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help="Par défaut : d'après l'extension")
+        parser.add_argument('--delimiteur', default=',', help="Séparateur CSV (ex. ';')")
+        parser.add_argument('--encodage', default='utf-8-sig')
+        parser.add_argument('--taille-lot', type=int, default=1000, help="Lignes par lot (et par transaction)")
+        parser.add_argument('--reprise', help="Point de reprise (défaut : <fichier>.reprise)")
+        parser.add_argument('--recommencer', action='store_true', help="Ignore un point de reprise existant")
+        parser.add_argument('--rejets', help="Lignes rejetées et motifs, en JSONL (défaut : <fichier>.rejets.jsonl)")
+
+    def handle(self, *args, **options):
+        from administration.importation import FORMATS, Importation, lire_lignes, lire_reprise
+
+        chemin = os.path.abspath(options['fichier'])
+        if not os.path.isfile(chemin):
+            raise CommandError(f"Fichier introuvable : {chemin}")
+        format = options['format'] or os.path.splitext(chemin)[1].lstrip('.').lower()
+        if format not in FORMATS:
+            raise CommandError("Format inconnu : précisez --format csv ou --format jsonl")
+        if options['taille_lot'] < 1:
+            raise CommandError("--taille-lot doit être positif")
+
+        # Identité de la source : un point de reprise ne s'applique qu'au même fichier, inchangé
+        statut = os.stat(chemin)
+        source = {'source': chemin, 'taille': statut.st_size, 'mtime_ns': statut.st_mtime_ns}
+        reprise = options['reprise'] or f'{chemin}.reprise'
+        etat = None if options['recommencer'] else lire_reprise(reprise)
+        if etat and any(etat.get(cle) != valeur for cle, valeur in source.items()):
+            raise CommandError(
+                f"Le point de reprise {reprise} concerne un autre fichier ou une autre version : "
+                f"relancez avec --recommencer"
+            )
+        if etat:
+            self.stdout.write(f"Reprise après la ligne de données n°{etat['lignes']}")
+
+        with open(chemin, encoding=options['encodage'], newline='') as fichier, \
+                open(options['rejets'] or f'{chemin}.rejets.jsonl', 'a' if etat else 'w', encoding='utf-8') as rejets:
+
+            interactif, dernier_affichage = sys.stdout.isatty(), [0.0]
+
+            def rapport(stats):
+                # Terminal : une ligne mise à jour à chaque lot ; journal : une ligne toutes les 10 s
+                if not interactif and stats['duree'] - dernier_affichage[0] < 10:
+                    return
+                dernier_affichage[0] = stats['duree']
+                # Position d'octets du tampon de lecture : suffisante pour une progression
+                progression = 100 * fichier.buffer.tell() / max(source['taille'], 1)
+                self.stdout.write(
+                    f"{progression:5.1f} % | {stats['lignes']} lignes | {stats['importes']} importé(s), "
+                    f"{stats['doublons']} doublon(s), {stats['rejetes']} rejet(s) | "
+                    f"{stats['traitees'] / max(stats['duree'], 1e-6):.0f} lignes/s",
+                    ending='\r' if interactif else '\n',
+                )
+                self.stdout.flush()
+
+            importation = Importation(options['taille_lot'], rapport, rejets)
+            lignes = lire_lignes(fichier, format, options['delimiteur'])
+            stats = importation.executer(lignes, reprise, {**source, **(etat or {})})
+
+        if os.path.exists(reprise):
+            os.remove(reprise)
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{stats['importes']} patient(s) importé(s), {stats['doublons']} doublon(s) ignoré(s), "
+            f"{stats['rejetes']} ligne(s) rejetée(s) sur {stats['lignes']} ; {importation.traitees} ligne(s) "
+            f"traitée(s) en {importation.duree:.1f} s ({importation.traitees / max(importation.duree, 1e-6):.0f} lignes/s)"
+        ))
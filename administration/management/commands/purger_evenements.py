@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Supprime les événements temps réel plus anciens que la rétention (rejeu des flux SSE)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention', type=int, default=None,
+                            help="Âge maximal en secondes (défaut : PULMOCARE_EVENEMENTS_RETENTION)")
+
+    def handle(self, *args, **options):
+        from administration.evenements import RETENTION, purger
+
+        supprimes = purger(options['retention'] if options['retention'] is not None else RETENTION)
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} événement(s) supprimé(s)"))
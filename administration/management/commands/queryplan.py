@@ -0,0 +1,156 @@
+import contextlib
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+# Applications dont les tables sont "critiques" : un parcours complet y est une régression
+APPS_SURVEILLEES = ('administration', 'consultation', 'radiologie_ia')
+# Tables de taille bornée par construction (clés globales + quelques jours) : un parcours y est normal
+TABLES_BORNEES = ('radiologie_ia_compteurradiologie',)
+PARCOURS = re.compile(r'^SCAN (\S+)(.*)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Peuple une base de test, appelle les dashboards et affiche le plan d'exécution "
+        "(EXPLAIN QUERY PLAN) de chaque requête. Échoue si une table critique est parcourue en entier."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--scans-par-patient', type=int, default=3)
+        parser.add_argument('--tolerer', action='append', default=[], metavar='TABLE',
+                            help="Table dont le parcours complet est accepté (option répétable)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("queryplan s'appuie sur EXPLAIN QUERY PLAN de SQLite")
+        self.verbosity = options['verbosity']
+
+        from administration.peuplement import base_de_mesure
+
+        with base_de_mesure():
+            problemes = self.auditer(options)
+
+        if problemes:
+            for scenario, table, detail in problemes:
+                self.stderr.write(f"  {scenario} : {detail}")
+            raise CommandError(f"{len(problemes)} parcours complet(s) de table critique")
+        self.stdout.write(self.style.SUCCESS("Aucun parcours complet de table critique"))
+
+    # --- 1. SCÉNARIOS ---
+    def auditer(self, options):
+        from django.test import Client
+        from django.urls import reverse
+
+        from administration.models import ScannerCT
+        from administration.peuplement import peupler
+        from consultation.models import RendezVous
+        from radiologie_ia.pipeline import lots_en_attente
+        from radiologie_ia.taches import soumettre_analyse, reserver_taches
+
+        self.stdout.write(f"Peuplement : {options['patients']} patients...")
+        comptes = peupler(options['patients'], options['scans_par_patient'])
+        self.oublier_statistiques()
+
+        radio, medecin = Client(), Client()
+        radio.force_login(comptes['RADIO'])
+        medecin.force_login(comptes['MEDECIN'])
+
+        scan = ScannerCT.objects.filter(resultat__isnull=False).select_related('patient').order_by('date_upload').first()
+        tache = soumettre_analyse(scan, comptes['RADIO'])
+        rdv = RendezVous.objects.filter(medecin=comptes['MEDECIN']).first()
+        page_radio = radio.get(reverse('dashboard_radiologie')).context['scans']
+        page_medecin = medecin.get(reverse('dashboard_consultation')).context['patients']
+
+        scenarios = [
+            ("Radiologie : dashboard", radio, reverse('dashboard_radiologie'), {}),
+            ("Radiologie : page suivante", radio, reverse('dashboard_radiologie'), {'curseur': page_radio.suivant}),
+            ("Radiologie : recherche", radio, reverse('dashboard_radiologie'), {'search': scan.patient.code_anonyme}),
+            ("Radiologie : analytique 12 mois", radio, reverse('analytique_radiologie'), {'periode': '12m'}),
+            ("Radiologie : statut de tâche", radio, reverse('statut_analyse', args=[tache.pk]), {}),
+            ("Radiologie : rapport PDF", radio, reverse('generer_pdf', args=[scan.pk]), {}),
+            ("Médecin : dashboard", medecin, reverse('dashboard_consultation'), {}),
+            ("Médecin : page suivante", medecin, reverse('dashboard_consultation'), {'curseur': page_medecin.suivant}),
+            ("Médecin : recherche", medecin, reverse('dashboard_consultation'), {'search': 'helene'}),
+            ("Médecin : suggestions", medecin, reverse('suggestions_patients'), {'q': 'dupr'}),
+            ("Médecin : dossier patient", medecin, reverse('detail_patient', args=[scan.patient_id]), {}),
+            ("Médecin : consultation", medecin, reverse('effectuer_consultation', args=[rdv.pk]), {}),
+            ("API : patients", medecin, reverse('api-v1:patient-list'), {'limite': 100}),
+            ("API : scans d'un patient", radio, reverse('api-v1:scan-list'), {'patient': scan.patient_id}),
+            ("API : analyses modifiées", medecin, reverse('api-v1:analyse-list'), {'modifie_depuis': scan.date_upload.isoformat()}),
+            ("API : rendez-vous", medecin, reverse('api-v1:rendezvous-list'), {}),
+        ]
+        traitements = [
+            ("Pipeline : lot en attente", lambda: next(lots_en_attente(256), None)),
+            ("Worker : réservation", lambda: reserver_taches('queryplan', 32)),
+        ]
+
+        tables = {
+            modele._meta.db_table
+            for app in APPS_SURVEILLEES for modele in apps.get_app_config(app).get_models()
+        } - set(TABLES_BORNEES) - set(options['tolerer'])
+
+        problemes = []
+        for nom, client, url, parametres in scenarios:
+            with self.capturer() as captures:
+                reponse = client.get(url, parametres)
+            if reponse.status_code != 200:
+                raise CommandError(f"{nom} : HTTP {reponse.status_code} sur {url}")
+            problemes += self.expliquer(nom, [r for capture in captures for r in capture.captured_queries], tables)
+        for nom, traitement in traitements:
+            with self.capturer() as captures:
+                traitement()
+            problemes += self.expliquer(nom, [r for capture in captures for r in capture.captured_queries], tables)
+        return problemes
+
+    def oublier_statistiques(self):
+        """
+        Plans calculés sans statistiques : SQLite suppose alors de grandes tables et retient tout index
+        utilisable. Un parcours complet signale une requête qu'aucun index ne sert, quelle que soit la
+        taille du peuplement (après ANALYZE, une petite base rend le parcours moins cher que l'index).
+        """
+        with connection.cursor() as curseur:
+            curseur.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if curseur.fetchone():
+                curseur.execute('DELETE FROM sqlite_stat1')
+                # Recharge les statistiques (désormais vides) dans le planificateur
+                curseur.execute('ANALYZE sqlite_master')
+
+    @contextlib.contextmanager
+    def capturer(self):
+        """Requêtes de tous les alias : les vues de lecture seule interrogent le replica"""
+        from django.test.utils import CaptureQueriesContext
+
+        with contextlib.ExitStack() as pile:
+            yield [pile.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+
+    # --- 2. PLANS D'EXÉCUTION ---
+    def expliquer(self, scenario, requetes, tables):
+        explicables = []
+        for requete in requetes:
+            sql = requete['sql']
+            if sql.lstrip().split(' ', 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE') and sql not in explicables:
+                explicables.append(sql)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {scenario} ({len(explicables)} requête(s))"))
+        problemes = []
+        for sql in explicables:
+            self.stdout.write(f"  {sql if self.verbosity > 1 else sql[:110]}")
+            with connection.cursor() as curseur:
+                curseur.execute(f"EXPLAIN QUERY PLAN {sql}")
+                lignes = curseur.fetchall()
+            profondeurs = {0: 0}
+            for id_noeud, parent, _, detail in lignes:
+                profondeurs[id_noeud] = profondeurs.get(parent, 0) + 1
+                marque = ''
+                parcours = PARCOURS.match(detail)
+                if parcours and parcours.group(1) in tables and 'USING' not in parcours.group(2):
+                    problemes.append((scenario, parcours.group(1), detail))
+                    marque = self.style.ERROR('  <-- parcours complet')
+                elif 'TEMP B-TREE' in detail:
+                    marque = self.style.WARNING('  <-- tri sans index')
+                self.stdout.write(f"  {'  ' * profondeurs[id_noeud]}{detail}{marque}")
+        return problemes
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index plein texte (FTS5) de recherche des patients."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        from administration.recherche import index_disponible, reconstruire_index
+
+        if not index_disponible():
+            self.stdout.write(self.style.WARNING("Base non SQLite : la recherche utilise le repli icontains"))
+            return
+        debut = time.monotonic()
+        total = reconstruire_index(options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} patient(s) indexé(s) en {time.monotonic() - debut:.1f} s"
+        ))
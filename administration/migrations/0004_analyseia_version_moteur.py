@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0003_analyseia_consulte_par_medecin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyseia',
+            name='version_moteur',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0004_analyseia_version_moteur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scannerct',
+            name='empreinte_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,69 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Copie figée de l'index tel qu'il était à cette migration : administration.recherche peut évoluer
+# (autre normalisation, autres colonnes) sans changer ce que fait cette migration.
+TABLE_INDEX = 'administration_patient_recherche'
+
+
+def _mots(texte):
+    return re.findall(r'[^\W_]+', texte)
+
+
+def _normaliser(texte):
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(_mots(sans_accents.lower()))
+
+
+def _texte_trigrammes(texte):
+    jetons = []
+    for mot in _mots(texte):
+        if len(mot) < 3:
+            jetons.append(mot)
+            continue
+        jetons.extend(mot[i:i + 3] for i in range(len(mot) - 2))
+        jetons.append(mot[-2:])
+    return ' '.join(jetons)
+
+
+def _document(patient):
+    nom, code = _normaliser(patient.nom_complet), _normaliser(patient.code_anonyme)
+    return (int(patient.pk.hex[:15], 16), patient.pk.hex, nom, code, _texte_trigrammes(nom), _texte_trigrammes(code))
+
+
+def creer_index(apps, schema_editor):
+    # Index FTS5 propre à SQLite ; les autres SGBD utilisent le repli icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE_INDEX} USING fts5("
+        f"id_patient UNINDEXED, nom, code, tri_nom, tri_code, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    Patient = apps.get_model('administration', 'Patient')
+    lignes = [_document(patient) for patient in Patient.objects.all().iterator()]
+    with schema_editor.connection.cursor() as curseur:
+        curseur.executemany(
+            f"INSERT INTO {TABLE_INDEX}(rowid, id_patient, nom, code, tri_nom, tri_code) "
+            f"VALUES (%s, %s, %s, %s, %s, %s)",
+            lignes,
+        )
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0005_scannerct_empreinte_sha256'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0006_patient_recherche'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analyseia',
+            index=models.Index(fields=['score_malignite'], name='analyse_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analyseia',
+            index=models.Index(condition=models.Q(('consulte_par_medecin', False)), fields=['scan'], name='analyse_non_lue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='biomarqueur',
+            index=models.Index(fields=['patient', 'date_examen'], name='biomarqueur_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_creation', 'id_patient'], name='patient_date_creation_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scannerct',
+            index=models.Index(fields=['date_upload', 'id_scan'], name='scan_date_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scannerct',
+            index=models.Index(fields=['patient', 'date_upload'], name='scan_patient_date_idx'),
+        ),
+    ]
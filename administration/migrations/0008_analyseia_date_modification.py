@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0007_index_tableaux_de_bord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyseia',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0008_analyseia_date_modification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scannerct',
+            name='date_apercu',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
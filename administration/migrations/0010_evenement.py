@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0009_scannerct_date_apercu'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Evenement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=30)),
+                ('service', models.CharField(blank=True, choices=[('', 'Tous'), ('MEDECIN', 'Médecin'), ('RADIO', 'Radiologue')], max_length=10)),
+                ('donnees', models.JSONField(default=dict)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date_creation'], name='evenement_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0010_evenement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='analyseia',
+            index=models.Index(fields=['date_modification', 'id'], name='analyse_date_modif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_modification'], name='patient_date_modif_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0011_patient_date_modification'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='patient',
+            name='patient_date_modif_idx',
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['date_modification', 'id_patient'], name='patient_date_modif_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+import hashlib
 import uuid
 import random
 
@@ -34,6 +35,15 @@ class Patient(models.Model):
     date_naissance = models.DateField()
     genre = models.CharField(max_length=1, choices=[('M', 'Masculin'), ('F', 'Féminin')])
     date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True) # Synchronisation incrémentale (API)
+
+    class Meta:
+        indexes = [
+            # Liste paginée du dashboard médecin : tri (date_creation, id_patient) décroissant
+            models.Index(fields=['date_creation', 'id_patient'], name='patient_date_creation_idx'),
+            # API : synchronisation par clé croissante (date_modification, id_patient) et Last-Modified (MAX)
+            models.Index(fields=['date_modification', 'id_patient'], name='patient_date_modif_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom_complet} - {self.code_anonyme}"
@@ -53,6 +63,9 @@ class Biomarqueur(models.Model):
     taux_CEA = models.FloatField(verbose_name="Antigène Carcino-Embryonnaire (ng/mL)")
     taux_CYFRA21 = models.FloatField(verbose_name="CYFRA 21-1 (ng/mL)")
 
+    class Meta:
+        indexes = [models.Index(fields=['patient', 'date_examen'], name='biomarqueur_patient_date_idx')]
+
 # ==========================================
 # 4. SERVICE RADIOLOGIE & IA (Imagerie)
 # ==========================================
@@ -61,10 +74,50 @@ class ScannerCT(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='scans')
     image_dicom = models.FileField(upload_to='scanners/%Y/%m/%d/')
     date_upload = models.DateTimeField(auto_now_add=True)
+    empreinte_sha256 = models.CharField(max_length=64, blank=True, db_index=True) # Contenu de l'image
+    date_apercu = models.DateTimeField(null=True, blank=True) # Aperçus générés (radiologie_ia.apercus)
+
+    class Meta:
+        indexes = [
+            # File d'attente du dashboard radiologie : tri (date_upload, id_scan) décroissant
+            models.Index(fields=['date_upload', 'id_scan'], name='scan_date_upload_idx'),
+            # Historique d'un patient (dossier, consultation) déjà trié par date
+            models.Index(fields=['patient', 'date_upload'], name='scan_patient_date_idx'),
+        ]
 
     def __str__(self):
         return f"Scan {self.id_scan} - Patient {self.patient.code_anonyme}"
 
+    def save(self, *args, **kwargs):
+        # Empreinte calculée à l'écriture du fichier (upload non encore sur le stockage) ou à la création.
+        # Jamais à la mise à jour d'une ligne existante : les scans antérieurs à la colonne sont
+        # complétés par `manage.py calculer_empreintes`, pas au fil des save(update_fields=...).
+        nouveau_fichier = self.image_dicom and not self.image_dicom._committed
+        if nouveau_fichier or (self.image_dicom and self._state.adding and not self.empreinte_sha256):
+            self.empreinte_sha256 = empreinte_fichier(self.image_dicom)
+        super().save(*args, **kwargs)
+
+def empreinte_fichier(fichier):
+    """SHA-256 calculé par morceaux : la mémoire reste bornée quelle que soit la taille de l'étude"""
+    sha = hashlib.sha256()
+    for morceau in fichier.chunks():
+        sha.update(morceau)
+    return sha.hexdigest()
+
+def resultat_ia_simule():
+    """Tirage simulé (score, détails) d'une inférence, partagé par l'analyse unitaire et par lots"""
+    # Génère un score entre 0.1 et 0.95
+    score = round(random.uniform(0.1, 0.95), 2)
+
+    # Simulation de détection d'objets (nodules)
+    details = {
+        "statut": "Analyse Complétée",
+        "nodules_detectes": random.randint(0, 4),
+        "zone_critique": random.choice(["Lobe Supérieur Gauche", "Lobe Inférieur Droit", "Aucune"]),
+        "niveau_confiance": f"{random.randint(85, 99)}%"
+    }
+    return score, details
+
 class AnalyseIA(models.Model):
     scan = models.OneToOneField(ScannerCT, on_delete=models.CASCADE, related_name='resultat')
     score_malignite = models.FloatField(null=True, blank=True) # Entre 0 et 1
@@ -73,21 +126,29 @@ class AnalyseIA(models.Model):
     avis_medecin = models.TextField(blank=True)
     est_valide = models.BooleanField(default=False)
     consulte_par_medecin = models.BooleanField(default=False)
+    version_moteur = models.CharField(max_length=50, blank=True) # Moteur IA ayant produit le score
+    date_modification = models.DateTimeField(auto_now=True) # Version de l'analyse (rapports PDF)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score_malignite'], name='analyse_score_idx'),
+            # Index partiel : seules les analyses non lues (petite fraction de la table) y figurent
+            models.Index(
+                fields=['scan'], condition=models.Q(consulte_par_medecin=False), name='analyse_non_lue_idx',
+            ),
+            # API : pagination par clé (date_modification, id) et ?modifie_depuis=
+            models.Index(fields=['date_modification', 'id'], name='analyse_date_modif_idx'),
+        ]
 
     def simuler_ia(self):
         """
-        Le Coeur du Projet : Simule l'exécution de l'algorithme IA
+        Le Coeur du Projet : exécute le moteur IA configuré (PULMOCARE_MOTEUR_IA) sur ce scan
         """
-        # Génère un score entre 0.1 et 0.95
-        self.score_malignite = round(random.uniform(0.1, 0.95), 2)
-        
-        # Simulation de détection d'objets (nodules)
-        self.details_nodules = {
-            "statut": "Analyse Complétée",
-            "nodules_detectes": random.randint(0, 4),
-            "zone_critique": random.choice(["Lobe Supérieur Gauche", "Lobe Inférieur Droit", "Aucune"]),
-            "niveau_confiance": f"{random.randint(85, 99)}%"
-        }
+        from radiologie_ia.cache_ia import inferer_avec_cache
+        from radiologie_ia.moteurs import get_moteur
+        moteur = get_moteur()
+        self.score_malignite, self.details_nodules = inferer_avec_cache([self.scan], moteur)[0]
+        self.version_moteur = moteur.version
         self.save()
 
     @property
@@ -95,4 +156,27 @@ class AnalyseIA(models.Model):
         if self.score_malignite is None: return "Non analysé"
         if self.score_malignite < 0.3: return "Faible risque"
         if self.score_malignite < 0.6: return "Risque Modéré"
-        return "Risque Élevé"
\ No newline at end of file
+        return "Risque Élevé"
+
+# ==========================================
+# 5. ÉVÉNEMENTS TEMPS RÉEL (flux SSE des dashboards)
+# ==========================================
+class Evenement(models.Model):
+    """
+    Journal court des changements poussés aux dashboards. Écrit en un INSERT après le commit
+    de la transaction qui le produit (administration.evenements), lu par clé croissante
+    par un seul poller par processus ; purgé par les workers d'analyse.
+    """
+    SERVICES = [('', 'Tous'), ('MEDECIN', 'Médecin'), ('RADIO', 'Radiologue')]
+
+    id = models.BigAutoField(primary_key=True) # Sert d'identifiant SSE (Last-Event-ID)
+    type = models.CharField(max_length=30)
+    service = models.CharField(max_length=10, choices=SERVICES, blank=True) # Destinataires
+    donnees = models.JSONField(default=dict)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['date_creation'], name='evenement_date_idx')]
+
+    def __str__(self):
+        return f"#{self.id} {self.type}"
@@ -0,0 +1,139 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core import fragments
+from .models import Utilisateur, Patient, ScannerCT, AnalyseIA, Biomarqueur
+
+NOMS = ['Dupré', 'Hélène', 'Noël', 'Martin', 'Bernard', 'Koffi', 'Ahouansou', 'Lefèvre', 'Mensah', 'Dossou']
+PRENOMS = ['Jean', 'Marie', 'Aïcha', 'Luc', 'Sèna', 'Paul', 'Chloé', 'Rodrigue', 'Inès', 'Kossi']
+
+
+def utilisateurs_demo():
+    """Un compte par service (mot de passe 'pulmocare'), créé s'il n'existe pas"""
+    comptes = {}
+    for service in ('ADMIN', 'MEDECIN', 'RADIO'):
+        utilisateur, cree = Utilisateur.objects.get_or_create(
+            username=f'demo_{service.lower()}', defaults={'service': service}
+        )
+        if cree:
+            utilisateur.set_password('pulmocare')
+            utilisateur.save(update_fields=['password'])
+        comptes[service] = utilisateur
+    return comptes
+
+
+def _etaler(modele, champ, objets, jours, hasard):
+    """auto_now_add impose 'maintenant' à l'insertion : répartit ensuite les dates sur `jours` jours"""
+    par_jour = {}
+    for objet in objets:
+        par_jour.setdefault(hasard.randrange(jours), []).append(objet.pk)
+    maintenant = timezone.now()
+    for jour, pks in par_jour.items():
+        moment = maintenant - timedelta(days=jour, minutes=hasard.randrange(24 * 60))
+        modele.objects.filter(pk__in=pks).update(**{champ: moment})
+
+
+@contextmanager
+def base_de_mesure():
+    """
+    Base de test jetable pour les commandes de mesure (queryplan, bench_dashboards) ; les alias
+    miroirs (replica) y sont redirigés pour ne jamais lire la base réelle. Les accusés de lecture
+    y sont écrits directement : aucun ne reste en tampon après la destruction de la base.
+    """
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from consultation.accuses import ecriture_directe
+
+    with ecriture_directe():
+        setup_test_environment()
+        ancien_nom = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        for alias in connections:
+            if connections[alias].settings_dict['TEST'].get('MIRROR') == connection.alias:
+                connections[alias].close()
+                connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            yield
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0)
+            teardown_test_environment()
+
+
+def peupler(nb_patients=2000, scans_par_patient=3, part_analysee=0.7, nb_rdv=500, jours=365, graine=42,
+            taille_lot=1000):
+    """
+    Jeu de données synthétique pour les mesures (queryplan, bench) réparti sur `jours` jours :
+    écritures groupées, puis reconstruction de l'index de recherche, des compteurs et de
+    l'agrégat journalier (bulk_create n'émet pas de signaux). Renvoie les comptes de démonstration.
+    """
+    from consultation.models import RendezVous
+    from consultation.notifications import reconcilier_non_lus
+    from radiologie_ia import compteurs, statistiques
+    from .recherche import reconstruire_index
+
+    hasard = random.Random(graine)
+    comptes = utilisateurs_demo()
+    maintenant = timezone.now()
+
+    with transaction.atomic():
+        patients = [
+            Patient(
+                code_anonyme=f'PC-{graine}-{i:07d}',
+                nom_complet=f'{hasard.choice(PRENOMS)} {hasard.choice(NOMS)}',
+                date_naissance=date(1940, 1, 1) + timedelta(days=hasard.randrange(25000)),
+                genre=hasard.choice('MF'),
+            )
+            for i in range(nb_patients)
+        ]
+        Patient.objects.bulk_create(patients, batch_size=taille_lot)
+        _etaler(Patient, 'date_creation', patients, jours, hasard)
+
+        scans = [
+            ScannerCT(
+                patient=patient,
+                image_dicom=f'scanners/peuplement/{patient.code_anonyme}_{j}.dcm',
+                empreinte_sha256=uuid.uuid4().hex * 2,
+            )
+            for patient in patients for j in range(scans_par_patient)
+        ]
+        ScannerCT.objects.bulk_create(scans, batch_size=taille_lot)
+        _etaler(ScannerCT, 'date_upload', scans, jours, hasard)
+
+        analyses = [
+            AnalyseIA(
+                scan=scan,
+                score_malignite=round(hasard.uniform(0.05, 0.99), 2),
+                consulte_par_medecin=hasard.random() < 0.9,
+                version_moteur='peuplement',
+            )
+            for scan in scans if hasard.random() < part_analysee
+        ]
+        AnalyseIA.objects.bulk_create(analyses, batch_size=taille_lot)
+
+        Biomarqueur.objects.bulk_create(
+            [Biomarqueur(patient=p, taux_CEA=hasard.uniform(0, 10), taux_CYFRA21=hasard.uniform(0, 5)) for p in patients],
+            batch_size=taille_lot,
+        )
+        RendezVous.objects.bulk_create(
+            [
+                RendezVous(
+                    patient=hasard.choice(patients),
+                    medecin=comptes['MEDECIN'],
+                    date_rdv=maintenant + timedelta(hours=hasard.randint(-24 * 30, 24 * 30)),
+                    statut=hasard.choice(['PREVU', 'PREVU', 'TERMINE', 'ANNULE']),
+                )
+                for _ in range(nb_rdv)
+            ],
+            batch_size=taille_lot,
+        )
+
+    reconstruire_index(taille_lot)
+    compteurs.reconcilier()
+    statistiques.reconstruire()
+    reconcilier_non_lus()
+    fragments.invalider(Patient, ScannerCT, AnalyseIA, RendezVous)
+    return comptes
@@ -0,0 +1,176 @@
+import re
+import unicodedata
+import uuid
+
+from django.db import connection, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Index plein texte SQLite FTS5 des patients (créé par la migration 0006_patient_recherche)
+TABLE_INDEX = 'administration_patient_recherche'
+COLONNES = {'nom': ('nom', 'tri_nom'), 'code': ('code', 'tri_code')}
+
+
+# --- 1. NORMALISATION (accents, casse, trigrammes) ---
+def normaliser(texte):
+    """'Hélène Dupré-Noël' -> 'helene dupre noel' : recherche insensible aux accents et à la casse"""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(mots(sans_accents.lower()))
+
+
+def mots(texte):
+    return re.findall(r'[^\W_]+', texte)
+
+
+def trigrammes(mot):
+    if len(mot) < 3:
+        return [mot]
+    return [mot[i:i + 3] for i in range(len(mot) - 2)]
+
+
+def texte_trigrammes(texte):
+    """
+    Trigrammes des mots, plus leur bigramme final : toute sous-chaîne de 2 caractères ou plus
+    est retrouvable (équivalent d'icontains), une de 2 caractères par préfixe de trigramme.
+    """
+    jetons = []
+    for mot in mots(texte):
+        jetons.extend(trigrammes(mot))
+        if len(mot) >= 3:
+            jetons.append(mot[-2:])
+    return ' '.join(jetons)
+
+
+def rowid(patient_id):
+    """Rowid FTS5 dérivé de l'UUID (60 bits) : mise à jour et suppression par clé, sans parcours"""
+    return int(patient_id.hex[:15], 16)
+
+
+def document(patient):
+    """Ligne d'index d'un patient : (rowid, id, nom, code, trigrammes du nom, trigrammes du code)"""
+    nom, code = normaliser(patient.nom_complet), normaliser(patient.code_anonyme)
+    return (rowid(patient.pk), patient.pk.hex, nom, code, texte_trigrammes(nom), texte_trigrammes(code))
+
+
+# --- 2. CONSTRUCTION DES REQUÊTES FTS5 ---
+def _guillemets(terme):
+    return '"' + terme.replace('"', '""') + '"'
+
+
+def requete_fts(recherche, colonnes=('nom', 'code'), approximative=False):
+    """
+    Chaque mot doit correspondre par préfixe OU par sous-chaîne (tous ses trigrammes).
+    En mode approximatif, un seul trigramme suffit et bm25 classe les plus proches en tête.
+    """
+    termes = mots(normaliser(recherche))
+    if not termes:
+        return None
+    texte = '{' + ' '.join(c for col in colonnes for c in COLONNES[col][:1]) + '}'
+    tri = '{' + ' '.join(c for col in colonnes for c in COLONNES[col][1:]) + '}'
+
+    if approximative:
+        tous = {t for terme in termes for t in trigrammes(terme)}
+        return f"{tri}: ({' OR '.join(_guillemets(t) for t in sorted(tous))})"
+
+    clauses = []
+    for terme in termes:
+        clause = f"{texte}: {_guillemets(terme)}*"
+        if len(terme) >= 3:
+            clause = f"({clause} OR {tri}: ({' AND '.join(_guillemets(t) for t in trigrammes(terme))}))"
+        elif len(terme) == 2:
+            clause = f"({clause} OR {tri}: {_guillemets(terme)}*)"
+        clauses.append(clause)
+    return ' AND '.join(clauses)
+
+
+def index_disponible():
+    return connection.vendor == 'sqlite'
+
+
+def filtre_recherche(recherche, champ='pk', colonnes=('nom', 'code')):
+    """
+    Q à appliquer sur un queryset : `champ` doit contenir l'id du patient
+    (ex. 'pk' sur Patient, 'patient_id' sur ScannerCT). Repli icontains hors SQLite.
+    """
+    if not index_disponible():
+        prefixe = '' if champ == 'pk' else champ.removesuffix('_id') + '__'
+        condition = Q()
+        if 'nom' in colonnes:
+            condition |= Q(**{f'{prefixe}nom_complet__icontains': recherche})
+        if 'code' in colonnes:
+            condition |= Q(**{f'{prefixe}code_anonyme__icontains': recherche})
+        return condition
+
+    requete = requete_fts(recherche, colonnes)
+    if requete is None:
+        return Q()
+    sous_requete = RawSQL(f"SELECT id_patient FROM {TABLE_INDEX} WHERE {TABLE_INDEX} MATCH %s", [requete])
+    return Q(**{f'{champ}__in': sous_requete})
+
+
+def suggestions(recherche, limite=10):
+    """Autocomplétion classée par bm25 ; repli approximatif (tolérant aux fautes) si rien ne correspond"""
+    from .models import Patient
+    if not index_disponible():
+        return list(Patient.objects.filter(filtre_recherche(recherche)).order_by('nom_complet')[:limite])
+
+    for approximative in (False, True):
+        requete = requete_fts(recherche, approximative=approximative)
+        if requete is None:
+            return []
+        # Même alias que les lectures de Patient (replica dans une vue de lecture seule)
+        with connections[router.db_for_read(Patient)].cursor() as curseur:
+            curseur.execute(
+                f"SELECT id_patient FROM {TABLE_INDEX} WHERE {TABLE_INDEX} MATCH %s ORDER BY rank LIMIT %s",
+                [requete, limite],
+            )
+            ids = [ligne[0] for ligne in curseur.fetchall()]
+        if ids:
+            ids = [uuid.UUID(i) for i in ids]
+            patients = Patient.objects.in_bulk(ids)
+            return [patients[i] for i in ids if i in patients]
+        if len(normaliser(recherche)) < 4:
+            break
+    return []
+
+
+# --- 3. SYNCHRONISATION DE L'INDEX ---
+def indexer_patients(patients):
+    """Remplace les lignes d'index des patients donnés (utilisé par les signaux et les imports en masse)"""
+    if not index_disponible() or not patients:
+        return
+    lignes = [document(patient) for patient in patients]
+    with connection.cursor() as curseur:
+        curseur.executemany(f"DELETE FROM {TABLE_INDEX} WHERE rowid = %s", [(ligne[0],) for ligne in lignes])
+        curseur.executemany(
+            f"INSERT INTO {TABLE_INDEX}(rowid, id_patient, nom, code, tri_nom, tri_code) "
+            f"VALUES (%s, %s, %s, %s, %s, %s)",
+            lignes,
+        )
+
+
+def desindexer_patient(patient_id):
+    if not index_disponible():
+        return
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE_INDEX} WHERE rowid = %s", [rowid(patient_id)])
+
+
+def reconstruire_index(taille_lot=1000):
+    """Vide et reconstruit l'index à partir de la table Patient, par lots"""
+    from .models import Patient
+    if not index_disponible():
+        return 0
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE_INDEX}")
+    total, lot = 0, []
+    for patient in Patient.objects.only('id_patient', 'nom_complet', 'code_anonyme').iterator(chunk_size=taille_lot):
+        lot.append(patient)
+        if len(lot) >= taille_lot:
+            indexer_patients(lot)
+            total, lot = total + len(lot), []
+    indexer_patients(lot)
+    with connection.cursor() as curseur:
+        curseur.execute(f"INSERT INTO {TABLE_INDEX}({TABLE_INDEX}) VALUES ('optimize')")
+    return total + len(lot)
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import fragments
+from .models import AnalyseIA, Patient, ScannerCT
+from . import recherche
+
+
+# --- INDEX DE RECHERCHE DES PATIENTS ---
+@receiver(post_save, sender=Patient)
+def indexer_patient(sender, instance, raw=False, **kwargs):
+    if not raw:
+        recherche.indexer_patients([instance])
+
+
+@receiver(post_delete, sender=Patient)
+def desindexer_patient(sender, instance, **kwargs):
+    recherche.desindexer_patient(instance.pk)
+
+
+# --- CACHE DES FRAGMENTS DES DASHBOARDS ---
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+@receiver(post_save, sender=ScannerCT)
+@receiver(post_delete, sender=ScannerCT)
+@receiver(post_save, sender=AnalyseIA)
+@receiver(post_delete, sender=AnalyseIA)
+def invalider_fragments(sender, using=None, **kwargs):
+    fragments.invalider(sender, using=using)
@@ -1,3 +1,211 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from consultation.models import RendezVous
+from . import evenements
+from .importation import Importation, lire_lignes
+from .models import Biomarqueur, Evenement, Patient, Utilisateur
+from .recherche import filtre_recherche
+
+
+def creer_patient(code, nom):
+    return Patient.objects.create(code_anonyme=code, nom_complet=nom, date_naissance=date(1960, 1, 1), genre='F')
+
+
+class RechercheTests(TestCase):
+    """Recherche plein texte (FTS5) : chaque mot doit correspondre, par préfixe ou par sous-chaîne"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.helene = creer_patient('PC-001', 'Hélène Dupré-Noël')
+        cls.jean = creer_patient('PC-002', 'Jean Martin')
+        cls.marie = creer_patient('PC-103', 'Marie Jean-Baptiste')
+
+    def chercher(self, texte, colonnes=('nom', 'code')):
+        return set(Patient.objects.filter(filtre_recherche(texte, 'pk', colonnes)))
+
+    def test_insensible_aux_accents_et_a_la_casse(self):
+        self.assertEqual(self.chercher('HELENE'), {self.helene})
+        self.assertEqual(self.chercher('noel'), {self.helene})
+
+    def test_sous_chaine_d_un_mot(self):
+        self.assertEqual(self.chercher('artin'), {self.jean})
+
+    def test_mots_dans_n_importe_quel_ordre(self):
+        # Changement par rapport à icontains sur la chaîne entière : l'ordre des mots ne compte plus
+        self.assertEqual(self.chercher('Noël Hélène'), {self.helene})
+        self.assertEqual(self.chercher('baptiste marie'), {self.marie})
+
+    def test_tous_les_mots_doivent_correspondre(self):
+        self.assertEqual(self.chercher('jean'), {self.jean, self.marie})
+        self.assertEqual(self.chercher('jean martin'), {self.jean})
+        self.assertEqual(self.chercher('jean dupre'), set())
+
+    def test_code_anonyme(self):
+        self.assertEqual(self.chercher('PC-103'), {self.marie})
+        self.assertEqual(self.chercher('PC-103', colonnes=('nom',)), set())
+
+    def test_recherche_vide(self):
+        self.assertEqual(self.chercher(' - '), {self.helene, self.jean, self.marie})
+
+    def test_index_suivi_par_les_signaux(self):
+        self.jean.nom_complet = 'Jean Lefèvre'
+        self.jean.save()
+        self.assertEqual(self.chercher('lefevre'), {self.jean})
+        self.assertEqual(self.chercher('martin'), set())
+        self.marie.delete()
+        self.assertEqual(self.chercher('baptiste'), set())
+
+
+class Interruption(Exception):
+    """Arrêt brutal simulé de l'importation"""
+
+
+class ImportationTests(TestCase):
+    """import_patients : lots validés, rejets journalisés, reprise au dernier lot enregistré"""
+
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        Utilisateur.objects.create_user('medecin', service='MEDECIN', matricule='M-01')
+        creer_patient('PC-000', 'Déjà connu')
+        self.chemin = os.path.join(self.dossier, 'patients.csv')
+        lignes = ['code_anonyme;nom_complet;date_naissance;genre;taux_CEA;taux_CYFRA21;date_examen;date_rdv;medecin']
+        for i in range(1, 11):
+            lignes.append(f'PC-{i:03};Patient {i};05/10/1960;F;4,5;2.2;2025-03-0{i % 9 + 1};2026-11-02 09:30;M-01')
+        lignes.insert(4, 'PC-000;Doublon;1960-01-01;M;;;;;')
+        lignes.insert(8, 'PC-099;Genre inconnu;1960-01-01;X;;;;;')
+        with open(self.chemin, 'w', encoding='utf-8') as fichier:
+            fichier.write('\n'.join(lignes) + '\n')
+        self.reprise = self.chemin + '.reprise'
+        self.rejets = self.chemin + '.rejets.jsonl'
+
+    def importer(self, *options):
+        call_command('import_patients', self.chemin, '--delimiteur', ';', '--taille-lot', '3', *options, stdout=io.StringIO())
+
+    def interrompre_apres(self, nb_lots):
+        """Importation arrêtée après `nb_lots` lots, comme un processus tué : le point de reprise reste"""
+        statut = os.stat(self.chemin)
+        source = {'source': self.chemin, 'taille': statut.st_size, 'mtime_ns': statut.st_mtime_ns}
+        lots = []
+
+        def rapport(stats):
+            lots.append(stats)
+            if len(lots) == nb_lots:
+                raise Interruption
+
+        with open(self.chemin, encoding='utf-8', newline='') as fichier, open(self.rejets, 'w', encoding='utf-8') as rejets:
+            with self.assertRaises(Interruption):
+                Importation(3, rapport, rejets).executer(lire_lignes(fichier, 'csv', ';'), self.reprise, source)
+
+    def assertImportComplet(self):
+        self.assertEqual(Patient.objects.count(), 11)
+        self.assertEqual(Biomarqueur.objects.count(), 10)
+        self.assertEqual(RendezVous.objects.count(), 10)
+        self.assertEqual(Patient.objects.get(code_anonyme='PC-000').nom_complet, 'Déjà connu')
+        self.assertEqual(Biomarqueur.objects.get(patient__code_anonyme='PC-003').date_examen, date(2025, 3, 4))
+        self.assertEqual(Patient.objects.filter(filtre_recherche('patient 7', 'pk', ('nom',))).count(), 1)
+        self.assertFalse(os.path.exists(self.reprise))
+        with open(self.rejets, encoding='utf-8') as fichier:
+            rejets = [json.loads(ligne) for ligne in fichier]
+        self.assertEqual([rejet['ligne'] for rejet in rejets], [9])
+
+    def test_import_complet(self):
+        self.importer()
+        self.assertImportComplet()
+
+    def test_reprise_apres_interruption(self):
+        self.interrompre_apres(2)
+        with open(self.reprise, encoding='utf-8') as fichier:
+            etat = json.load(fichier)
+        self.assertEqual((etat['lignes'], etat['importes'], etat['doublons']), (6, 5, 1))
+        self.assertEqual(Patient.objects.count(), 6)
+
+        self.importer()
+        self.assertImportComplet()
+
+    def test_reprise_refusee_si_le_fichier_a_change(self):
+        self.interrompre_apres(1)
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write('PC-011;Patient 11;1960-01-01;M;;;;;\n')
+        with self.assertRaises(CommandError):
+            self.importer()
+        self.importer('--recommencer')
+        self.assertEqual(Patient.objects.count(), 12)
+
+
+class Annulation(Exception):
+    """Erreur simulée : annule le bloc atomique en cours"""
+
+
+class EvenementsTests(TestCase):
+    """Journal des dashboards : un INSERT par transaction validée, rattrapage refusé s'il a des trous"""
+
+    def publies(self):
+        return list(Evenement.objects.order_by('id').values_list('type', 'donnees'))
+
+    def test_fusion_par_cle(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for n in range(3):
+                    evenements.publier('compteur', {'n': n}, service='MEDECIN', cle='PC-001')
+                evenements.publier('compteur', {'n': 9}, service='MEDECIN', cle='PC-002')
+                evenements.publier('scan', lambda: {'total': Patient.objects.count()})
+                self.assertEqual(self.publies(), [])
+        self.assertEqual(self.publies(), [('compteur', {'n': 2}), ('compteur', {'n': 9}), ('scan', {'total': 0})])
+
+    def test_savepoint_annule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                evenements.publier('a', {})
+                with self.assertRaises(Annulation), transaction.atomic():
+                    evenements.publier('b', {})
+                    raise Annulation
+                evenements.publier('c', {})
+        self.assertEqual([type for type, _ in self.publies()], ['a', 'c'])
+
+    def test_lot_ecrit_une_fois(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            evenements.publier('a', {})
+        with self.captureOnCommitCallbacks(execute=True):
+            evenements.publier('b', {})
+        self.assertEqual([type for type, _ in self.publies()], ['a', 'b'])
+
+    def creer(self, nombre, service=''):
+        Evenement.objects.bulk_create([Evenement(type='test', service=service) for _ in range(nombre)])
+        return list(Evenement.objects.order_by('id').values_list('id', flat=True))
+
+    def test_rattrapage(self):
+        self.creer(3)
+        ids = self.creer(2, service='RADIO')
+        manques, complet = evenements.rattrapage(ids[0], ids[-1], 'MEDECIN')
+        self.assertTrue(complet)
+        self.assertEqual([evenement['id'] for evenement in manques], ids[1:3])
+        manques, complet = evenements.rattrapage(ids[0], ids[-1], 'RADIO')
+        self.assertEqual([evenement['id'] for evenement in manques], ids[1:])
+        self.assertEqual(evenements.rattrapage(ids[-1], ids[-1], 'RADIO'), ([], True))
+        self.assertEqual(evenements.rattrapage(ids[-1], ids[0], 'RADIO'), ([], False))
+
+    def test_rattrapage_apres_purge(self):
+        ids = self.creer(4)
+        Evenement.objects.filter(id__lte=ids[1]).update(date_creation=timezone.now() - timedelta(hours=2))
+        self.assertEqual(evenements.purger(retention=3600), 2)
+        # Le client s'est arrêté avant les événements purgés : il doit recharger sa page
+        self.assertEqual(evenements.rattrapage(ids[0], ids[-1], 'RADIO'), ([], False))
+        self.assertTrue(evenements.rattrapage(ids[1], ids[-1], 'RADIO')[1])
 
-# Create your tests here.
+    @mock.patch.object(evenements, 'TAILLE_LECTURE', 1)
+    def test_rattrapage_trop_long(self):
+        ids = self.creer(3)
+        self.assertEqual(evenements.rattrapage(ids[0], ids[-1], 'RADIO'), ([], False))
+        self.assertTrue(evenements.rattrapage(ids[1], ids[-1], 'RADIO')[1])
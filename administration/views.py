@@ -1,6 +1,11 @@
 from django.shortcuts import render
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.views import LoginView
-from django.urls import reverse_lazy
+from django.http import JsonResponse
+from django.urls import reverse, reverse_lazy
+
+from core.routeurs import lecture_replica
+from .recherche import suggestions
 
 class ConnexionClinique(LoginView):
     """Service d'authentification centralisé"""
@@ -19,4 +24,24 @@ class ConnexionClinique(LoginView):
 
 def dashboard_admin(request):
     """Portail de gestion des utilisateurs et du système"""
-    return render(request, 'dashboards/admin.html')
\ No newline at end of file
+    return render(request, 'dashboards/admin.html')
+
+def est_soignant(user):
+    return user.is_authenticated and getattr(user, 'service', None) in ('MEDECIN', 'RADIO')
+
+@login_required
+@user_passes_test(est_soignant)
+@lecture_replica
+def suggestions_patients(request):
+    """Autocomplétion des patients (nom ou code), classée par pertinence"""
+    query = request.GET.get('q', '').strip()
+    patients = suggestions(query) if len(query) >= 2 else []
+    return JsonResponse({'resultats': [
+        {
+            'id': str(patient.pk),
+            'code': patient.code_anonyme,
+            'nom': patient.nom_complet,
+            'url': reverse('detail_patient', args=[patient.pk]) if request.user.service == 'MEDECIN' else None,
+        }
+        for patient in patients
+    ]})
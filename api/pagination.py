@@ -0,0 +1,49 @@
+from django.conf import settings
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.pagination import PaginateurCurseur
+
+TAILLE_PAGE = getattr(settings, 'PULMOCARE_API_TAILLE_PAGE', 100)
+TAILLE_PAGE_MAX = getattr(settings, 'PULMOCARE_API_TAILLE_PAGE_MAX', 1000)
+
+
+class PaginationCurseur(BasePagination):
+    """
+    Pagination par clé des dashboards (core.pagination) pour l'API : jetons signés, ni OFFSET ni COUNT,
+    la dernière page d'une synchronisation complète coûte autant que la première.
+    Tri décroissant sur `vue.tri` ; `?limite=` règle la taille de page (plafonnée).
+    Avec ?modifie_depuis= (synchronisation incrémentale), tri croissant sur `vue.tri_synchro` :
+    changements du plus ancien au plus récent, une ligne modifiée pendant la synchronisation
+    reparaît plus loin au lieu d'être manquée. Le client reprend ensuite avec ?modifie_depuis=
+    égal à la date_modification de la dernière ligne reçue.
+    """
+    parametre_curseur = 'curseur'
+    parametre_limite = 'limite'
+
+    def taille(self, request):
+        try:
+            return max(1, min(int(request.query_params[self.parametre_limite]), TAILLE_PAGE_MAX))
+        except (KeyError, ValueError):
+            return TAILLE_PAGE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        synchro = bool(view.tri_synchro and request.query_params.get('modifie_depuis'))
+        self.page = PaginateurCurseur(
+            queryset, view.tri_synchro if synchro else view.tri, self.taille(request), croissant=synchro,
+        ).get_page(request.query_params.get(self.parametre_curseur))
+        return list(self.page)
+
+    def lien(self, jeton):
+        if jeton is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.parametre_curseur, jeton)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'suivant': self.lien(self.page.suivant),
+            'precedent': self.lien(self.page.precedent),
+            'resultats': data,
+        })
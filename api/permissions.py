@@ -0,0 +1,17 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+
+
+class ServicesAutorises(BasePermission):
+    """
+    Accès par service de l'utilisateur (comptes d'intégration compris), déclaré sur la vue :
+    `services_lecture` pour GET/HEAD, `services_ecriture` pour le reste.
+    """
+
+    def has_permission(self, request, view):
+        utilisateur = request.user
+        if not utilisateur or not utilisateur.is_authenticated:
+            return False
+        if utilisateur.is_superuser:
+            return True
+        services = view.services_lecture if request.method in SAFE_METHODS else view.services_ecriture
+        return getattr(utilisateur, 'service', None) in services
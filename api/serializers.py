@@ -0,0 +1,208 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+
+from administration import recherche
+from administration.models import AnalyseIA, Patient, ProfilClinique, ScannerCT
+from consultation.models import RendezVous
+from core import fragments
+
+
+# --- 1. SOCLE : CHAMPS À LA DEMANDE ET ÉCRITURES GROUPÉES ---
+class ChampsDynamiques:
+    """?fields=a,b : seuls ces champs sont sérialisés (la vue ne charge pas les relations écartées)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        demandes = self.context.get('champs')
+        if demandes:
+            for nom in set(self.fields) - set(demandes):
+                self.fields.pop(nom)
+
+
+class ListeEnMasse(serializers.ListSerializer):
+    """
+    Liste d'objets validée d'un bloc : les contrôles qui demandent la base (unicité, clés étrangères)
+    sont faits en une requête pour tout le lot par `valider_lot` du sérialiseur enfant,
+    puis un bulk_create ou un bulk_update écrit le lot.
+    """
+
+    def to_internal_value(self, data):
+        self._instances = iter(self.instance or [])
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        # Modification groupée : chaque élément est validé contre l'instance de même rang (cf. la vue)
+        self.child.instance = next(self._instances, None)
+        return super().run_child_validation(data)
+
+    def validate(self, attrs):
+        erreurs = self.child.valider_lot(attrs, self.instance or [])
+        if any(erreurs):
+            # Même format que les erreurs par élément de DRF : {rang: erreurs}
+            raise serializers.ValidationError({i: erreur for i, erreur in enumerate(erreurs) if erreur})
+        return attrs
+
+    def create(self, validated_data):
+        modele = self.child.Meta.model
+        with transaction.atomic():
+            objets = modele.objects.bulk_create([modele(**donnees) for donnees in validated_data])
+            self.child.apres_ecriture_en_masse(objets)
+            fragments.invalider(modele)
+        return objets
+
+    def update(self, instances, validated_data):
+        champs = set()
+        for instance, donnees in zip(instances, validated_data):
+            for champ, valeur in donnees.items():
+                setattr(instance, champ, valeur)
+            champs.update(donnees)
+        if champs:
+            # bulk_update n'applique pas auto_now
+            maintenant = timezone.now()
+            for instance in instances:
+                instance.date_modification = maintenant
+            with transaction.atomic():
+                instances[0].__class__.objects.bulk_update(instances, [*champs, 'date_modification'])
+                self.child.apres_ecriture_en_masse(instances)
+                fragments.invalider(instances[0].__class__)
+        return instances
+
+
+class SerialiseurEnMasse(ChampsDynamiques, serializers.ModelSerializer):
+    """Sérialiseur dont les contrôles en base passent par `valider_lot`, pour un objet comme pour un lot"""
+
+    def valider_lot(self, lot, instances):
+        """Une erreur (dict, vide si valide) par élément de `lot`"""
+        return [{} for _ in lot]
+
+    def apres_ecriture_en_masse(self, objets):
+        """Effets des signaux post_save, que bulk_create et bulk_update n'émettent pas"""
+
+    def validate(self, attrs):
+        if not isinstance(self.parent, serializers.ListSerializer):
+            erreur, = self.valider_lot([attrs], [self.instance] if self.instance else [])
+            if erreur:
+                raise serializers.ValidationError(erreur)
+        return attrs
+
+
+# --- 2. PATIENTS ---
+class ProfilCliniqueSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ProfilClinique
+        fields = ['tabac_score', 'exposition_toxique', 'antecedents_familiaux']
+
+
+class PatientSerializer(SerialiseurEnMasse):
+    profil = ProfilCliniqueSerializer(read_only=True)
+    scans = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Patient
+        fields = [
+            'id_patient', 'code_anonyme', 'nom_complet', 'date_naissance', 'genre',
+            'date_creation', 'date_modification', 'profil', 'scans',
+        ]
+        read_only_fields = ['date_creation', 'date_modification']
+        # Unicité contrôlée par lot dans valider_lot (le validateur par défaut fait une requête par objet)
+        extra_kwargs = {'code_anonyme': {'validators': []}}
+        list_serializer_class = ListeEnMasse
+
+    def valider_lot(self, lot, instances):
+        erreurs = [{} for _ in lot]
+        codes = [donnees.get('code_anonyme') for donnees in lot]
+        demandes = [code for code in codes if code]
+        if not demandes:
+            return erreurs
+        doublons = {code for code, nombre in Counter(demandes).items() if nombre > 1}
+        pris = set(
+            Patient.objects.filter(code_anonyme__in=demandes)
+            .exclude(pk__in=[instance.pk for instance in instances])
+            .values_list('code_anonyme', flat=True)
+        )
+        for i, code in enumerate(codes):
+            if code in doublons:
+                erreurs[i]['code_anonyme'] = ["Code présent plusieurs fois dans le lot."]
+            elif code in pris:
+                erreurs[i]['code_anonyme'] = ["Un patient avec ce code existe déjà."]
+        return erreurs
+
+    def apres_ecriture_en_masse(self, objets):
+        recherche.indexer_patients(objets)
+
+
+# --- 3. IMAGERIE ---
+class AnalyseResumeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AnalyseIA
+        fields = ['id', 'score_malignite', 'version_moteur', 'date_modification']
+
+
+class ScannerSerializer(ChampsDynamiques, serializers.ModelSerializer):
+    """Lecture seule : les études arrivent par le téléversement par morceaux"""
+    code_patient = serializers.CharField(source='patient.code_anonyme', read_only=True)
+    url_image = serializers.SerializerMethodField()
+    resultat = AnalyseResumeSerializer(read_only=True)
+
+    class Meta:
+        model = ScannerCT
+        fields = ['id_scan', 'patient', 'code_patient', 'date_upload', 'empreinte_sha256', 'url_image', 'resultat']
+        read_only_fields = fields
+
+    def get_url_image(self, scan):
+        url = reverse('media_protege', args=[scan.image_dicom.name])
+        requete = self.context.get('request')
+        return requete.build_absolute_uri(url) if requete else url
+
+
+class AnalyseSerializer(SerialiseurEnMasse):
+    """Résultat produit par le pipeline ; seuls l'avis et la validation du médecin sont modifiables"""
+    patient = serializers.UUIDField(source='scan.patient_id', read_only=True)
+
+    class Meta:
+        model = AnalyseIA
+        fields = [
+            'id', 'scan', 'patient', 'score_malignite', 'details_nodules', 'version_moteur',
+            'date_analyse', 'date_modification', 'avis_medecin', 'est_valide',
+        ]
+        read_only_fields = [
+            'scan', 'score_malignite', 'details_nodules', 'version_moteur', 'date_analyse', 'date_modification',
+        ]
+        list_serializer_class = ListeEnMasse
+
+
+# --- 4. RENDEZ-VOUS ---
+class RendezVousSerializer(SerialiseurEnMasse):
+    # Identifiants bruts : l'existence est vérifiée par lot (une requête par table, pas une par objet)
+    patient = serializers.UUIDField(source='patient_id')
+    medecin = serializers.IntegerField(source='medecin_id')
+    code_patient = serializers.CharField(source='patient.code_anonyme', read_only=True)
+
+    class Meta:
+        model = RendezVous
+        fields = [
+            'id', 'patient', 'code_patient', 'medecin', 'date_rdv', 'motif', 'statut',
+            'notes_medicales', 'date_modification',
+        ]
+        read_only_fields = ['date_modification']
+        list_serializer_class = ListeEnMasse
+
+    def valider_lot(self, lot, instances):
+        erreurs = [{} for _ in lot]
+        patients = {donnees['patient_id'] for donnees in lot if 'patient_id' in donnees}
+        medecins = {donnees['medecin_id'] for donnees in lot if 'medecin_id' in donnees}
+        connus = set(Patient.objects.filter(pk__in=patients).values_list('pk', flat=True)) if patients else set()
+        habilites = set(
+            get_user_model().objects.filter(pk__in=medecins, service='MEDECIN').values_list('pk', flat=True)
+        ) if medecins else set()
+        for i, donnees in enumerate(lot):
+            if 'patient_id' in donnees and donnees['patient_id'] not in connus:
+                erreurs[i]['patient'] = ["Patient inconnu."]
+            if 'medecin_id' in donnees and donnees['medecin_id'] not in habilites:
+                erreurs[i]['medecin'] = ["Médecin inconnu."]
+        return erreurs
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from administration.models import AnalyseIA, Patient, ScannerCT, Utilisateur
+from administration.recherche import filtre_recherche
+from administration.tests import creer_patient
+from radiologie_ia.tests import FichiersTemporaires
+
+
+class APITests(FichiersTemporaires, TestCase):
+    """Droits par service, modifications groupées (PATCH d'une liste) et synchronisation par ?modifie_depuis="""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.comptes = {
+            service: Utilisateur.objects.create_user(service.lower(), service=service)
+            for service in ('ADMIN', 'MEDECIN', 'RADIO')
+        }
+        cls.patients = [creer_patient(f'PC-{i:03}', f'Patient {i}') for i in range(5)]
+        scan = ScannerCT.objects.create(patient=cls.patients[0], image_dicom=ContentFile(b'DICM', name='scan.dcm'))
+        cls.analyse = AnalyseIA.objects.create(scan=scan, score_malignite=0.4)
+
+    def client_de(self, service):
+        client = APIClient()
+        client.force_authenticate(self.comptes[service])
+        return client
+
+    # --- Droits ---
+    def test_anonyme(self):
+        reponse = APIClient().get('/api/v1/patients/')
+        self.assertEqual(reponse.status_code, 401)
+        self.assertIn('WWW-Authenticate', reponse)
+
+    def test_droits_par_service(self):
+        attendus = [
+            ('RADIO', 'get', '/api/v1/patients/', 200),
+            ('RADIO', 'patch', '/api/v1/patients/', 403),
+            ('ADMIN', 'get', '/api/v1/analyses/', 403),
+            ('ADMIN', 'get', '/api/v1/scans/', 403),
+            ('RADIO', 'patch', '/api/v1/analyses/', 403),
+            ('MEDECIN', 'patch', '/api/v1/analyses/', 200),
+            ('ADMIN', 'patch', '/api/v1/patients/', 200),
+        ]
+        for service, methode, url, statut in attendus:
+            with self.subTest(service=service, methode=methode, url=url):
+                reponse = getattr(self.client_de(service), methode)(url, [], format='json')
+                self.assertEqual(reponse.status_code, statut)
+
+    def test_analyses_non_creables(self):
+        reponse = self.client_de('MEDECIN').post('/api/v1/analyses/', [], format='json')
+        self.assertEqual(reponse.status_code, 405)
+
+    # --- Modifications groupées ---
+    def test_patch_groupe(self):
+        avant = Patient.objects.get(pk=self.patients[1].pk).date_modification
+        reponse = self.client_de('ADMIN').patch('/api/v1/patients/', [
+            {'id_patient': str(self.patients[1].pk), 'nom_complet': 'Hélène Noël'},
+            {'id_patient': str(self.patients[2].pk), 'code_anonyme': 'PC-200', 'date_creation': '2000-01-01T00:00:00Z'},
+        ], format='json')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual([patient['nom_complet'] for patient in reponse.json()], ['Hélène Noël', 'Patient 2'])
+
+        un, deux = Patient.objects.get(pk=self.patients[1].pk), Patient.objects.get(pk=self.patients[2].pk)
+        self.assertEqual(un.nom_complet, 'Hélène Noël')
+        self.assertGreater(un.date_modification, avant)
+        self.assertEqual(deux.code_anonyme, 'PC-200')
+        # Champ en lecture seule ignoré
+        self.assertEqual(deux.date_creation, self.patients[2].date_creation)
+        # bulk_update sans signaux : l'index de recherche suit quand même
+        self.assertEqual(list(Patient.objects.filter(filtre_recherche('helene', 'pk', ('nom',)))), [un])
+
+    def test_patch_groupe_des_analyses(self):
+        reponse = self.client_de('MEDECIN').patch('/api/v1/analyses/', [
+            {'id': self.analyse.pk, 'avis_medecin': 'Contrôle à 3 mois', 'est_valide': True, 'score_malignite': 0.99},
+        ], format='json')
+        self.assertEqual(reponse.status_code, 200)
+        self.analyse.refresh_from_db()
+        self.assertEqual((self.analyse.avis_medecin, self.analyse.est_valide), ('Contrôle à 3 mois', True))
+        self.assertEqual(self.analyse.score_malignite, 0.4)
+
+    def test_patch_groupe_refuse_sans_rien_ecrire(self):
+        client = self.client_de('ADMIN')
+        cle = str(self.patients[1].pk)
+        lots = {
+            'objet seul': {'id_patient': cle, 'nom_complet': 'X'},
+            'clé absente': [{'nom_complet': 'X'}],
+            'clé répétée': [{'id_patient': cle, 'nom_complet': 'X'}, {'id_patient': cle, 'nom_complet': 'Y'}],
+            'objet inconnu': [{'id_patient': cle, 'nom_complet': 'X'}, {'id_patient': '0' * 32, 'nom_complet': 'Y'}],
+            'code déjà pris': [{'id_patient': cle, 'nom_complet': 'X'},
+                               {'id_patient': str(self.patients[2].pk), 'code_anonyme': 'PC-003'}],
+            'codes en double': [{'id_patient': cle, 'code_anonyme': 'PC-900'},
+                                {'id_patient': str(self.patients[2].pk), 'code_anonyme': 'PC-900'}],
+        }
+        for nom, lot in lots.items():
+            with self.subTest(nom):
+                self.assertEqual(client.patch('/api/v1/patients/', lot, format='json').status_code, 400)
+        self.assertEqual(
+            list(Patient.objects.order_by('code_anonyme').values_list('code_anonyme', 'nom_complet')),
+            [(patient.code_anonyme, patient.nom_complet) for patient in self.patients],
+        )
+
+    def test_erreurs_par_element(self):
+        reponse = self.client_de('ADMIN').patch('/api/v1/patients/', [
+            {'id_patient': str(self.patients[1].pk), 'nom_complet': 'X'},
+            {'id_patient': str(self.patients[2].pk), 'code_anonyme': 'PC-003'},
+        ], format='json')
+        self.assertEqual(list(reponse.json()), ['1'])
+
+    # --- Synchronisation ---
+    def test_synchronisation_croissante(self):
+        client = self.client_de('ADMIN')
+        debut = (timezone.now() - timedelta(days=1)).isoformat()
+        url = '/api/v1/patients/'
+        reponse = client.get(url, {'modifie_depuis': debut, 'limite': 2, 'fields': 'id_patient'})
+        vus = [patient['id_patient'] for patient in reponse.json()['resultats']]
+        # Un patient déjà reçu est modifié pendant la synchronisation : il revient en fin de parcours
+        modifie = Patient.objects.get(pk=vus[0])
+        modifie.nom_complet = 'Renommé'
+        modifie.save()
+        while reponse.json()['suivant']:
+            reponse = client.get(reponse.json()['suivant'])
+            vus.extend(patient['id_patient'] for patient in reponse.json()['resultats'])
+        self.assertEqual(set(vus), {str(patient.pk) for patient in self.patients})
+        self.assertEqual(vus[-1], str(modifie.pk))
+        self.assertEqual(len(vus), len(self.patients) + 1)
+
+    def test_liste_decroissante_et_304(self):
+        client = self.client_de('ADMIN')
+        reponse = client.get('/api/v1/patients/', {'fields': 'id_patient'})
+        self.assertEqual(
+            [patient['id_patient'] for patient in reponse.json()['resultats']],
+            [str(patient.pk) for patient in sorted(self.patients, key=lambda p: (p.date_creation, p.pk), reverse=True)],
+        )
+        inchange = client.get('/api/v1/patients/', {'fields': 'id_patient'}, HTTP_IF_NONE_MATCH=reponse['ETag'])
+        self.assertEqual(inchange.status_code, 304)
@@ -0,0 +1,21 @@
+from rest_framework import routers
+
+from . import views
+
+
+class RouteurAPI(routers.DefaultRouter):
+    """Routes de DRF, plus PATCH sur la collection pour les modifications groupées (modifier_lot)"""
+    routes = [
+        routers.SimpleRouter.routes[0]._replace(mapping={**routers.SimpleRouter.routes[0].mapping, 'patch': 'modifier_lot'}),
+        *routers.SimpleRouter.routes[1:],
+    ]
+
+
+routeur = RouteurAPI()
+routeur.register('patients', views.PatientViewSet, basename='patient')
+routeur.register('scans', views.ScannerViewSet, basename='scan')
+routeur.register('analyses', views.AnalyseViewSet, basename='analyse')
+routeur.register('rendez-vous', views.RendezVousViewSet, basename='rendezvous')
+
+app_name = 'api'
+urlpatterns = routeur.urls
@@ -0,0 +1,214 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import mixins, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from administration.models import AnalyseIA, Patient, ScannerCT
+from consultation.models import RendezVous
+from core.routeurs import lecture_seule
+from .pagination import PaginationCurseur
+from .permissions import ServicesAutorises
+from .serializers import AnalyseSerializer, PatientSerializer, RendezVousSerializer, ScannerSerializer
+
+# Objets créés ou modifiés par appel groupé (un lot = une transaction)
+TAILLE_LOT = getattr(settings, 'PULMOCARE_API_TAILLE_LOT', 1000)
+
+
+# --- 1. SOCLE DES RESSOURCES ---
+class RessourceAPI(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Lecture paginée par clé, filtres simples, champs à la demande (?fields=) et GET conditionnel.
+    Les lectures passent par le replica, comme les dashboards.
+    """
+    pagination_class = PaginationCurseur
+    permission_classes = [ServicesAutorises]
+    services_lecture = services_ecriture = ()
+    # Champs de la pagination par clé (tri décroissant, le dernier unique) ; index correspondant requis
+    tri = ()
+    # Clé croissante de ?modifie_depuis= (synchronisation incrémentale) : (champ_modification, clé primaire)
+    tri_synchro = ()
+    # Paramètre de requête -> lookup ORM
+    filtres = {}
+    # Champ sérialisé -> relation chargée s'il est demandé : ('select' | 'prefetch', chemin)
+    relations = {}
+    # Horodatage de modification (Last-Modified, ?modifie_depuis=) ; None si la ressource n'en a pas
+    champ_modification = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            with lecture_seule():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    def champs_demandes(self):
+        demandes = self.request.query_params.get('fields') if self.request else None
+        return {champ.strip() for champ in demandes.split(',') if champ.strip()} if demandes else None
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'champs': self.champs_demandes()}
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        champs = self.champs_demandes()
+        for champ, (mode, chemin) in self.relations.items():
+            if champs is None or champ in champs:
+                qs = qs.select_related(chemin) if mode == 'select' else qs.prefetch_related(chemin)
+        return qs
+
+    def filter_queryset(self, queryset):
+        for parametre, lookup in self.filtres.items():
+            valeur = self.request.query_params.get(parametre)
+            if valeur:
+                try:
+                    queryset = queryset.filter(**{lookup: valeur})
+                except (DjangoValidationError, ValueError):
+                    raise ValidationError({parametre: ["Valeur invalide."]})
+        return queryset
+
+    # --- GET conditionnel ---
+    def conditionnel(self, reponse, derniere_modification=None):
+        """ETag du contenu (toujours exact) et Last-Modified ; 304 si le client est à jour"""
+        etag = '"%s"' % hashlib.md5(JSONRenderer().render(reponse.data), usedforsecurity=False).hexdigest()
+        reponse['ETag'] = etag
+        horodatage = int(derniere_modification.timestamp()) if derniere_modification else None
+        if horodatage is not None:
+            reponse['Last-Modified'] = http_date(horodatage)
+        reponse['Cache-Control'] = 'private, no-cache'
+        return get_conditional_response(self.request, etag=etag, last_modified=horodatage, response=reponse)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        derniere = None
+        if self.champ_modification:
+            # MAX sur l'index : If-Modified-Since satisfait sans paginer ni sérialiser
+            derniere = queryset.order_by().aggregate(derniere=Max(self.champ_modification))['derniere']
+            if derniere is not None:
+                inchange = get_conditional_response(request, last_modified=int(derniere.timestamp()))
+                if inchange is not None:
+                    return inchange
+        page = self.paginate_queryset(queryset)
+        reponse = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return self.conditionnel(reponse, derniere)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        reponse = Response(self.get_serializer(instance).data)
+        derniere = getattr(instance, self.champ_modification) if self.champ_modification else None
+        return self.conditionnel(reponse, derniere)
+
+
+class RessourceModifiable(mixins.CreateModelMixin, mixins.UpdateModelMixin, RessourceAPI):
+    """
+    Écritures unitaires et groupées : POST d'une liste sur la collection (bulk_create),
+    PATCH d'une liste sur la collection (bulk_update, chaque élément porte sa clé primaire).
+    """
+    http_method_names = ['get', 'post', 'patch', 'head', 'options']
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+        serialiseur = self.get_serializer(data=request.data, many=True, max_length=TAILLE_LOT)
+        serialiseur.is_valid(raise_exception=True)
+        self.ecrire(serialiseur)
+        return Response(self.relire(serialiseur.instance), status=status.HTTP_201_CREATED)
+
+    def relire(self, objets):
+        """Lot écrit relu avec les relations de la vue (une requête par relation, pas une par objet)"""
+        relus = self.get_queryset().in_bulk([objet.pk for objet in objets])
+        return self.get_serializer([relus[objet.pk] for objet in objets], many=True).data
+
+    def modifier_lot(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            raise ValidationError({'detail': ["Une liste d'objets est attendue."]})
+        if len(request.data) > TAILLE_LOT:
+            raise ValidationError({'detail': [f"Au plus {TAILLE_LOT} objets par appel."]})
+        cle = self.get_queryset().model._meta.pk.name
+        try:
+            cles = [self.get_queryset().model._meta.pk.to_python(element[cle]) for element in request.data]
+        except (KeyError, TypeError, DjangoValidationError):
+            raise ValidationError({cle: ["Chaque objet doit porter sa clé primaire."]})
+        if len(set(cles)) != len(cles):
+            raise ValidationError({cle: ["Clé primaire présente plusieurs fois dans le lot."]})
+        existants = self.get_queryset().in_bulk(cles)
+        inconnues = [str(c) for c in cles if c not in existants]
+        if inconnues:
+            raise ValidationError({cle: [f"Objets introuvables : {', '.join(inconnues[:20])}"]})
+
+        serialiseur = self.get_serializer(
+            [existants[c] for c in cles], data=request.data, many=True, partial=True, max_length=TAILLE_LOT,
+        )
+        serialiseur.is_valid(raise_exception=True)
+        self.ecrire(serialiseur)
+        return Response(serialiseur.data)
+
+    def ecrire(self, serialiseur):
+        try:
+            serialiseur.save()
+        except IntegrityError as erreur:
+            # Conflit concurrent (ex. même code créé entre la validation et l'écriture) : rien n'est écrit
+            raise ValidationError({'detail': [f"Conflit d'intégrité : {erreur}"]})
+
+    def perform_create(self, serialiseur):
+        self.ecrire(serialiseur)
+
+    def perform_update(self, serialiseur):
+        self.ecrire(serialiseur)
+
+
+# --- 2. RESSOURCES ---
+class PatientViewSet(RessourceModifiable):
+    queryset = Patient.objects.all()
+    serializer_class = PatientSerializer
+    services_lecture = ('ADMIN', 'MEDECIN', 'RADIO')
+    services_ecriture = ('ADMIN', 'MEDECIN')
+    tri = ('date_creation', 'id_patient')
+    tri_synchro = ('date_modification', 'id_patient')
+    filtres = {'code': 'code_anonyme', 'modifie_depuis': 'date_modification__gte'}
+    relations = {'profil': ('select', 'profil'), 'scans': ('prefetch', 'scans')}
+    champ_modification = 'date_modification'
+
+
+class ScannerViewSet(RessourceAPI):
+    queryset = ScannerCT.objects.all()
+    serializer_class = ScannerSerializer
+    services_lecture = ('MEDECIN', 'RADIO')
+    tri = ('date_upload', 'id_scan')
+    filtres = {'patient': 'patient_id', 'depuis': 'date_upload__gte'}
+    relations = {'code_patient': ('select', 'patient'), 'resultat': ('select', 'resultat')}
+
+
+class AnalyseViewSet(RessourceModifiable):
+    queryset = AnalyseIA.objects.all()
+    serializer_class = AnalyseSerializer
+    services_lecture = ('MEDECIN', 'RADIO')
+    services_ecriture = ('MEDECIN',)
+    http_method_names = ['get', 'patch', 'head', 'options']  # Créées par le pipeline uniquement
+    tri = tri_synchro = ('date_modification', 'id')
+    filtres = {
+        'patient': 'scan__patient_id', 'scan': 'scan_id', 'modifie_depuis': 'date_modification__gte',
+        'score_min': 'score_malignite__gte',
+    }
+    relations = {'patient': ('select', 'scan')}
+    champ_modification = 'date_modification'
+
+
+class RendezVousViewSet(RessourceModifiable):
+    queryset = RendezVous.objects.all()
+    serializer_class = RendezVousSerializer
+    services_lecture = services_ecriture = ('ADMIN', 'MEDECIN')
+    tri = tri_synchro = ('date_modification', 'id')
+    filtres = {
+        'patient': 'patient_id', 'medecin': 'medecin_id', 'statut': 'statut',
+        'modifie_depuis': 'date_modification__gte',
+    }
+    relations = {'code_patient': ('select', 'patient')}
+    champ_modification = 'date_modification'
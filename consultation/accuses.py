@@ -0,0 +1,125 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import notifications
+
+logger = logging.getLogger(__name__)
+
+# Secondes entre deux écritures groupées ; 0 : accusés appliqués pendant la requête (tests, démonstration)
+INTERVALLE = getattr(settings, 'PULMOCARE_ACCUSES_INTERVALLE', 5.0)
+
+
+class TamponLectures:
+    """
+    Accusés de lecture en attente, par patient et par médecin (premier affichage de l'intervalle).
+    L'ouverture d'un dossier n'écrit rien : un thread du processus applique le tampon par lots
+    (notifications.marquer_lues : un UPDATE, l'audit et les compteurs en une transaction),
+    ce qui épargne aux GET le verrou d'écriture de SQLite.
+    """
+
+    def __init__(self, intervalle=INTERVALLE):
+        self.intervalle = intervalle
+        self.verrou = threading.Lock()
+        self.en_attente = {}
+        self.thread = None
+        self.pid = None
+
+    def enregistrer(self, patient_id, medecin_id, moment=None):
+        """Renvoie False (sans rien retenir) si le patient n'a aucune analyse non lue"""
+        moment = moment or timezone.now()
+        with self.verrou:
+            deja = patient_id in self.en_attente
+        # Badge à zéro : rien à marquer, aucune écriture à prévoir (lecture par clé primaire)
+        if not deja and not notifications.badges([patient_id]):
+            return False
+        with self.verrou:
+            lecteurs = self.en_attente.setdefault(patient_id, {})
+            lecteurs[medecin_id] = min(lecteurs.get(medecin_id, moment), moment)
+        if self.intervalle <= 0:
+            self.vider()
+        else:
+            self.demarrer()
+        return True
+
+    # --- Écriture différée ---
+    def vider(self):
+        """Applique les accusés en attente ; remis dans le tampon si l'écriture échoue"""
+        with self.verrou:
+            lot, self.en_attente = self.en_attente, {}
+        if not lot:
+            return 0
+        try:
+            return notifications.marquer_lues(lot)
+        except Exception:
+            with self.verrou:
+                for patient_id, lecteurs in lot.items():
+                    en_attente = self.en_attente.setdefault(patient_id, {})
+                    for medecin_id, moment in lecteurs.items():
+                        en_attente[medecin_id] = min(en_attente.get(medecin_id, moment), moment)
+            raise
+
+    def demarrer(self):
+        # Démarrage paresseux, dans chaque worker (un thread n'est pas hérité au fork)
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+        with self.verrou:
+            if self.pid == os.getpid() and self.thread.is_alive():
+                return
+            if self.pid is None:
+                atexit.register(self.arreter)
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.boucle, name='accuses-lecture', daemon=True)
+            self.thread.start()
+
+    def boucle(self):
+        while True:
+            time.sleep(self.intervalle)
+            # Connexion propre à ce thread, vérifiée comme en début de requête
+            close_old_connections()
+            try:
+                self.vider()
+            except Exception:
+                logger.exception("Écriture des accusés de lecture impossible (nouvel essai au prochain passage)")
+
+    def arreter(self):
+        """Arrêt du processus : dernier recours, les accusés de l'intervalle en cours sont écrits"""
+        try:
+            self.vider()
+        except Exception:
+            logger.exception("Accusés de lecture perdus à l'arrêt")
+
+
+tampon = TamponLectures()
+
+
+def enregistrer_lecture(patient, medecin):
+    return tampon.enregistrer(patient.pk, medecin.pk)
+
+
+@contextmanager
+def ecriture_directe():
+    """
+    Accusés écrits pendant la requête le temps du bloc, sans tampon : à utiliser autour d'une base
+    jetable (mesures, tests). Rien ne reste en mémoire pour être écrit plus tard, une fois cette base
+    détruite, dans la base configurée à ce moment-là.
+    """
+    # Accusés déjà en attente : ils concernent la base courante, écrits avant de changer de base
+    tampon.vider()
+    intervalle, tampon.intervalle = tampon.intervalle, 0
+    try:
+        yield
+    finally:
+        tampon.intervalle = intervalle
+        with tampon.verrou:
+            # Restes d'une écriture échouée dans le bloc : ils visent une base qui n'existe plus
+            perdus, tampon.en_attente = tampon.en_attente, {}
+        if perdus:
+            logger.warning("Accusés de lecture d'une base jetable abandonnés (%d patients)", len(perdus))
@@ -1,5 +1,21 @@
 from django.contrib import admin
-from .models import RendezVous
+from .models import AccuseLecture, RendezVous
 
 # Enregistrement simple sans personnalisation pour tester
-admin.site.register(RendezVous)
\ No newline at end of file
+admin.site.register(RendezVous)
+
+
+@admin.register(AccuseLecture)
+class AccuseLectureAdmin(admin.ModelAdmin):
+    """Audit en lecture seule : qui a lu quelle analyse, et quand"""
+    list_display = ['analyse', 'patient', 'medecin', 'date_lecture', 'date_enregistrement']
+    list_filter = ['medecin']
+    date_hierarchy = 'date_lecture'
+    list_select_related = ['patient', 'medecin']
+    raw_id_fields = ['analyse', 'patient']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,84 @@
+import heapq
+from collections import namedtuple
+from datetime import datetime, time
+from itertools import islice
+
+from django.core import signing
+from django.utils import timezone
+
+from administration.models import Biomarqueur, ScannerCT
+from core.pagination import PageCurseur, PaginateurCurseur
+from .models import RendezVous
+
+SEL_CURSEUR = 'pulmocare.chronologie'
+# Événements par fenêtre ("Charger plus ancien" demande la suivante)
+TAILLE_FENETRE = 20
+
+# Source -> (requête des lignes d'un patient, champs de la clé de tri décroissante, le dernier unique).
+# Chaque requête suit un index (patient, date) : une fenêtre coûte autant au premier dossier qu'au millième.
+SOURCES = {
+    'scan': (lambda patient: ScannerCT.objects.filter(patient=patient).select_related('resultat'),
+             ('date_upload', 'id_scan')),
+    'rdv': (lambda patient: RendezVous.objects.filter(patient=patient), ('date_rdv', 'id')),
+    'biomarqueur': (lambda patient: Biomarqueur.objects.filter(patient=patient), ('date_examen', 'id')),
+}
+
+# type : clé de SOURCES ; moment : datetime (début de journée pour un examen daté) ; objet : la ligne
+Element = namedtuple('Element', 'type moment objet')
+
+
+def _moment(valeur):
+    if isinstance(valeur, datetime):
+        return valeur
+    return timezone.make_aware(datetime.combine(valeur, time.min))
+
+
+# --- CURSEUR : une position par source ---
+def _encoder(positions):
+    return signing.dumps(positions, salt=SEL_CURSEUR, compress=True)
+
+
+def _decoder(jeton):
+    """{source: jeton de PaginateurCurseur, '' si la source est épuisée} ; {} (début) si invalide"""
+    if not jeton:
+        return {}
+    try:
+        positions = signing.loads(jeton, salt=SEL_CURSEUR)
+    except signing.BadSignature:
+        return {}
+    return positions if isinstance(positions, dict) else {}
+
+
+# --- FENÊTRE ---
+def chronologie(patient, avant=None, taille=TAILLE_FENETRE):
+    """
+    Fenêtre de l'historique du patient (scans et résultats IA, rendez-vous, examens biologiques),
+    fusionnée du plus récent au plus ancien : une requête par source au plus, quelle que soit
+    la longueur du dossier. `avant` : curseur `suivant` de la fenêtre précédente.
+    Renvoie une PageCurseur d'Element.
+    """
+    positions = _decoder(avant)
+    pages = {}
+    for source, (requete, champs) in SOURCES.items():
+        if positions.get(source) == '':
+            continue
+        paginateur = PaginateurCurseur(requete(patient), champs, taille)
+        pages[source] = (paginateur, paginateur.get_page(positions.get(source)))
+
+    flux = [
+        [Element(source, _moment(getattr(objet, paginateur.champs[0])), objet) for objet in page]
+        for source, (paginateur, page) in pages.items()
+    ]
+    elements = list(islice(heapq.merge(*flux, key=lambda element: element.moment, reverse=True), taille))
+
+    # Chaque source reprend après son dernier élément affiché : ni doublon ni trou, même à date égale
+    suivantes, reste = dict(positions), False
+    for source, (paginateur, page) in pages.items():
+        affiches = [element.objet for element in elements if element.type == source]
+        if len(affiches) == len(page) and not page.has_next():
+            suivantes[source] = ''
+            continue
+        reste = True
+        if affiches:
+            suivantes[source] = paginateur.jeton_apres(affiches[-1])
+    return PageCurseur(elements, suivant=_encoder(suivantes) if reste else None)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recalcule les badges d'analyses non lues (boîte de réception des médecins) à partir d'AnalyseIA."
+
+    def handle(self, *args, **options):
+        from consultation.notifications import reconcilier_non_lus
+
+        patients = reconcilier_non_lus()
+        self.stdout.write(self.style.SUCCESS(f"{patients} patient(s) avec des analyses non lues"))
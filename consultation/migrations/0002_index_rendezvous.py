@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0007_index_tableaux_de_bord'),
+        ('consultation', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['medecin', 'date_rdv', 'statut'], name='rdv_medecin_date_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['patient', 'date_rdv'], name='rdv_patient_date_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remplir_compteurs(apps, schema_editor):
+    # Reprise de l'existant : analyses déjà en base et non lues, groupées par patient
+    AnalyseIA = apps.get_model('administration', 'AnalyseIA')
+    CompteurNonLus = apps.get_model('consultation', 'CompteurNonLus')
+    comptes = (
+        AnalyseIA.objects.filter(consulte_par_medecin=False)
+        .values('scan__patient_id').annotate(nb=Count('pk')).values_list('scan__patient_id', 'nb')
+    )
+    CompteurNonLus.objects.bulk_create(
+        [CompteurNonLus(patient_id=patient_id, nb_non_lues=nb) for patient_id, nb in comptes], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0007_index_tableaux_de_bord'),
+        ('consultation', '0002_index_rendezvous'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurNonLus',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='non_lues', serialize=False, to='administration.patient')),
+                ('nb_non_lues', models.IntegerField(default=0)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(remplir_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0011_patient_date_modification'),
+        ('consultation', '0003_compteurnonlus'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendezvous',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['date_modification', 'id'], name='rdv_date_modif_idx'),
+        ),
+    ]
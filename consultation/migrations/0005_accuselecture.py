@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0011_patient_date_modification'),
+        ('consultation', '0004_rendezvous_date_modification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccuseLecture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_lecture', models.DateTimeField()),
+                ('date_enregistrement', models.DateTimeField(auto_now_add=True)),
+                ('analyse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accuses_lecture', to='administration.analyseia')),
+                ('medecin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accuses_lecture', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accuses_lecture', to='administration.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'date_lecture'], name='accuse_patient_date_idx'), models.Index(fields=['medecin', 'date_lecture'], name='accuse_medecin_date_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.conf import settings
 from django.db import models
-from administration.models import Patient # On importe le Patient du service admin
+from administration.models import AnalyseIA, Patient # On importe le Patient du service admin
 
 class RendezVous(models.Model):
     STATUT_CHOICES = [
@@ -15,6 +15,53 @@ class RendezVous(models.Model):
     motif = models.TextField(blank=True, null=True)
     statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='PREVU')
     notes_medicales = models.TextField(blank=True, null=True)
+    date_modification = models.DateTimeField(auto_now=True) # Synchronisation incrémentale (API)
+
+    class Meta:
+        indexes = [
+            # RDV du jour d'un médecin (plage sur date_rdv) et RDV prévus (filtre statut dans l'index)
+            models.Index(fields=['medecin', 'date_rdv', 'statut'], name='rdv_medecin_date_statut_idx'),
+            # Historique des RDV d'un patient, du plus récent au plus ancien
+            models.Index(fields=['patient', 'date_rdv'], name='rdv_patient_date_idx'),
+            # API : pagination par clé (date_modification, id) et ?modifie_depuis=
+            models.Index(fields=['date_modification', 'id'], name='rdv_date_modif_idx'),
+        ]
+
+    def __str__(self):
+        return f"RDV de {self.patient.code_anonyme} le {self.date_rdv.strftime('%d/%m/%Y')}"
+
+class CompteurNonLus(models.Model):
+    """
+    Boîte de réception du médecin : nombre d'analyses IA non lues par patient,
+    tenu à jour par signaux (consultation.notifications). Le dashboard lit les
+    badges des seuls patients affichés, par clé primaire.
+    """
+    patient = models.OneToOneField(Patient, on_delete=models.CASCADE, primary_key=True, related_name='non_lues')
+    nb_non_lues = models.IntegerField(default=0)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.patient.code_anonyme} : {self.nb_non_lues} non lue(s)"
+
+
+class AccuseLecture(models.Model):
+    """
+    Audit des lectures : une ligne par analyse IA marquée lue, avec le médecin et le moment
+    où le dossier lui a été affiché. Écrit par lots par consultation.accuses (écriture différée).
+    """
+    analyse = models.ForeignKey(AnalyseIA, on_delete=models.CASCADE, related_name='accuses_lecture')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='accuses_lecture')
+    medecin = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='accuses_lecture')
+    date_lecture = models.DateTimeField()  # Affichage du dossier (et non écriture du lot)
+    date_enregistrement = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Qui a lu les analyses d'un patient, du plus récent au plus ancien
+            models.Index(fields=['patient', 'date_lecture'], name='accuse_patient_date_idx'),
+            # Lectures d'un médecin sur une période
+            models.Index(fields=['medecin', 'date_lecture'], name='accuse_medecin_date_idx'),
+        ]
 
     def __str__(self):
-        return f"RDV de {self.patient.code_anonyme} le {self.date_rdv.strftime('%d/%m/%Y')}"
\ No newline at end of file
+        return f"Analyse {self.analyse_id} lue par {self.medecin_id} le {self.date_lecture:%d/%m/%Y %H:%M}"
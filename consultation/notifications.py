@@ -0,0 +1,104 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from administration import evenements
+from administration.models import AnalyseIA
+from core import fragments
+from .models import AccuseLecture, CompteurNonLus
+
+
+# --- 1. MISE À JOUR INCRÉMENTALE ---
+def ajuster_non_lus(deltas):
+    """Applique des deltas {patient_id: n} dans la transaction courante (F() : pas de lecture préalable)"""
+    maintenant = timezone.now()
+    for patient_id, delta in deltas.items():
+        if not delta:
+            continue
+        maj = {'nb_non_lues': F('nb_non_lues') + delta, 'date_maj': maintenant}
+        # Pas de ligne = aucune non lue : un delta négatif n'a rien à décompter (ex. suppression en cascade)
+        if CompteurNonLus.objects.filter(patient_id=patient_id).update(**maj) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                CompteurNonLus.objects.create(patient_id=patient_id, nb_non_lues=delta)
+        except IntegrityError:
+            CompteurNonLus.objects.filter(patient_id=patient_id).update(**maj)
+
+    # Badges des dashboards ouverts : valeur absolue (un client qui a manqué un delta reste juste)
+    modifies = [patient_id for patient_id, delta in deltas.items() if delta]
+    if modifies:
+        fragments.invalider(CompteurNonLus)
+        comptes = dict(
+            CompteurNonLus.objects.filter(patient_id__in=modifies).values_list('patient_id', 'nb_non_lues')
+        )
+        evenements.publier_lot([
+            ('non_lues', {'patient': str(patient_id), 'nb': comptes.get(patient_id, 0)}, 'MEDECIN', str(patient_id))
+            for patient_id in modifies
+        ])
+
+
+def deltas_analyses(analyses):
+    """Deltas pour des analyses nouvellement créées (ex. bulk_create du pipeline)"""
+    return Counter(analyse.scan.patient_id for analyse in analyses if not analyse.consulte_par_medecin)
+
+
+# --- 2. LECTURE ---
+def badges(patient_ids):
+    """{patient_id: nb d'analyses non lues} pour les patients affichés, en une requête par clé primaire"""
+    if not patient_ids:
+        return {}
+    return dict(
+        CompteurNonLus.objects.filter(patient_id__in=patient_ids, nb_non_lues__gt=0)
+        .values_list('patient_id', 'nb_non_lues')
+    )
+
+
+# --- 3. LECTURE DU DOSSIER (accusés appliqués par lots : consultation.accuses) ---
+def marquer_lues(lectures):
+    """
+    `lectures` : {patient_id: {medecin_id: moment de l'affichage}}. En une transaction : chaque analyse
+    non lue est attribuée à la première lecture postérieure à sa dernière modification (une analyse
+    refaite après l'affichage reste non lue), marquée lue par un seul UPDATE pour tout le lot,
+    tracée dans AccuseLecture, et les compteurs sont ajustés. Renvoie le nombre d'analyses lues.
+    """
+    if not lectures:
+        return 0
+    with transaction.atomic():
+        non_lues = AnalyseIA.objects.select_for_update().filter(
+            scan__patient_id__in=list(lectures), consulte_par_medecin=False
+        ).values_list('pk', 'scan__patient_id', 'date_modification')
+        accuses = []
+        for pk, patient_id, modification in non_lues:
+            lecteurs = [
+                (moment, medecin_id) for medecin_id, moment in lectures[patient_id].items() if moment >= modification
+            ]
+            if lecteurs:
+                moment, medecin_id = min(lecteurs)
+                accuses.append(AccuseLecture(
+                    analyse_id=pk, patient_id=patient_id, medecin_id=medecin_id, date_lecture=moment,
+                ))
+        if not accuses:
+            return 0
+        AnalyseIA.objects.filter(pk__in=[accuse.analyse_id for accuse in accuses]).update(consulte_par_medecin=True)
+        AccuseLecture.objects.bulk_create(accuses)
+        lues_par_patient = Counter(accuse.patient_id for accuse in accuses)
+        ajuster_non_lus({patient_id: -nombre for patient_id, nombre in lues_par_patient.items()})
+    return len(accuses)
+
+
+# --- 4. RÉCONCILIATION ---
+def reconcilier_non_lus():
+    """Réécrit toute la boîte de réception à partir d'AnalyseIA (index partiel des analyses non lues)"""
+    comptes = (
+        AnalyseIA.objects.filter(consulte_par_medecin=False)
+        .values('scan__patient_id').annotate(nb=Count('pk')).values_list('scan__patient_id', 'nb')
+    )
+    with transaction.atomic():
+        lignes = [CompteurNonLus(patient_id=patient_id, nb_non_lues=nb) for patient_id, nb in comptes]
+        CompteurNonLus.objects.all().delete()
+        CompteurNonLus.objects.bulk_create(lignes, batch_size=1000)
+        fragments.invalider(CompteurNonLus)
+    return len(lignes)
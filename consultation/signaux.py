@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from administration.models import AnalyseIA
+from core import fragments
+from radiologie_ia.signaux import analyses_creees_en_masse
+from . import notifications
+from .models import RendezVous
+
+
+# --- ÉTAT INITIAL (lecture par le médecin) ---
+@receiver(post_init, sender=AnalyseIA)
+def memoriser_lecture(sender, instance, **kwargs):
+    # Champ différé : état inconnu, la transition sera ignorée (la réconciliation la rattrape)
+    instance._consulte_initial = instance.__dict__.get('consulte_par_medecin')
+
+
+# --- BOÎTE DE RÉCEPTION DES MÉDECINS ---
+@receiver(post_save, sender=AnalyseIA)
+def compter_non_lue(sender, instance, created, raw=False, **kwargs):
+    if raw or (not created and instance._consulte_initial is None):
+        return
+    non_lue_avant = not created and not instance._consulte_initial
+    non_lue_apres = not instance.consulte_par_medecin
+    if non_lue_avant != non_lue_apres:
+        notifications.ajuster_non_lus({instance.scan.patient_id: 1 if non_lue_apres else -1})
+    instance._consulte_initial = instance.consulte_par_medecin
+
+
+@receiver(post_delete, sender=AnalyseIA)
+def decompter_non_lue(sender, instance, **kwargs):
+    if instance._consulte_initial is False:
+        notifications.ajuster_non_lus({instance.scan.patient_id: -1})
+
+
+@receiver(analyses_creees_en_masse)
+def compter_non_lues_en_masse(sender, analyses, **kwargs):
+    notifications.ajuster_non_lus(notifications.deltas_analyses(analyses))
+
+
+# --- CACHE DES FRAGMENTS (panneau des RDV) ---
+@receiver(post_save, sender=RendezVous)
+@receiver(post_delete, sender=RendezVous)
+def invalider_fragments_rdv(sender, using=None, **kwargs):
+    fragments.invalider(sender, using=using)
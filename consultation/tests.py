@@ -1,3 +1,133 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.files.base import ContentFile
+from django.db.models import Count
 from django.test import TestCase
+from django.utils import timezone
+
+from administration.models import AnalyseIA, Biomarqueur, ScannerCT, Utilisateur
+from administration.tests import creer_patient
+from radiologie_ia.pipeline import analyser_lot
+from radiologie_ia.tests import FichiersTemporaires
+from . import notifications
+from .chronologie import chronologie
+from .models import CompteurNonLus, RendezVous
+
+
+class NonLuesTests(FichiersTemporaires, TestCase):
+    """Boîte de réception des médecins : compteurs par patient égaux au COUNT des analyses non lues"""
+
+    def setUp(self):
+        self.medecin = Utilisateur.objects.create_user('medecin', service='MEDECIN')
+        self.patients = [creer_patient('PC-001', 'Jean Martin'), creer_patient('PC-002', 'Marie Curie')]
+        self.numero = 0
+
+    def scan(self, patient):
+        self.numero += 1
+        return ScannerCT.objects.create(patient=patient, image_dicom=ContentFile(bytes([self.numero]), name='scan.dcm'))
+
+    def assertCompteursExacts(self):
+        attendu = dict(
+            AnalyseIA.objects.filter(consulte_par_medecin=False)
+            .values('scan__patient_id').annotate(nb=Count('pk')).values_list('scan__patient_id', 'nb')
+        )
+        self.assertEqual(notifications.badges([patient.pk for patient in self.patients]), attendu)
+        self.assertFalse(CompteurNonLus.objects.filter(nb_non_lues__lt=0).exists())
+
+    def test_creation_lecture_suppression(self):
+        jean, marie = self.patients
+        analyses = [AnalyseIA.objects.create(scan=self.scan(jean), score_malignite=0.5) for _ in range(3)]
+        AnalyseIA.objects.create(scan=self.scan(marie), score_malignite=0.5)
+        self.assertCompteursExacts()
+
+        analyses[0].consulte_par_medecin = True
+        analyses[0].save()
+        self.assertCompteursExacts()
+        # Relecture puis retour à "non lue"
+        analyse = AnalyseIA.objects.get(pk=analyses[0].pk)
+        analyse.consulte_par_medecin = False
+        analyse.save()
+        self.assertCompteursExacts()
+
+        analyses[1].delete()
+        self.assertCompteursExacts()
+        analyses[2].scan.delete()
+        self.assertCompteursExacts()
+        self.assertEqual(notifications.badges([jean.pk]), {jean.pk: 1})
+
+    def test_analyses_en_masse(self):
+        analyser_lot([self.scan(patient) for patient in self.patients for _ in range(2)])
+        self.assertCompteursExacts()
+        self.assertEqual(notifications.badges([self.patients[0].pk]), {self.patients[0].pk: 2})
+
+    def test_accuses_de_lecture(self):
+        jean, marie = self.patients
+        ancienne = AnalyseIA.objects.create(scan=self.scan(jean), score_malignite=0.5)
+        affichage = timezone.now()
+        # Analyse refaite après l'affichage du dossier : elle reste non lue
+        refaite = AnalyseIA.objects.create(scan=self.scan(jean), score_malignite=0.5)
+        AnalyseIA.objects.filter(pk=refaite.pk).update(date_modification=affichage + timedelta(seconds=1))
+        AnalyseIA.objects.create(scan=self.scan(marie), score_malignite=0.5)
+
+        self.assertEqual(notifications.marquer_lues({jean.pk: {self.medecin.pk: affichage}}), 1)
+        self.assertCompteursExacts()
+        self.assertEqual(list(ancienne.accuses_lecture.values_list('medecin_id', flat=True)), [self.medecin.pk])
+        self.assertEqual(notifications.badges([jean.pk, marie.pk]), {jean.pk: 1, marie.pk: 1})
+
+    def test_reconciliation(self):
+        AnalyseIA.objects.create(scan=self.scan(self.patients[0]), score_malignite=0.5)
+        CompteurNonLus.objects.update(nb_non_lues=7)
+        notifications.reconcilier_non_lus()
+        self.assertCompteursExacts()
+
+
+class ChronologieTests(TestCase):
+    """Fenêtres de l'historique patient : ni doublon ni trou, même quand toutes les dates sont égales"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = creer_patient('PC-001', 'Jean Martin')
+        medecin = Utilisateur.objects.create_user('medecin', service='MEDECIN')
+        jour = date(2025, 3, 1)
+        minuit = timezone.make_aware(datetime.combine(jour, time.min))
+        ScannerCT.objects.bulk_create([
+            ScannerCT(patient=cls.patient, image_dicom=f'scanners/{i}.dcm', empreinte_sha256=f'{i:064x}')
+            for i in range(7)
+        ])
+        ScannerCT.objects.update(date_upload=minuit)
+        RendezVous.objects.bulk_create([RendezVous(patient=cls.patient, medecin=medecin, date_rdv=minuit) for _ in range(6)])
+        Biomarqueur.objects.bulk_create([
+            Biomarqueur(patient=cls.patient, taux_CEA=1.0, taux_CYFRA21=1.0) for _ in range(5)
+        ])
+        Biomarqueur.objects.update(date_examen=jour)
+
+    def parcourir(self, taille):
+        vus, curseur, fenetres = [], None, 0
+        while True:
+            fenetre = chronologie(self.patient, curseur, taille)
+            self.assertLessEqual(len(fenetre), taille)
+            vus.extend((element.type, element.objet.pk) for element in fenetre)
+            fenetres += 1
+            if not fenetre.has_next():
+                return vus, fenetres
+            curseur = fenetre.suivant
+
+    def test_dates_egales(self):
+        for taille in (1, 3, 4, 20):
+            with self.subTest(taille=taille):
+                vus, fenetres = self.parcourir(taille)
+                self.assertEqual(len(vus), 18)
+                self.assertEqual(len(set(vus)), 18)
+                self.assertEqual(fenetres, -(-18 // taille))
+
+    def test_ordre_decroissant(self):
+        ScannerCT.objects.filter(pk=ScannerCT.objects.order_by('pk').first().pk).update(
+            date_upload=timezone.now()
+        )
+        fenetre = chronologie(self.patient, None, 4)
+        moments = [element.moment for element in fenetre]
+        self.assertEqual(moments, sorted(moments, reverse=True))
+        self.assertEqual(fenetre.object_list[0].type, 'scan')
 
-# Create your tests here.
+    def test_curseur_invalide(self):
+        self.assertEqual(len(chronologie(self.patient, 'altere', 5)), 5)
@@ -1,63 +1,127 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Q
-from django.core.paginator import Paginator  # Import pour la pagination
-from administration.models import Patient, AnalyseIA 
-from .models import RendezVous
+from asgiref.sync import sync_to_async
+from core.concurrence import en_parallele
+from core.fragments import fragment
+from core.pagination import PaginateurCurseur  # Pagination par curseur
+from core.routeurs import lecture_replica
+from administration.models import Patient
+from administration.recherche import filtre_recherche
+from .models import CompteurNonLus, RendezVous
+from .accuses import enregistrer_lecture
+from .chronologie import chronologie
+from .notifications import badges
 from .forms import ConsultationForm
 from django.utils import timezone
+from datetime import datetime, time, timedelta
 
 # 1. PERMISSION
 def est_medecin(user):
     return user.is_authenticated and hasattr(user, 'service') and user.service == 'MEDECIN'
 
 # 2. DASHBOARD GÉNÉRAL
-@login_required
-@user_passes_test(est_medecin)
-def dashboard_consultation(request):
-    """Interface de consultation : RDV du jour, recherche et liste globale avec pagination"""
-    maintenant = timezone.now()
-    aujourdhui = maintenant.date()
-    
-    # --- LOGIQUE DE RECHERCHE ---
-    query = request.GET.get('search', '')
+# RDV affichés dans le panneau du dashboard (les prévus peuvent s'étaler sur des mois)
+TAILLE_PANNEAU_RDV = 20
+
+def _page_patients(query, curseur):
+    """Page de patients (recherche ou liste globale, 10 par page, par curseur) avec leurs badges"""
     if query:
-        # Recherche par nom complet OU par code anonyme
+        # Recherche par nom complet OU par code anonyme (index plein texte, insensible aux accents)
         liste_patients = Patient.objects.filter(
-            Q(nom_complet__icontains=query) | Q(code_anonyme__icontains=query)
+            filtre_recherche(query, 'pk', ('nom', 'code'))
         ).order_by('-date_creation')
     else:
         liste_patients = Patient.objects.all().order_by('-date_creation')
+    patients_pagines = PaginateurCurseur(liste_patients, ('date_creation', 'id_patient'), 10).get_page(curseur)
+
+    # --- LOGIQUE DU BADGE (analyses NON LUES des seuls patients de la page) ---
+    non_lues = badges([patient.pk for patient in patients_pagines])
+    for patient in patients_pagines:
+        patient.nb_non_lues = non_lues.get(patient.pk, 0)
+    return patients_pagines
+
+
+def _rdv_du_jour(medecin, jour):
+    # Plage [minuit, minuit + 1 jour) plutôt que date_rdv__date : utilisable par l'index
+    debut_jour = timezone.make_aware(datetime.combine(jour, time.min))
+    return RendezVous.objects.filter(
+        medecin=medecin, 
+        date_rdv__gte=debut_jour,
+        date_rdv__lt=debut_jour + timedelta(days=1)
+    ).select_related('patient').order_by('date_rdv')
 
-    # --- LOGIQUE DE PAGINATION (10 patients par page) ---
-    paginator = Paginator(liste_patients, 10)
-    page_number = request.GET.get('page')
-    patients_pagines = paginator.get_page(page_number)
 
-    # --- FILTRAGE DES RDV ---
-    mes_rdv = RendezVous.objects.filter(
-        medecin=request.user, 
-        date_rdv__date=aujourdhui
+def _rdv_prevus(medecin):
+    return RendezVous.objects.filter(
+        medecin=medecin,
+        statut='PREVU'
     ).select_related('patient').order_by('date_rdv')
 
-    if not mes_rdv.exists():
-        mes_rdv = RendezVous.objects.filter(
-            medecin=request.user,
-            statut='PREVU'
-        ).select_related('patient').order_by('date_rdv')
 
-    # --- LOGIQUE DU BADGE (Uniquement les analyses NON LUES) ---
-    analyses_du_jour = [
-        str(id_p) for id_p in AnalyseIA.objects.filter(
-            consulte_par_medecin=False
-        ).values_list('scan__patient_id', flat=True)
-    ]
+# --- FRAGMENTS EN CACHE (invalidés par les signaux des modèles affichés : core.fragments) ---
+def _liste_patients(query, curseur):
+    """Liste paginée et badges : identique pour tous les médecins, par recherche et par page"""
+    return fragment('medecin:patients', (Patient, CompteurNonLus), (query, curseur), lambda: render_to_string(
+        'partials/liste_patients.html', {'patients': _page_patients(query, curseur), 'search_query': query}
+    ))
+
+
+def _panneau_rdv(medecin, jour):
+    """RDV du jour du médecin, ou à défaut ses RDV prévus : par médecin et par jour"""
+    def rendre():
+        requete = _rdv_du_jour(medecin, jour)
+        mes_rdv = list(requete[:TAILLE_PANNEAU_RDV])
+        du_jour = bool(mes_rdv)
+        if not du_jour:
+            requete = _rdv_prevus(medecin)
+            mes_rdv = list(requete[:TAILLE_PANNEAU_RDV])
+        # Seules les lignes affichées sont bornées : le badge garde le vrai nombre de RDV
+        nb_rdv = requete.count() if len(mes_rdv) == TAILLE_PANNEAU_RDV else len(mes_rdv)
+        return render_to_string('partials/rdv_medecin.html', {
+            'rdv': mes_rdv, 'nb_rdv': nb_rdv, 'nb_masques': nb_rdv - len(mes_rdv),
+            'du_jour': du_jour, 'date_serveur': jour,
+        })
+    return fragment('medecin:rdv', (RendezVous, Patient), (medecin.pk, jour), rendre)
+
+
+@login_required
+@user_passes_test(est_medecin)
+@lecture_replica
+def dashboard_consultation(request):
+    """Interface de consultation : RDV du jour, recherche et liste globale avec pagination"""
+    aujourdhui = timezone.now().date()
+    query = request.GET.get('search', '')
 
     return render(request, 'dashboards/medecin.html', {
-        'rdv': mes_rdv,
-        'nb_rdv': mes_rdv.count(),
-        'patients': patients_pagines,  # On envoie l'objet paginé
-        'analyses_du_jour': analyses_du_jour,
+        'panneau_rdv': _panneau_rdv(request.user, aujourdhui),
+        'liste_patients': _liste_patients(query, request.GET.get('curseur')),
+        'date_serveur': aujourdhui,
+        'search_query': query
+    })
+
+
+@login_required
+@user_passes_test(est_medecin)
+@lecture_replica
+async def dashboard_consultation_async(request):
+    """
+    Variante ASGI : la liste des patients (et ses badges) et le panneau des RDV sont lus
+    (cache ou base) en même temps, chacun dans un thread avec sa connexion.
+    """
+    request.user = medecin = await request.auser()
+    aujourdhui = timezone.now().date()
+    query, curseur = request.GET.get('search', ''), request.GET.get('curseur')
+
+    liste_patients, panneau_rdv = await en_parallele(
+        lambda: _liste_patients(query, curseur),
+        lambda: _panneau_rdv(medecin, aujourdhui),
+    )
+
+    # Rendu hors de la boucle : le gabarit lit encore la session (messages)
+    return await sync_to_async(render, thread_sensitive=False)(request, 'dashboards/medecin.html', {
+        'panneau_rdv': panneau_rdv,
+        'liste_patients': liste_patients,
         'date_serveur': aujourdhui,
         'search_query': query
     })
@@ -66,13 +130,8 @@ def dashboard_consultation(request):
 @login_required
 @user_passes_test(est_medecin)
 def effectuer_consultation(request, rdv_id):
-    """Page de saisie des notes cliniques avec historique des scans"""
-    rdv = get_object_or_404(RendezVous, pk=rdv_id)
-    
-    try:
-        scans_patient = rdv.patient.scans.all().order_by('-date_upload')
-    except AttributeError:
-        scans_patient = rdv.patient.scannerct_set.all().order_by('-date_upload')
+    """Page de saisie des notes cliniques avec l'historique du patient (fenêtre récente)"""
+    rdv = get_object_or_404(RendezVous.objects.select_related('patient__profil'), pk=rdv_id)
 
     if request.method == 'POST':
         form = ConsultationForm(request.POST, instance=rdv)
@@ -87,7 +146,8 @@ def effectuer_consultation(request, rdv_id):
     return render(request, 'dashboards/effectuer_consultation.html', {
         'form': form,
         'rdv': rdv,
-        'scans': scans_patient
+        'patient': rdv.patient,
+        'chronologie': chronologie(rdv.patient, request.GET.get('avant')),
     })
 
 # 4. DOSSIER MÉDICAL
@@ -95,23 +155,24 @@ def effectuer_consultation(request, rdv_id):
 @user_passes_test(est_medecin)
 def detail_patient(request, patient_id):
     """Affiche le dossier médical et marque les notifications comme lues"""
-    patient = get_object_or_404(Patient, pk=patient_id)
-    
-    # Marquer comme lu
-    AnalyseIA.objects.filter(scan__patient=patient, consulte_par_medecin=False).update(consulte_par_medecin=True)
-    
-    try:
-        historique_rdv = patient.rendezvous.all().order_by('-date_rdv')
-    except AttributeError:
-        historique_rdv = patient.rendezvous_set.all().order_by('-date_rdv')
+    patient = get_object_or_404(Patient.objects.select_related('profil'), pk=patient_id)
     
-    try:
-        scans = patient.scans.all().order_by('-date_upload')
-    except AttributeError:
-        scans = patient.scannerct_set.all().order_by('-date_upload')
+    # Accusé de lecture mis en tampon (écrit par lots en arrière-plan) ; rien si aucune analyse non lue
+    enregistrer_lecture(patient, request.user)
 
     return render(request, 'dashboards/detail_patient.html', {
         'patient': patient,
-        'historique': historique_rdv,
-        'scans': scans
+        'chronologie': chronologie(patient, request.GET.get('avant')),
+    })
+
+
+@login_required
+@user_passes_test(est_medecin)
+@lecture_replica
+def chronologie_patient(request, patient_id):
+    """Fenêtre suivante de l'historique ("Charger plus ancien"), en HTML à ajouter à la page"""
+    patient = get_object_or_404(Patient, pk=patient_id)
+    return render(request, 'partials/chronologie.html', {
+        'patient': patient,
+        'chronologie': chronologie(patient, request.GET.get('avant')),
     })
\ No newline at end of file
@@ -0,0 +1,21 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _executer(fonction):
+    # Thread du pool : sa connexion persistante est vérifiée (âge, erreurs) comme en début de requête
+    close_old_connections()
+    return fonction()
+
+
+async def en_parallele(*fonctions):
+    """
+    Exécute des fonctions synchrones (requêtes ORM) chacune dans un thread du pool, avec sa propre
+    connexion, et attend tous les résultats (dans l'ordre des fonctions). Le contexte (lecture_replica)
+    est copié dans chaque thread.
+    """
+    return await asyncio.gather(*(
+        sync_to_async(_executer, thread_sensitive=False)(fonction) for fonction in fonctions
+    ))
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from administration import evenements
+from core.concurrence import en_parallele
+from core.media import peut_acceder
+
+logger = logging.getLogger(__name__)
+
+# Un seul poller par processus interroge la table d'événements, quel que soit le nombre de clients
+INTERVALLE_POLLER = getattr(settings, 'PULMOCARE_SSE_INTERVALLE', 1.0)
+# Commentaire SSE envoyé aux connexions inactives (proxys, équilibreurs de charge)
+BATTEMENT = getattr(settings, 'PULMOCARE_SSE_BATTEMENT', 20.0)
+# Événements en attente par client : au-delà, le client est déconnecté et rejoue depuis Last-Event-ID
+TAILLE_FILE = 256
+# Délai de reconnexion conseillé au navigateur (ms)
+RECONNEXION = 3000
+
+
+# --- 1. DIFFUSION (par boucle d'événements) ---
+class Abonnement:
+    def __init__(self, service):
+        self.service = service
+        self.file = asyncio.Queue(TAILLE_FILE)
+        self.sature = False
+
+    def pousser(self, evenement):
+        if evenement['service'] not in ('', self.service) or self.sature:
+            return
+        try:
+            self.file.put_nowait(evenement)
+        except asyncio.QueueFull:
+            # Client trop lent : on coupe plutôt que de retenir des événements sans limite
+            self.sature = True
+            self.file.get_nowait()
+            self.file.put_nowait(None)
+
+
+class Diffuseur:
+    """
+    Poller de la table Evenement (une requête par intervalle, tant qu'il y a des abonnés)
+    qui répartit chaque événement dans les files des clients connectés.
+    """
+
+    def __init__(self):
+        self.abonnes = set()
+        self.dernier = None
+        self.tache = None
+        self.verrou = asyncio.Lock()
+
+    async def abonner(self, service):
+        """Renvoie (abonnement, borne) : les événements d'id > borne arriveront dans la file"""
+        async with self.verrou:
+            if self.dernier is None:
+                self.dernier, = await en_parallele(evenements.dernier_id)
+            abonnement = Abonnement(service)
+            self.abonnes.add(abonnement)
+            if self.tache is None or self.tache.done():
+                self.tache = asyncio.create_task(self.boucle())
+            return abonnement, self.dernier
+
+    def desabonner(self, abonnement):
+        self.abonnes.discard(abonnement)
+
+    async def boucle(self):
+        while self.abonnes:
+            await asyncio.sleep(INTERVALLE_POLLER)
+            try:
+                lus, = await en_parallele(lambda: evenements.lire_depuis(self.dernier))
+            except Exception:
+                # Base momentanément indisponible : les clients restent connectés, on réessaie au tour suivant
+                logger.exception("Lecture des événements impossible")
+                continue
+            for evenement in lus:
+                for abonnement in list(self.abonnes):
+                    abonnement.pousser(evenement)
+            if lus:
+                self.dernier = lus[-1]['id']
+        # Plus personne : le prochain abonné repartira du dernier id en base
+        self.dernier = None
+
+
+_diffuseurs = weakref.WeakKeyDictionary()
+
+
+def diffuseur():
+    boucle = asyncio.get_running_loop()
+    if boucle not in _diffuseurs:
+        _diffuseurs[boucle] = Diffuseur()
+    return _diffuseurs[boucle]
+
+
+# --- 2. FORMAT SSE ---
+def message(evenement):
+    donnees = json.dumps(evenement['donnees'], separators=(',', ':'))
+    return f"id: {evenement['id']}\nevent: {evenement['type']}\ndata: {donnees}\n\n"
+
+
+def _dernier_recu(request):
+    try:
+        return int(request.headers.get('Last-Event-ID') or request.GET.get('depuis') or 0)
+    except ValueError:
+        return 0
+
+
+async def flux(service, dernier_recu):
+    abonnement, borne = await diffuseur().abonner(service)
+    try:
+        yield f"retry: {RECONNEXION}\n\n"
+        # Reconnexion : événements manqués jusqu'à l'abonnement, les suivants viennent de la file
+        if dernier_recu:
+            (manques, complet), = await en_parallele(lambda: evenements.rattrapage(dernier_recu, borne, service))
+            if not complet:
+                # Rattrapage tronqué ou purgé : la page se recharge plutôt que d'afficher un état partiel
+                yield message({'id': borne, 'type': 'resynchroniser', 'donnees': {}})
+            for evenement in manques:
+                yield message(evenement)
+        while True:
+            try:
+                evenement = await asyncio.wait_for(abonnement.file.get(), BATTEMENT)
+            except asyncio.TimeoutError:
+                yield ": battement\n\n"
+                continue
+            if evenement is None:
+                return
+            yield message(evenement)
+    finally:
+        diffuseur().desabonner(abonnement)
+
+
+# --- 3. VUES ---
+@require_GET
+@login_required
+@user_passes_test(peut_acceder)
+async def flux_evenements_async(request):
+    """Flux text/event-stream des événements du service de l'utilisateur (servi sous ASGI)"""
+    utilisateur = await request.auser()
+    reponse = StreamingHttpResponse(flux(utilisateur.service, _dernier_recu(request)), content_type='text/event-stream')
+    reponse['Cache-Control'] = 'no-cache'
+    reponse['X-Accel-Buffering'] = 'no'  # nginx : pas de mise en tampon du flux
+    return reponse
+
+
+@require_GET
+@login_required
+@user_passes_test(peut_acceder)
+def flux_evenements(request):
+    """Sous WSGI, une connexion longue immobiliserait un thread : 204 arrête EventSource, les pages se rechargent"""
+    return HttpResponse(status=204)
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.safestring import mark_safe
+
+from core.metriques import histogrammes
+
+logger = logging.getLogger(__name__)
+
+ACTIF = getattr(settings, 'PULMOCARE_FRAGMENTS', True)
+ALIAS = getattr(settings, 'PULMOCARE_FRAGMENTS_CACHE', 'default')
+# Filet de sécurité : l'invalidation est faite par les générations, la durée borne une écriture oubliée
+DUREE = getattr(settings, 'PULMOCARE_FRAGMENTS_DUREE', 600)
+
+
+def _cache():
+    return caches[ALIAS]
+
+
+def cle_generation(modele):
+    return f'generation:{modele._meta.label_lower}'
+
+
+# --- 1. GÉNÉRATIONS PAR MODÈLE ---
+def invalider(*modeles, using=None):
+    """
+    Nouvelle génération pour chaque modèle, après le commit de la transaction en cours : un fragment
+    rendu avant le commit reste rangé sous l'ancienne génération, qui n'est plus jamais lue.
+    Appelé par les signaux post_save / post_delete et par les écritures groupées (qui n'en émettent pas).
+    """
+    if not ACTIF or not modeles:
+        return
+    # Jeton aléatoire plutôt qu'un incrément : aucune mise à jour perdue entre workers concurrents
+    generation = uuid.uuid4().hex[:12]
+    cles = {cle_generation(modele): generation for modele in modeles}
+    transaction.on_commit(lambda: _cache().set_many(cles, None), using=using)
+
+
+def generations(modeles):
+    """Générations courantes ; un modèle jamais invalidé (ou évincé du cache) en reçoit une neuve"""
+    cache = _cache()
+    cles = [cle_generation(modele) for modele in modeles]
+    valeurs = cache.get_many(cles)
+    for cle in cles:
+        if cle not in valeurs:
+            cache.add(cle, uuid.uuid4().hex[:12], None)
+            valeurs[cle] = cache.get(cle)
+    return [valeurs[cle] for cle in cles]
+
+
+# --- 2. FRAGMENTS ---
+def fragment(nom, modeles, variantes, rendre):
+    """
+    HTML du fragment `nom`, servi depuis le cache tant qu'aucun des `modeles` n'a changé.
+    `variantes` : ce dont dépend le rendu en plus des données (utilisateur, curseur, recherche...).
+    `rendre()` (requêtes et rendu) n'est appelé qu'en cas d'absence.
+    """
+    if not ACTIF:
+        return mark_safe(rendre())
+    cache = _cache()
+    empreinte = hashlib.md5(
+        repr([generations(modeles), *variantes]).encode(), usedforsecurity=False
+    ).hexdigest()
+    cle = f'fragment:{nom}:{empreinte}'
+    html = cache.get(cle)
+    try:
+        histogrammes.compter_cache(nom, html is not None)
+    except OSError:
+        logger.exception("Enregistrement des métriques impossible")
+    if html is None:
+        html = rendre()
+        cache.set(cle, html, DUREE)
+    return mark_safe(html)
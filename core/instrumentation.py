@@ -0,0 +1,203 @@
+import contextvars
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils.decorators import sync_and_async_middleware
+from django.views.decorators.http import require_GET
+
+from core.metriques import NB_FENETRES, histogrammes
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = getattr(settings, 'PULMOCARE_INSTRUMENTATION', True)
+# Au-delà de ce temps total, une fraction des requêtes est journalisée avec ses requêtes SQL les plus lentes
+SEUIL_LENTE_MS = getattr(settings, 'PULMOCARE_REQUETE_LENTE_MS', 500)
+ECHANTILLON_LENTES = getattr(settings, 'PULMOCARE_REQUETES_LENTES_ECHANTILLON', 0.1)
+NB_SQL_JOURNAL = 5
+TAILLE_SQL_JOURNAL = 1000  # Caractères de chaque requête dans le journal (paramètres jamais journalisés)
+NON_RESOLUE = '(non résolu)'
+
+
+# --- 1. MESURE DE LA REQUÊTE EN COURS ---
+class Mesure:
+    """
+    Compteurs d'une requête HTTP. Partagée (par le contexte) avec les threads où la vue exécute
+    ses requêtes (sync_to_async, en_parallele) : temps SQL cumulés, d'où le verrou.
+    """
+
+    def __init__(self):
+        self.debut = time.perf_counter()
+        self.verrou = threading.Lock()
+        self.nb_requetes = 0
+        self.sql = 0.0
+        self.rendu = 0.0
+        self.plus_lentes = []  # Tas des NB_SQL_JOURNAL requêtes les plus lentes : (durée, sql)
+
+    def ajouter_sql(self, duree, sql):
+        with self.verrou:
+            self.nb_requetes += 1
+            self.sql += duree
+            if len(self.plus_lentes) < NB_SQL_JOURNAL:
+                heapq.heappush(self.plus_lentes, (duree, sql))
+            elif duree > self.plus_lentes[0][0]:
+                heapq.heapreplace(self.plus_lentes, (duree, sql))
+
+    def ajouter_rendu(self, duree):
+        with self.verrou:
+            self.rendu += duree
+
+
+_mesure = contextvars.ContextVar('pulmocare_mesure', default=None)
+
+
+@contextmanager
+def mesurer_rendu():
+    """Compte un rendu hors gabarits Django (ex. PDF) dans le temps de rendu de la requête en cours"""
+    mesure = _mesure.get()
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        if mesure is not None:
+            mesure.ajouter_rendu(time.perf_counter() - debut)
+
+
+# --- 2. SQL : EXECUTE WRAPPER SUR CHAQUE CONNEXION ---
+def chronometrer_sql(execute, sql, params, many, context):
+    mesure = _mesure.get()
+    if mesure is None:
+        # Commande de gestion, worker : rien à mesurer
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure.ajouter_sql(time.perf_counter() - debut, sql)
+
+
+def installer_chronometre(connection, **kwargs):
+    """
+    Posé sur toutes les connexions, y compris celles des threads du pool (vues async) :
+    connection.execute_wrapper() dans le middleware ne couvrirait que le thread courant.
+    """
+    if chronometrer_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(chronometrer_sql)
+
+
+if ACTIVE:
+    connection_created.connect(installer_chronometre, dispatch_uid='pulmocare_chronometre_sql')
+    for _connexion in connections.all(initialized_only=True):
+        installer_chronometre(_connexion)
+
+
+# --- 3. GABARITS : TEMPS DE RENDU ---
+class GabaritMesure(Template):
+    def render(self, context=None, request=None):
+        mesure = _mesure.get()
+        if mesure is None:
+            return super().render(context, request)
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            # Comprend le SQL des querysets évalués par le gabarit (aussi compté dans `sql`)
+            mesure.ajouter_rendu(time.perf_counter() - debut)
+
+
+class GabaritsMesures(DjangoTemplates):
+    """Moteur DjangoTemplates dont les rendus (render, render_to_string) sont chronométrés"""
+
+    def from_string(self, template_code):
+        return GabaritMesure(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return GabaritMesure(super().get_template(template_name).template, self)
+
+
+# --- 4. MIDDLEWARE ---
+def _terminer(request, reponse, mesure):
+    total = (time.perf_counter() - mesure.debut) * 1000
+    sql, rendu = mesure.sql * 1000, mesure.rendu * 1000
+    reponse['Server-Timing'] = (
+        f'sql;dur={sql:.1f};desc="{mesure.nb_requetes} req.", rendu;dur={rendu:.1f}, total;dur={total:.1f}'
+    )
+    route = request.resolver_match.view_name if request.resolver_match else NON_RESOLUE
+    try:
+        histogrammes.enregistrer(route, total, sql, rendu, mesure.nb_requetes)
+    except OSError:
+        # Fichier de métriques inaccessible : la requête est servie quand même
+        logger.exception("Enregistrement des métriques impossible")
+
+    if total >= SEUIL_LENTE_MS and random.random() < ECHANTILLON_LENTES:
+        lentes = '\n'.join(
+            f"  {duree * 1000:8.1f} ms  {texte[:TAILLE_SQL_JOURNAL]}"
+            for duree, texte in sorted(mesure.plus_lentes, reverse=True)
+        )
+        logger.warning(
+            "Requête lente %s %s (%s, %s) : %.0f ms, dont SQL %.0f ms (%d requêtes) et rendu %.0f ms\n%s",
+            request.method, request.path, route, reponse.status_code, total, sql, mesure.nb_requetes, rendu,
+            lentes or "  (aucune requête SQL)",
+        )
+
+
+@sync_and_async_middleware
+def instrumenter(get_response):
+    """
+    Temps total, SQL (nombre et durée) et rendu de chaque requête : en-tête Server-Timing,
+    histogrammes par nom de route (core.metriques) et journal échantillonné des requêtes lentes.
+    """
+    if not ACTIVE:
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            mesure = Mesure()
+            jeton = _mesure.set(mesure)
+            try:
+                reponse = await get_response(request)
+            finally:
+                # Un flux (SSE) continue après le retour de la réponse : il n'est plus mesuré
+                _mesure.reset(jeton)
+            _terminer(request, reponse, mesure)
+            return reponse
+    else:
+        def middleware(request):
+            mesure = Mesure()
+            jeton = _mesure.set(mesure)
+            try:
+                reponse = get_response(request)
+            finally:
+                _mesure.reset(jeton)
+            _terminer(request, reponse, mesure)
+            return reponse
+    return middleware
+
+
+# --- 5. ENDPOINT DES MÉTRIQUES ---
+def est_staff(user):
+    return user.is_active and user.is_staff
+
+
+@require_GET
+@login_required
+@user_passes_test(est_staff)
+def metriques(request):
+    """Percentiles par route (ms) et taux de succès des fragments en cache, tous workers du nœud confondus"""
+    routes = histogrammes.synthese()
+    return JsonResponse({
+        'fenetre_minutes': NB_FENETRES,
+        'routes': dict(sorted(routes.items(), key=lambda item: item[1]['nb'], reverse=True)),
+        'fragments': histogrammes.synthese_caches(),
+    }, json_dumps_params={'ensure_ascii': False})
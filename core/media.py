@@ -0,0 +1,145 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from consultation.views import est_medecin
+from radiologie_ia.views import est_radiologue
+
+# Mode d'envoi : None = Django lit le fichier, 'x-accel-redirect' = nginx, 'x-sendfile' = Apache/lighttpd
+MODE_ENVOI = getattr(settings, 'PULMOCARE_MEDIA_ENVOI', None)
+# Location nginx `internal` qui pointe sur MEDIA_ROOT (utilisée avec X-Accel-Redirect)
+PREFIXE_ACCEL = getattr(settings, 'PULMOCARE_MEDIA_PREFIXE_ACCEL', '/media-protege/')
+TAILLE_BLOC = 64 * 1024
+# Plage unique "bytes=debut-fin" ; les plages multiples reçoivent le fichier entier (autorisé par la RFC 9110)
+PLAGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+mimetypes.add_type('application/dicom', '.dcm')
+
+
+def peut_acceder(user):
+    return est_radiologue(user) or est_medecin(user)
+
+
+# --- 1. RÉSOLUTION DU FICHIER ---
+def _chemin(chemin_relatif):
+    """Chemin absolu sous MEDIA_ROOT ; 404 pour une sortie du dossier ou un téléversement inachevé"""
+    try:
+        chemin = safe_join(settings.MEDIA_ROOT, chemin_relatif)
+    except SuspiciousFileOperation:
+        raise Http404("Fichier introuvable")
+    if chemin.endswith('.part') or not os.path.isfile(chemin):
+        raise Http404("Fichier introuvable")
+    return chemin
+
+
+def _cache_control(request):
+    # URL versionnée (?v= des aperçus) : le contenu ne change jamais à cette adresse
+    return 'private, max-age=31536000, immutable' if request.GET.get('v') else 'private, no-cache'
+
+
+# --- 2. DÉLÉGATION AU SERVEUR FRONTAL ---
+def _reponse_deleguee(request, chemin_relatif, chemin):
+    """Réponse vide : le serveur frontal envoie le fichier (Range, ETag et sendfile gérés de son côté)"""
+    reponse = HttpResponse(content_type=mimetypes.guess_type(chemin)[0] or 'application/octet-stream')
+    if MODE_ENVOI == 'x-accel-redirect':
+        reponse['X-Accel-Redirect'] = PREFIXE_ACCEL + quote(chemin_relatif)
+    else:
+        reponse['X-Sendfile'] = chemin
+    reponse['Cache-Control'] = _cache_control(request)
+    return reponse
+
+
+# --- 3. ENVOI PAR DJANGO (Range, ETag) ---
+class _Tranche:
+    """Lecture bornée à `longueur` octets à partir de la position courante du fichier"""
+
+    def __init__(self, fichier, longueur):
+        self.fichier, self.restant, self.name = fichier, longueur, fichier.name
+
+    def read(self, taille=-1):
+        taille = self.restant if taille < 0 else min(taille, self.restant)
+        donnees = self.fichier.read(taille)
+        self.restant -= len(donnees)
+        return donnees
+
+    def close(self):
+        self.fichier.close()
+
+
+class ReponseFichier(FileResponse):
+    block_size = TAILLE_BLOC
+
+
+def _plage(request, taille, etag, derniere_modification):
+    """(debut, fin incluse) demandés, None pour le fichier entier, ou False si la plage est hors du fichier"""
+    entete = request.headers.get('Range', '')
+    correspondance = PLAGE.match(entete.replace(' ', ''))
+    if not correspondance:
+        return None
+    if_range = request.headers.get('If-Range')
+    # If-Range : la plage n'a de sens que si le client a toujours la même version du fichier
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != derniere_modification:
+        return None
+    debut, fin = correspondance.groups()
+    if not (debut or fin):
+        return None
+    if not debut:
+        # Suffixe "bytes=-n" : les n derniers octets
+        if int(fin) == 0:
+            return False
+        return max(taille - int(fin), 0), taille - 1
+    debut = int(debut)
+    fin = min(int(fin), taille - 1) if fin else taille - 1
+    if debut >= taille or debut > fin:
+        return False
+    return debut, fin
+
+
+def _reponse_fichier(request, chemin):
+    statistiques = os.stat(chemin)
+    taille, derniere_modification = statistiques.st_size, int(statistiques.st_mtime)
+    # Même forme que l'ETag de nginx (date, taille) : aucune lecture du fichier pour le calculer
+    etag = quote_etag(f'{statistiques.st_mtime_ns:x}-{taille:x}')
+
+    reponse = get_conditional_response(request, etag=etag, last_modified=derniere_modification)
+    if reponse is None:
+        plage = _plage(request, taille, etag, derniere_modification)
+        if plage is False:
+            reponse = HttpResponse(status=416)
+            reponse['Content-Range'] = f'bytes */{taille}'
+        elif plage is None:
+            reponse = ReponseFichier(open(chemin, 'rb'))
+        else:
+            debut, fin = plage
+            fichier = open(chemin, 'rb')
+            fichier.seek(debut)
+            reponse = ReponseFichier(_Tranche(fichier, fin - debut + 1), status=206)
+            reponse['Content-Length'] = fin - debut + 1
+            reponse['Content-Range'] = f'bytes {debut}-{fin}/{taille}'
+    reponse['Accept-Ranges'] = 'bytes'
+    reponse['ETag'] = etag
+    reponse['Last-Modified'] = http_date(derniere_modification)
+    reponse['Cache-Control'] = _cache_control(request)
+    return reponse
+
+
+# --- 4. VUE ---
+@require_safe
+@login_required
+@user_passes_test(peut_acceder)
+def servir_media(request, chemin):
+    """Fichiers MEDIA (scanners, aperçus) réservés aux services clinique et diagnostic"""
+    chemin_absolu = _chemin(chemin)
+    if MODE_ENVOI:
+        return _reponse_deleguee(request, chemin, chemin_absolu)
+    return _reponse_fichier(request, chemin_absolu)
@@ -0,0 +1,290 @@
+import fcntl
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+NB_ROUTES = 128          # Routes distinctes suivies (les suivantes sont comptées sous '(autres)')
+NB_CACHES = 32           # Fragments en cache suivis (succès / absences, core.fragments)
+NB_FENETRES = 15         # Fenêtres glissantes d'une minute : percentiles sur le dernier quart d'heure
+NB_SEAUX = 64            # Seaux logarithmiques : 0,1 ms x 1,25^i, jusqu'à ~2 min (erreur relative < 25 %)
+BASE_MS, RAISON = 0.1, 1.25
+MESURES = ('total', 'sql', 'rendu')
+# Par fenêtre : minute, nb, puis sommes (µs) et nombre de requêtes SQL, puis un histogramme par mesure
+MINUTE, NB, SOMME_TOTAL, SOMME_SQL, SOMME_RENDU, SOMME_REQUETES = range(6)
+TAILLE_ENTETE_FENETRE = 6
+TAILLE_FENETRE = TAILLE_ENTETE_FENETRE + len(MESURES) * NB_SEAUX
+# Par fenêtre d'un cache : minute, succès, absences
+HITS, MISSES = 1, 2
+TAILLE_FENETRE_CACHE = 3
+TAILLE_NOM = 96
+MAGIQUE = b'PCMETR02'
+DEBUT_NOMS = len(MAGIQUE)
+DEBUT_NOMS_CACHES = DEBUT_NOMS + NB_ROUTES * TAILLE_NOM
+DEBUT_DONNEES = DEBUT_NOMS_CACHES + NB_CACHES * TAILLE_NOM  # multiple de 8
+DEBUT_CACHES = NB_ROUTES * NB_FENETRES * TAILLE_FENETRE  # En valeurs de 8 octets, après les histogrammes
+TAILLE_FICHIER = DEBUT_DONNEES + (DEBUT_CACHES + NB_CACHES * NB_FENETRES * TAILLE_FENETRE_CACHE) * 8
+AUTRES = '(autres)'
+
+
+def fichier():
+    """Fichier projeté en mémoire partagé par tous les workers d'un nœud (même chemin pour tous)"""
+    return getattr(settings, 'PULMOCARE_METRIQUES_FICHIER', os.path.join(settings.BASE_DIR, 'var', 'metriques.bin'))
+
+
+def seau(duree_ms):
+    if duree_ms <= BASE_MS:
+        return 0
+    return min(NB_SEAUX - 1, int(math.log(duree_ms / BASE_MS, RAISON)) + 1)
+
+
+def borne_seau(indice):
+    """Borne haute (ms) du seau : valeur rapportée pour un percentile qui y tombe"""
+    return BASE_MS * RAISON ** indice
+
+
+class Histogrammes:
+    """
+    Histogrammes par route et taux de succès des caches dans un fichier projeté (mmap MAP_SHARED) :
+    chaque worker écrit dans la même mémoire, sans serveur de métriques. Les écritures sont sérialisées par un verrou
+    fcntl (entre processus) et un verrou local (entre threads) ; quelques µs par requête.
+    """
+
+    def __init__(self, chemin=None):
+        self.chemin = chemin or fichier()
+        self.memoire = None
+        self.routes = {}
+        self.caches = {}
+        self.verrou = threading.Lock()
+
+    # --- Ouverture (paresseuse, après le fork des workers) ---
+    def ouvrir(self):
+        if self.memoire is not None:
+            return
+        with self.verrou:
+            if self.memoire is None:
+                self._projeter()
+
+    def _projeter(self):
+        os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+        while True:
+            descripteur = os.open(self.chemin, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.lockf(descripteur, fcntl.LOCK_EX)
+                if os.stat(self.chemin).st_ino != os.fstat(descripteur).st_ino:
+                    # Remplacé par un autre worker pendant l'attente du verrou : on rouvre le nouveau
+                    os.close(descripteur)
+                    continue
+                taille = os.fstat(descripteur).st_size
+                if taille == 0:
+                    # Nouveau fichier : agrandi (jamais réduit), personne ne l'a encore projeté
+                    os.ftruncate(descripteur, TAILLE_FICHIER)
+                    os.pwrite(descripteur, MAGIQUE, 0)
+                elif taille != TAILLE_FICHIER or os.pread(descripteur, 8, 0) != MAGIQUE:
+                    # Disposition modifiée : d'autres workers peuvent projeter l'ancien fichier, le réduire
+                    # leur vaudrait un SIGBUS. Un fichier neuf prend sa place, l'ancien reste valide pour eux.
+                    self._remplacer()
+                    os.close(descripteur)
+                    continue
+                fcntl.lockf(descripteur, fcntl.LOCK_UN)
+                memoire = mmap.mmap(descripteur, TAILLE_FICHIER)
+            except BaseException:
+                os.close(descripteur)
+                raise
+            break
+        self.descripteur = descripteur
+        self.valeurs = memoryview(memoire)[DEBUT_DONNEES:].cast('Q')
+        self.memoire = memoire
+
+    def fermer(self):
+        """Libère la projection ; le prochain accès rouvre `self.chemin`"""
+        with self.verrou:
+            if self.memoire is None:
+                return
+            self.valeurs.release()
+            self.memoire.close()
+            os.close(self.descripteur)
+            self.memoire = None
+            self.routes.clear()
+            self.caches.clear()
+
+    def _remplacer(self):
+        descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(self.chemin), prefix='.metriques-')
+        try:
+            os.ftruncate(descripteur, TAILLE_FICHIER)
+            os.pwrite(descripteur, MAGIQUE, 0)
+            os.fchmod(descripteur, 0o600)
+        finally:
+            os.close(descripteur)
+        os.replace(temporaire, self.chemin)
+
+    def _verrouiller(self):
+        self.verrou.acquire()
+        fcntl.lockf(self.descripteur, fcntl.LOCK_EX)
+
+    def _deverrouiller(self):
+        fcntl.lockf(self.descripteur, fcntl.LOCK_UN)
+        self.verrou.release()
+
+    # --- Tables des noms (routes, caches) ---
+    def _nom(self, indice, debut_noms=DEBUT_NOMS):
+        debut = debut_noms + indice * TAILLE_NOM
+        return bytes(self.memoire[debut:debut + TAILLE_NOM]).rstrip(b'\0').decode('utf-8', 'replace')
+
+    def _indice(self, nom, connus, debut_noms, nb):
+        """Indice du nom (réservé au premier passage, sous verrou) ; la dernière case regroupe le reste"""
+        if nom in connus:
+            return connus[nom]
+        cle = nom.encode('utf-8')[:TAILLE_NOM].decode('utf-8', 'ignore')
+        for indice in range(nb - 1):
+            existant = self._nom(indice, debut_noms)
+            if not existant:
+                debut = debut_noms + indice * TAILLE_NOM
+                code = cle.encode('utf-8')
+                self.memoire[debut:debut + len(code)] = code
+            if not existant or existant == cle:
+                connus[nom] = indice
+                return indice
+        debut = debut_noms + (nb - 1) * TAILLE_NOM
+        self.memoire[debut:debut + len(AUTRES)] = AUTRES.encode()
+        connus[nom] = nb - 1
+        return nb - 1
+
+    def _indice_route(self, route):
+        return self._indice(route, self.routes, DEBUT_NOMS, NB_ROUTES)
+
+    # --- Écriture ---
+    def enregistrer(self, route, total_ms, sql_ms, rendu_ms, nb_requetes):
+        self.ouvrir()
+        minute = int(time.time() // 60)
+        self._verrouiller()
+        try:
+            indice = self._indice_route(route)
+            debut = (indice * NB_FENETRES + minute % NB_FENETRES) * TAILLE_FENETRE
+            v = self.valeurs
+            if v[debut + MINUTE] != minute:
+                # Fenêtre d'il y a NB_FENETRES minutes : réutilisée
+                v[debut:debut + TAILLE_FENETRE] = memoryview(bytes(TAILLE_FENETRE * 8)).cast('Q')
+                v[debut + MINUTE] = minute
+            v[debut + NB] += 1
+            v[debut + SOMME_TOTAL] += int(total_ms * 1000)
+            v[debut + SOMME_SQL] += int(sql_ms * 1000)
+            v[debut + SOMME_RENDU] += int(rendu_ms * 1000)
+            v[debut + SOMME_REQUETES] += nb_requetes
+            for rang, duree in enumerate((total_ms, sql_ms, rendu_ms)):
+                v[debut + TAILLE_ENTETE_FENETRE + rang * NB_SEAUX + seau(duree)] += 1
+        finally:
+            self._deverrouiller()
+
+    def compter_cache(self, nom, succes):
+        """Un accès au cache `nom` : succès (contenu servi depuis le cache) ou absence (recalcul)"""
+        self.ouvrir()
+        minute = int(time.time() // 60)
+        self._verrouiller()
+        try:
+            indice = self._indice(nom, self.caches, DEBUT_NOMS_CACHES, NB_CACHES)
+            debut = DEBUT_CACHES + (indice * NB_FENETRES + minute % NB_FENETRES) * TAILLE_FENETRE_CACHE
+            v = self.valeurs
+            if v[debut + MINUTE] != minute:
+                v[debut + HITS] = v[debut + MISSES] = 0
+                v[debut + MINUTE] = minute
+            v[debut + (HITS if succes else MISSES)] += 1
+        finally:
+            self._deverrouiller()
+
+    # --- Lecture (endpoint des métriques) ---
+    def synthese(self):
+        """{route: {nb, par_minute, requetes_sql, total: {moyenne, p50, p95, p99}, sql: ..., rendu: ...}}"""
+        self.ouvrir()
+        minute = int(time.time() // 60)
+        self._verrouiller()
+        try:
+            copie = self.valeurs.tolist()
+            noms = [self._nom(indice) for indice in range(NB_ROUTES)]
+        finally:
+            self._deverrouiller()
+
+        resultat = {}
+        for indice, nom in enumerate(noms):
+            if not nom:
+                continue
+            nb, sommes, requetes = 0, [0, 0, 0], 0
+            seaux = [[0] * NB_SEAUX for _ in MESURES]
+            for fenetre in range(NB_FENETRES):
+                debut = (indice * NB_FENETRES + fenetre) * TAILLE_FENETRE
+                if minute - copie[debut + MINUTE] >= NB_FENETRES:
+                    continue
+                nb += copie[debut + NB]
+                for rang, cle in enumerate((SOMME_TOTAL, SOMME_SQL, SOMME_RENDU)):
+                    sommes[rang] += copie[debut + cle]
+                requetes += copie[debut + SOMME_REQUETES]
+                for rang in range(len(MESURES)):
+                    origine = debut + TAILLE_ENTETE_FENETRE + rang * NB_SEAUX
+                    for i, compte in enumerate(copie[origine:origine + NB_SEAUX]):
+                        seaux[rang][i] += compte
+            if not nb:
+                continue
+            resultat[nom] = {
+                'nb': nb,
+                'par_minute': round(nb / NB_FENETRES, 2),
+                'requetes_sql': round(requetes / nb, 1),
+                **{
+                    mesure: {
+                        'moyenne': round(sommes[rang] / nb / 1000, 2),
+                        **{f'p{p}': round(percentile(seaux[rang], nb, p), 2) for p in (50, 95, 99)},
+                    }
+                    for rang, mesure in enumerate(MESURES)
+                },
+            }
+        return resultat
+
+    def synthese_caches(self):
+        """{cache: {hits, misses, taux_hit}} sur les dernières minutes"""
+        self.ouvrir()
+        minute = int(time.time() // 60)
+        self._verrouiller()
+        try:
+            copie = self.valeurs[DEBUT_CACHES:].tolist()
+            noms = [self._nom(indice, DEBUT_NOMS_CACHES) for indice in range(NB_CACHES)]
+        finally:
+            self._deverrouiller()
+
+        resultat = {}
+        for indice, nom in enumerate(noms):
+            if not nom:
+                continue
+            hits = misses = 0
+            for fenetre in range(NB_FENETRES):
+                debut = (indice * NB_FENETRES + fenetre) * TAILLE_FENETRE_CACHE
+                if minute - copie[debut + MINUTE] < NB_FENETRES:
+                    hits += copie[debut + HITS]
+                    misses += copie[debut + MISSES]
+            if hits + misses:
+                resultat[nom] = {'hits': hits, 'misses': misses, 'taux_hit': round(hits / (hits + misses), 3)}
+        return resultat
+
+
+def percentile(seaux, nb, rang):
+    seuil, cumul = math.ceil(nb * rang / 100), 0
+    for indice, compte in enumerate(seaux):
+        cumul += compte
+        if cumul >= seuil:
+            return borne_seau(indice)
+    return borne_seau(len(seaux) - 1)
+
+
+histogrammes = Histogrammes()
+
+
+@receiver(setting_changed)
+def changer_de_fichier(setting, **kwargs):
+    """override_settings (tests) : les métriques suivent le fichier configuré au lieu de celui du démarrage"""
+    if setting == 'PULMOCARE_METRIQUES_FICHIER':
+        histogrammes.fermer()
+        histogrammes.chemin = fichier()
@@ -0,0 +1,17 @@
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+URLCONF_ASGI = 'core.urls_asgi'
+
+
+@sync_and_async_middleware
+def vues_asgi(get_response):
+    """Sous un serveur ASGI (chaîne de middlewares asynchrone), les dashboards sont servis par leurs variantes async"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            request.urlconf = URLCONF_ASGI
+            return await get_response(request)
+    else:
+        def middleware(request):
+            return get_response(request)
+    return middleware
@@ -0,0 +1,119 @@
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+SEL_CURSEUR = 'pulmocare.pagination'
+
+
+class PageCurseur:
+    """Page d'une pagination par curseur : mêmes attributs de base qu'une Page de Django"""
+
+    def __init__(self, objets, suivant=None, precedent=None, total_approx=None):
+        self.object_list = objets
+        self.suivant = suivant
+        self.precedent = precedent
+        self.total_approx = total_approx
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.suivant is not None
+
+    def has_previous(self):
+        return self.precedent is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class PaginateurCurseur:
+    """
+    Pagination par clé (keyset) sur un tri décroissant, par ex. ('date_upload', 'id_scan').
+    Chaque page est une requête "WHERE (a, b) < (x, y) ORDER BY a DESC, b DESC LIMIT n+1" :
+    ni COUNT(*) ni OFFSET, la page N coûte autant que la page 1.
+    Le dernier champ doit être unique (clé primaire) pour départager les égalités.
+    `croissant` : du plus ancien au plus récent (synchronisation incrémentale : une ligne modifiée
+    pendant le parcours passe en queue, où elle sera lue, au lieu de sauter en tête déjà dépassée).
+    """
+
+    def __init__(self, queryset, champs, par_page=10, total_approx=None, croissant=False):
+        self.queryset = queryset
+        self.champs = champs
+        self.par_page = par_page
+        # Callable optionnel (compteurs maintenus, statistiques...) : jamais de COUNT(*) ici
+        self.total_approx = total_approx
+        self.croissant = croissant
+
+    # --- Jetons opaques ---
+    def _encoder(self, sens, objet):
+        valeurs = [str(getattr(objet, champ)) for champ in self.champs]
+        return signing.dumps({'s': sens, 'v': valeurs}, salt=SEL_CURSEUR, compress=True)
+
+    def jeton_apres(self, objet):
+        """Jeton de la page qui commence juste après `objet` (page composée de plusieurs sources)"""
+        return self._encoder('n', objet)
+
+    def _decoder(self, jeton):
+        try:
+            donnees = signing.loads(jeton, salt=SEL_CURSEUR)
+            modele = self.queryset.model
+            valeurs = [
+                modele._meta.get_field(champ).to_python(valeur)
+                for champ, valeur in zip(self.champs, donnees['v'])
+            ]
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            return None, None
+        if donnees.get('s') not in ('n', 'p') or len(valeurs) != len(self.champs):
+            return None, None
+        return donnees['s'], valeurs
+
+    def _apres(self, valeurs, operateur):
+        """(a, b, ...) op (x, y, ...) en comparaison lexicographique, portable sur tous les SGBD"""
+        condition = Q()
+        for i, champ in enumerate(self.champs):
+            egalites = {self.champs[j]: valeurs[j] for j in range(i)}
+            condition |= Q(**egalites, **{f'{champ}__{operateur}': valeurs[i]})
+        return condition
+
+    def get_page(self, jeton=None):
+        sens, valeurs = self._decoder(jeton) if jeton else (None, None)
+        decroissant = [f'-{champ}' for champ in self.champs]
+        croissant = list(self.champs)
+        # Ordre de lecture et comparaison vers la page suivante, et leurs inverses (page précédente)
+        if self.croissant:
+            ordre_suivant, apres_suivant, ordre_precedent, apres_precedent = croissant, 'gt', decroissant, 'lt'
+        else:
+            ordre_suivant, apres_suivant, ordre_precedent, apres_precedent = decroissant, 'lt', croissant, 'gt'
+
+        if sens == 'p':
+            # Page précédente : on remonte dans l'ordre inverse puis on retourne le lot
+            lignes = list(
+                self.queryset.filter(self._apres(valeurs, apres_precedent)).order_by(*ordre_precedent)[:self.par_page + 1]
+            )
+            a_precedent = len(lignes) > self.par_page
+            objets = lignes[:self.par_page][::-1]
+            a_suivant = True
+        else:
+            qs = self.queryset.order_by(*ordre_suivant)
+            if sens == 'n':
+                qs = qs.filter(self._apres(valeurs, apres_suivant))
+            lignes = list(qs[:self.par_page + 1])
+            a_suivant = len(lignes) > self.par_page
+            objets = lignes[:self.par_page]
+            a_precedent = sens == 'n'
+
+        if not objets:
+            return PageCurseur([], total_approx=self._total())
+        return PageCurseur(
+            objets,
+            suivant=self._encoder('n', objets[-1]) if a_suivant else None,
+            precedent=self._encoder('p', objets[0]) if a_precedent else None,
+            total_approx=self._total(),
+        )
+
+    def _total(self):
+        return self.total_approx() if self.total_approx else None
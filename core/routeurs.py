@@ -0,0 +1,61 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ALIAS_REPLICA = 'replica'
+
+# Actif pendant une vue de lecture seule (dashboards, analytique) : ses SELECT vont au replica
+_lecture_replica = ContextVar('lecture_replica', default=False)
+
+
+@contextmanager
+def lecture_seule():
+    jeton = _lecture_replica.set(True)
+    try:
+        yield
+    finally:
+        _lecture_replica.reset(jeton)
+
+
+def lecture_replica(vue):
+    """Décorateur des vues qui n'écrivent rien : leurs lectures sont servies par l'alias 'replica'"""
+    if iscoroutinefunction(vue):
+        async def envelopper(request, *args, **kwargs):
+            with lecture_seule():
+                return await vue(request, *args, **kwargs)
+    else:
+        def envelopper(request, *args, **kwargs):
+            with lecture_seule():
+                return vue(request, *args, **kwargs)
+    return functools.wraps(vue)(envelopper)
+
+
+class RouteurLectureEcriture:
+    """
+    Écritures (et migrations) sur 'default' ; lectures sur 'replica' uniquement dans une vue
+    marquée lecture_replica, et jamais au milieu d'une transaction ouverte sur 'default'
+    (elle doit relire ses propres écritures).
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            _lecture_replica.get()
+            and ALIAS_REPLICA in settings.DATABASES
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return ALIAS_REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même base logique des deux côtés : les relations entre alias sont valides
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db == DEFAULT_DB_ALIAS
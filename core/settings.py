@@ -25,10 +25,15 @@ INSTALLED_APPS = [
     
     # Outils tiers
     'rest_framework',
+
+    # API d'intégration (PACS / RIS)
+    'api',
 ]
 
 # 4. Middleware (Sécurité et Sessions)
 MIDDLEWARE = [
+    'core.instrumentation.instrumenter',  # Le plus à l'extérieur : le temps total couvre toute la chaîne
+    'core.middleware.vues_asgi',  # Avant CommonMiddleware, qui résout déjà les URL
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -43,7 +48,7 @@ ROOT_URLCONF = 'core.urls'
 # 5. Templates (Interface Utilisateur)
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.instrumentation.GabaritsMesures',  # DjangoTemplates avec temps de rendu mesuré
         'DIRS': [os.path.join(BASE_DIR, 'templates')], # Chemin vers ton Frontend
         'APP_DIRS': True,
         'OPTIONS': {
@@ -59,13 +64,42 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-# 6. Base de Données Unique (SQLite par défaut pour le dev)
+# 6. Base de Données (SQLite en WAL : lectures des dashboards concurrentes des écritures du pipeline)
+# Pragmas appliqués à chaque connexion ; busy_timeout (ms) fait attendre un verrou au lieu d'échouer
+# ("database is locked"). BEGIN IMMEDIATE prend le verrou d'écriture dès le début de la transaction.
+PRAGMAS_SQLITE = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA busy_timeout=5000;'
+    'PRAGMA cache_size=-20000;'
+    'PRAGMA temp_store=MEMORY;'
+    'PRAGMA mmap_size=134217728;'
+)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {'init_command': PRAGMAS_SQLITE, 'transaction_mode': 'IMMEDIATE'},
+        'CONN_MAX_AGE': 600,  # Connexions réutilisées entre requêtes (pragmas payés une fois)
+        'CONN_HEALTH_CHECKS': True,
+        # Base de test sur fichier : le replica y ouvre sa propre connexion, comme en production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    },
+    # Lectures des vues marquées lecture_replica (core.routeurs). En local : le même fichier par
+    # une seconde connexion en lecture seule ; en production : copie répliquée (Litestream, LiteFS...)
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'init_command': PRAGMAS_SQLITE + 'PRAGMA query_only=1;'},
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        # Tests : le fichier de test de 'default', ouvert par une seconde connexion qui garde query_only=1.
+        # Une écriture mal routée vers le replica y échoue comme en production (core.tests.RouteurTests) ;
+        # en revanche cette connexion ne voit pas les données non validées d'un TestCase.
+        'TEST': {'MIRROR': 'default'},
+    },
 }
+DATABASE_ROUTERS = ['core.routeurs.RouteurLectureEcriture']
 
 # 7. Gestion des mots de passe
 AUTH_PASSWORD_VALIDATORS = [
@@ -93,6 +127,73 @@ AUTH_USER_MODEL = 'administration.Utilisateur'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
-# Limite le poids des fichiers à 50 Mo (adaptable selon tes scanners)
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800 
-DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800
\ No newline at end of file
+# Au-delà de 2,5 Mo, un fichier envoyé par formulaire passe par un fichier temporaire (pas en RAM).
+# Les études volumineuses passent par le téléversement par morceaux (radiologie_ia.televersement).
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440
+
+# 11. MOTEUR D'INFÉRENCE IA
+# Classe chargée une fois par processus (MoteurSimulation = référence, MoteurNumpy = CPU vectorisé)
+PULMOCARE_MOTEUR_IA = 'radiologie_ia.moteurs.MoteurSimulation'
+PULMOCARE_MOTEUR_IA_POIDS = None  # Fichier .npz des poids du MoteurNumpy (graine fixe si absent)
+
+# 12. RAPPORTS PDF
+# Rapports rendus conservés sur disque, hors MEDIA_ROOT (données patient : servis par la vue uniquement)
+PULMOCARE_RAPPORTS_DIR = os.path.join(BASE_DIR, 'var', 'rapports')
+
+# 13. TÉLÉVERSEMENT DICOM PAR MORCEAUX
+PULMOCARE_TELEVERSEMENT_MORCEAU = 8 * 1024 * 1024  # Taille maximale d'un morceau (lu en flux, jamais bufferisé)
+PULMOCARE_TELEVERSEMENT_DELAI_ABANDON = 24 * 3600  # Secondes d'inactivité avant purge (purger_televersements)
+
+# 14. ENVOI DES FICHIERS MEDIA (vue protégée core.media.servir_media)
+# None : Django envoie le fichier (Range, ETag). 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache, lighttpd) :
+# Django vérifie les droits puis le serveur frontal fait le transfert.
+PULMOCARE_MEDIA_ENVOI = None
+# Avec nginx : location /media-protege/ { internal; alias <MEDIA_ROOT>/; }
+PULMOCARE_MEDIA_PREFIXE_ACCEL = '/media-protege/'
+
+# 15. ÉVÉNEMENTS TEMPS RÉEL (flux SSE /evenements/, servi sous ASGI)
+PULMOCARE_SSE_INTERVALLE = 1.0  # Secondes entre deux lectures de la table d'événements (un poller par processus)
+PULMOCARE_SSE_BATTEMENT = 20.0  # Secondes sans événement avant un commentaire de maintien de connexion
+PULMOCARE_EVENEMENTS_RETENTION = 3600  # Secondes de conservation (rejeu Last-Event-ID)
+PULMOCARE_EVENEMENTS_PURGE = 300  # Secondes entre deux purges, faites par worker_ia (sans tâche cron)
+
+# 16. API D'INTÉGRATION (/api/v1/ : PACS, RIS)
+# Comptes d'intégration : utilisateurs du service concerné, en Basic sur HTTPS ; les navigateurs gardent la session.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.BasicAuthentication',  # En premier : 401 + WWW-Authenticate sans identifiants
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
+}
+PULMOCARE_API_TAILLE_PAGE = 100  # Objets par page par défaut (?limite=)
+PULMOCARE_API_TAILLE_PAGE_MAX = 1000
+PULMOCARE_API_TAILLE_LOT = 1000  # Objets créés ou modifiés par appel groupé (une transaction)
+
+# 17. INSTRUMENTATION (Server-Timing, percentiles par route sur /metriques/, journal des requêtes lentes)
+PULMOCARE_INSTRUMENTATION = True
+# Fichier projeté en mémoire, partagé par les workers du nœud
+PULMOCARE_METRIQUES_FICHIER = os.path.join(BASE_DIR, 'var', 'metriques.bin')
+PULMOCARE_REQUETE_LENTE_MS = 500  # Temps total au-delà duquel une requête est dite lente
+PULMOCARE_REQUETES_LENTES_ECHANTILLON = 0.1  # Part des requêtes lentes journalisées (avec leur SQL)
+
+# 18. CACHE DES FRAGMENTS (tableaux des dashboards, invalidés par génération de modèle : core.fragments)
+# Cache fichier : partagé par tous les workers du nœud, comme les invalidations qui y sont écrites
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'var', 'cache', 'fragments'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+PULMOCARE_FRAGMENTS = True
+PULMOCARE_FRAGMENTS_CACHE = 'fragments'
+PULMOCARE_FRAGMENTS_DUREE = 600  # Secondes ; l'invalidation ne dépend pas de cette durée
+
+# 19. ACCUSÉS DE LECTURE (écriture différée : consultation.accuses)
+PULMOCARE_ACCUSES_INTERVALLE = 5.0  # Secondes entre deux écritures groupées ; 0 = écriture pendant la requête
@@ -0,0 +1,281 @@
+import os
+from datetime import datetime
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from administration.models import Patient, Utilisateur
+from administration.tests import Annulation, creer_patient
+from radiologie_ia.tests import FichiersTemporaires
+from . import flux, fragments
+from .pagination import PaginateurCurseur
+from .routeurs import RouteurLectureEcriture, lecture_replica, lecture_seule
+
+
+class PaginateurCurseurTests(TestCase):
+    """Pagination par clé : chaque ligne vue une fois, dans les deux sens, même à date égale"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(11):
+            creer_patient(f'PC-{i:03}', f'Patient {i}')
+        # Dates toutes égales : seule la clé primaire départage
+        Patient.objects.update(date_creation=timezone.make_aware(datetime(2025, 3, 1, 9, 0)))
+        cls.tous = set(Patient.objects.values_list('pk', flat=True))
+
+    def parcourir(self, paginateur):
+        pages, jeton = [], None
+        while True:
+            page = paginateur.get_page(jeton)
+            pages.append([patient.pk for patient in page])
+            if not page.has_next():
+                return pages, page
+            jeton = page.suivant
+
+    def test_dates_egales(self):
+        for croissant in (False, True):
+            with self.subTest(croissant=croissant):
+                paginateur = PaginateurCurseur(
+                    Patient.objects.all(), ('date_creation', 'id_patient'), 4, croissant=croissant,
+                )
+                pages, _ = self.parcourir(paginateur)
+                vus = [pk for page in pages for pk in page]
+                self.assertEqual([len(page) for page in pages], [4, 4, 3])
+                self.assertEqual(len(vus), len(set(vus)))
+                self.assertEqual(set(vus), self.tous)
+                self.assertEqual(vus, sorted(vus, reverse=not croissant))
+
+    def test_retour_en_arriere(self):
+        paginateur = PaginateurCurseur(Patient.objects.all(), ('date_creation', 'id_patient'), 4)
+        pages, derniere = self.parcourir(paginateur)
+        precedente = paginateur.get_page(derniere.precedent)
+        self.assertEqual([patient.pk for patient in precedente], pages[1])
+        premiere = paginateur.get_page(precedente.precedent)
+        self.assertEqual([patient.pk for patient in premiere], pages[0])
+        self.assertFalse(premiere.has_previous())
+
+    def test_ligne_modifiee_pendant_la_synchronisation(self):
+        # Tri croissant : une ligne déjà lue qui change repasse en queue au lieu de faire sauter une autre
+        paginateur = PaginateurCurseur(Patient.objects.all(), ('date_modification', 'id_patient'), 4, croissant=True)
+        page = paginateur.get_page()
+        deja_lu = page.object_list[0]
+        deja_lu.save()
+        vus = [patient.pk for patient in page]
+        while page.has_next():
+            page = paginateur.get_page(page.suivant)
+            vus.extend(patient.pk for patient in page)
+        self.assertEqual(set(vus), self.tous)
+        self.assertEqual(vus[-1], deja_lu.pk)
+
+    def test_jeton_invalide(self):
+        paginateur = PaginateurCurseur(Patient.objects.all(), ('date_creation', 'id_patient'), 4)
+        page = paginateur.get_page('altere')
+        self.assertEqual(len(page), 4)
+        self.assertFalse(page.has_previous())
+
+
+class MediaTests(FichiersTemporaires, TestCase):
+    """Fichiers MEDIA servis par Django : plages (206/416), GET conditionnel (304), accès réservé"""
+
+    contenu = bytes(range(256)) * 4
+
+    def setUp(self):
+        dossier = os.path.join(settings.MEDIA_ROOT, 'scanners')
+        os.makedirs(dossier, exist_ok=True)
+        for nom in ('etude.dcm', 'etude.dcm.part'):
+            with open(os.path.join(dossier, nom), 'wb') as fichier:
+                fichier.write(self.contenu)
+        self.url = reverse('media_protege', args=['scanners/etude.dcm'])
+        self.client.force_login(Utilisateur.objects.create_user('radio', service='RADIO'))
+
+    def lire(self, reponse):
+        return b''.join(reponse.streaming_content)
+
+    def test_fichier_entier(self):
+        reponse = self.client.get(self.url)
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(self.lire(reponse), self.contenu)
+        self.assertEqual(reponse['Accept-Ranges'], 'bytes')
+        self.assertEqual(reponse['Content-Type'], 'application/dicom')
+
+    def test_plages(self):
+        for plage, debut, fin in (('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023), ('bytes=-24', 1000, 1023),
+                                  ('bytes=1020-5000', 1020, 1023)):
+            with self.subTest(plage=plage):
+                reponse = self.client.get(self.url, HTTP_RANGE=plage)
+                self.assertEqual(reponse.status_code, 206)
+                self.assertEqual(reponse['Content-Range'], f'bytes {debut}-{fin}/1024')
+                self.assertEqual(int(reponse['Content-Length']), fin - debut + 1)
+                self.assertEqual(self.lire(reponse), self.contenu[debut:fin + 1])
+
+    def test_plage_hors_du_fichier(self):
+        for plage in ('bytes=1024-', 'bytes=30-20', 'bytes=-0'):
+            with self.subTest(plage=plage):
+                reponse = self.client.get(self.url, HTTP_RANGE=plage)
+                self.assertEqual(reponse.status_code, 416)
+                self.assertEqual(reponse['Content-Range'], 'bytes */1024')
+
+    def test_plages_multiples_ou_invalides(self):
+        # Servies en entier, comme le permet la RFC
+        for plage in ('bytes=0-1,5-6', 'octets=0-1', 'bytes=-'):
+            with self.subTest(plage=plage):
+                reponse = self.client.get(self.url, HTTP_RANGE=plage)
+                self.assertEqual(reponse.status_code, 200)
+                self.assertEqual(self.lire(reponse), self.contenu)
+
+    def test_get_conditionnel(self):
+        premiere = self.client.get(self.url)
+        etag, date = premiere['ETag'], premiere['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=date).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"autre"').status_code, 200)
+
+    def test_if_range(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        # Version différente chez le client : fichier entier
+        reponse = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"perime"')
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(self.lire(reponse), self.contenu)
+
+    def test_fichiers_refuses(self):
+        for chemin in ('scanners/etude.dcm.part', 'scanners/absent.dcm', '../settings.py'):
+            with self.subTest(chemin=chemin):
+                self.assertEqual(self.client.get(f'/media/{chemin}').status_code, 404)
+
+    def test_acces_reserve(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(Utilisateur.objects.create_user('accueil', service='ADMIN'))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class RouteurTests(FichiersTemporaires, TransactionTestCase):
+    """Lectures des vues lecture_replica sur 'replica' hors transaction ; écritures toujours sur 'default'"""
+
+    # TransactionTestCase : les données sont validées, donc visibles de la connexion du replica
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.routeur = RouteurLectureEcriture()
+
+    def test_lectures(self):
+        self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+        with lecture_seule():
+            self.assertEqual(self.routeur.db_for_read(Patient), 'replica')
+            # Une transaction ouverte relit ses propres écritures
+            with transaction.atomic():
+                self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+        self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+
+    def test_ecritures_dans_lecture_seule(self):
+        with lecture_seule():
+            self.assertEqual(self.routeur.db_for_write(Patient), 'default')
+            patient = creer_patient('PC-001', 'Jean Martin')
+            self.assertEqual(patient._state.db, 'default')
+            self.assertEqual(Patient.objects.get(pk=patient.pk)._state.db, 'replica')
+
+    def test_replica_refuse_les_ecritures(self):
+        with self.assertRaises(OperationalError):
+            Patient.objects.using('replica').create(code_anonyme='PC-001', nom_complet='Jean Martin',
+                                                    date_naissance=datetime(1960, 1, 1), genre='F')
+        self.assertFalse(Patient.objects.exists())
+
+    def test_contexte_retabli(self):
+        with lecture_seule():
+            with lecture_seule():
+                pass
+            self.assertEqual(self.routeur.db_for_read(Patient), 'replica')
+        self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+        with self.assertRaises(ValueError):
+            with lecture_seule():
+                raise ValueError
+        self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+
+    def test_decorateur(self):
+        @lecture_replica
+        def vue(request):
+            return self.routeur.db_for_read(Patient)
+
+        @lecture_replica
+        async def vue_asynchrone(request):
+            return self.routeur.db_for_read(Patient)
+
+        self.assertEqual(vue(None), 'replica')
+        self.assertEqual(async_to_sync(vue_asynchrone)(None), 'replica')
+        self.assertEqual(self.routeur.db_for_read(Patient), 'default')
+
+
+class AbonnementTests(SimpleTestCase):
+    """File bornée par client SSE : un client trop lent est coupé, pas retenu sans limite"""
+
+    def evenement(self, numero, service=''):
+        return {'id': numero, 'type': 'test', 'service': service, 'donnees': {}}
+
+    def vider(self, abonnement):
+        elements = []
+        while not abonnement.file.empty():
+            element = abonnement.file.get_nowait()
+            elements.append(element and element['id'])
+        return elements
+
+    @mock.patch.object(flux, 'TAILLE_FILE', 3)
+    def test_saturation(self):
+        abonnement = flux.Abonnement('RADIO')
+        for numero in range(1, 6):
+            abonnement.pousser(self.evenement(numero))
+        self.assertTrue(abonnement.sature)
+        # Le plus ancien cède sa place à None : le flux se ferme, le client rejoue depuis Last-Event-ID
+        self.assertEqual(self.vider(abonnement), [2, 3, None])
+        abonnement.pousser(self.evenement(6))
+        self.assertEqual(self.vider(abonnement), [])
+
+    def test_filtre_par_service(self):
+        abonnement = flux.Abonnement('RADIO')
+        for numero, service in enumerate(('', 'RADIO', 'MEDECIN'), 1):
+            abonnement.pousser(self.evenement(numero, service))
+        self.assertEqual(self.vider(abonnement), [1, 2])
+        self.assertFalse(abonnement.sature)
+
+
+class FragmentsTests(FichiersTemporaires, TestCase):
+    """Fragments en cache : nouvelle génération au commit seulement, jamais après un rollback"""
+
+    def setUp(self):
+        caches['fragments'].clear()
+        self.rendus = 0
+
+    def rendre(self):
+        self.rendus += 1
+        return f'<p>{Patient.objects.count()}</p>'
+
+    def lire(self):
+        return fragments.fragment('patients', [Patient], [], self.rendre)
+
+    def test_generation_apres_commit(self):
+        self.assertEqual(self.lire(), '<p>0</p>')
+        avant = fragments.generations([Patient])
+        with self.captureOnCommitCallbacks(execute=True):
+            creer_patient('PC-001', 'Jean Martin')
+            self.assertEqual(fragments.generations([Patient]), avant)
+            self.assertEqual(self.lire(), '<p>0</p>')
+        self.assertNotEqual(fragments.generations([Patient]), avant)
+        self.assertEqual(self.lire(), '<p>1</p>')
+        self.assertEqual(self.rendus, 2)
+
+    def test_rollback(self):
+        self.assertEqual(self.lire(), '<p>0</p>')
+        avant = fragments.generations([Patient])
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(Annulation), transaction.atomic():
+                creer_patient('PC-001', 'Jean Martin')
+                raise Annulation
+        self.assertEqual(fragments.generations([Patient]), avant)
+        self.assertEqual(self.lire(), '<p>0</p>')
+        self.assertEqual(self.rendus, 1)
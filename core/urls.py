@@ -1,24 +1,35 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.flux import flux_evenements
+from core.instrumentation import metriques
+from core.media import servir_media
 
 # 1. Importations pour le service ADMINISTRATION / AUTH
-from administration.views import ConnexionClinique, dashboard_admin
+from administration.views import ConnexionClinique, dashboard_admin, suggestions_patients
 
 # 2. Importations pour le service CLINIQUE (Consultation)
 from consultation.views import (
     dashboard_consultation, 
     effectuer_consultation,
-    detail_patient
+    detail_patient,
+    chronologie_patient
 )
 
 # 3. Importations pour le service DIAGNOSTIC (Radiologie IA)
 from radiologie_ia.views import (
     dashboard_radiologie, 
     lancer_analyse, 
+    statut_analyse,
+    analyser_tout,
     analytique_radiologie,
-    generer_rapport_pdf  # <--- AJOUTÉ ICI
+    generer_rapport_pdf,  # <--- AJOUTÉ ICI
+    exporter_rapports,
+    creer_televersement,
+    etat_televersement,
+    envoyer_morceau,
+    finaliser_televersement
 )
 
 urlpatterns = [
@@ -27,24 +38,43 @@ urlpatterns = [
     # --- SERVICE AUTH & ADMIN ---
     path('login/', ConnexionClinique.as_view(), name='login'),
     path('dashboard/admin/', dashboard_admin, name='dashboard_admin'),
+    path('patients/suggestions/', suggestions_patients, name='suggestions_patients'),
     
     # --- SERVICE CLINIQUE (Médecin) ---
     path('dashboard/medecin/', dashboard_consultation, name='dashboard_consultation'),
     path('dashboard/medecin/consulter/<int:rdv_id>/', effectuer_consultation, name='effectuer_consultation'),
     path('dashboard/medecin/patient/<uuid:patient_id>/', detail_patient, name='detail_patient'),
+    path('dashboard/medecin/patient/<uuid:patient_id>/chronologie/', chronologie_patient, name='chronologie_patient'),
     
     # --- SERVICE DIAGNOSTIC (Radiologie) ---
     path('dashboard/radiologie/', dashboard_radiologie, name='dashboard_radiologie'),
     path('dashboard/radiologie/stats/', analytique_radiologie, name='analytique_radiologie'),
     path('dashboard/radiologie/analyser/<uuid:scan_id>/', lancer_analyse, name='lancer_analyse'),
+    path('dashboard/radiologie/analyser-tout/', analyser_tout, name='analyser_tout'),
+    path('dashboard/radiologie/taches/<int:tache_id>/', statut_analyse, name='statut_analyse'),
     
     # --- GÉNÉRATION DE RAPPORT ---
     path('dashboard/radiologie/pdf/<uuid:scan_id>/', generer_rapport_pdf, name='generer_pdf'), # <--- NOUVELLE ROUTE
+    path('dashboard/radiologie/export/', exporter_rapports, name='exporter_rapports'),
+    
+    # --- TÉLÉVERSEMENT DICOM PAR MORCEAUX (reprenable) ---
+    path('dashboard/radiologie/televersements/', creer_televersement, name='creer_televersement'),
+    path('dashboard/radiologie/televersements/<uuid:televersement_id>/', etat_televersement, name='etat_televersement'),
+    path('dashboard/radiologie/televersements/<uuid:televersement_id>/morceau/', envoyer_morceau, name='envoyer_morceau'),
+    path('dashboard/radiologie/televersements/<uuid:televersement_id>/finaliser/', finaliser_televersement, name='finaliser_televersement'),
+    
+    # --- ÉVÉNEMENTS TEMPS RÉEL (SSE, servi en flux sous ASGI) ---
+    path('evenements/', flux_evenements, name='flux_evenements'),
+    
+    # --- API D'INTÉGRATION (PACS / RIS), versionnée par préfixe ---
+    path('api/v1/', include('api.urls', namespace='api-v1')),
+    
+    # --- MÉTRIQUES DE PERFORMANCE (staff) ---
+    path('metriques/', metriques, name='metriques'),
     
     # Auth Django par défaut
     path('accounts/', include('django.contrib.auth.urls')),
-]
-
-# Accès aux fichiers MEDIA (Scanners) en développement
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    
+    # --- FICHIERS MEDIA (Scanners, aperçus) : contrôle d'accès puis envoi par le serveur frontal ---
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<chemin>.+)$", servir_media, name='media_protege'),
+]
\ No newline at end of file
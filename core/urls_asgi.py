@@ -0,0 +1,14 @@
+from django.urls import path
+
+from consultation.views import dashboard_consultation_async
+from core.flux import flux_evenements_async
+from core.urls import urlpatterns as urlpatterns_wsgi
+from radiologie_ia.views import analytique_radiologie_async, dashboard_radiologie_async
+
+# Mêmes routes et mêmes noms que core.urls : seules les vues des dashboards changent (résolues en premier)
+urlpatterns = [
+    path('dashboard/medecin/', dashboard_consultation_async, name='dashboard_consultation'),
+    path('dashboard/radiologie/', dashboard_radiologie_async, name='dashboard_radiologie'),
+    path('dashboard/radiologie/stats/', analytique_radiologie_async, name='analytique_radiologie'),
+    path('evenements/', flux_evenements_async, name='flux_evenements'),
+] + urlpatterns_wsgi
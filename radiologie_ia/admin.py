@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import TacheAnalyse, CacheInference, TeleversementDicom
 
-# Register your models here.
+@admin.register(TacheAnalyse)
+class TacheAnalyseAdmin(admin.ModelAdmin):
+    list_display = ['id', 'scan', 'nature', 'statut', 'tentatives', 'worker', 'date_creation', 'date_fin']
+    list_filter = ['nature', 'statut']
+
+@admin.register(CacheInference)
+class CacheInferenceAdmin(admin.ModelAdmin):
+    list_display = ['empreinte_sha256', 'version_moteur', 'score_malignite', 'nb_hits', 'date_creation']
+    list_filter = ['version_moteur']
+
+@admin.register(TeleversementDicom)
+class TeleversementDicomAdmin(admin.ModelAdmin):
+    list_display = ['nom_fichier', 'patient', 'statut', 'recu', 'taille_totale', 'date_maj']
+    list_filter = ['statut']
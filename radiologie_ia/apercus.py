@@ -0,0 +1,118 @@
+import io
+import logging
+import os
+import posixpath
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from administration.models import ScannerCT
+from core import fragments
+from .volumes import PasDicom, Volume
+
+logger = logging.getLogger(__name__)
+
+# Côté le plus long des aperçus, en pixels (vignette des listes, aperçu agrandi)
+TAILLES_APERCU = getattr(settings, 'PULMOCARE_APERCUS_TAILLES', (160, 640))
+# (extension, format Pillow, options d'encodage) : WebP d'abord, JPEG pour les navigateurs anciens
+FORMATS_APERCU = (
+    ('webp', 'WEBP', {'quality': 75, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+)
+
+
+# --- 1. NOMMAGE DÉTERMINISTE ---
+def nom_apercu(nom_original, taille, extension):
+    """'scanners/2026/02/01/etude.dcm' -> 'scanners/2026/02/01/etude.dcm.apercu-160.webp' (à côté de l'original)"""
+    return f"{nom_original}.apercu-{taille}.{extension}"
+
+
+def urls_apercu(scan, taille):
+    """{extension: url} des aperçus d'une taille, avec la date de génération pour invalider le cache navigateur"""
+    version = int(scan.date_apercu.timestamp())
+    return {
+        extension: f"{default_storage.url(nom_apercu(scan.image_dicom.name, taille, extension))}?v={version}"
+        for extension, _, _ in FORMATS_APERCU
+    }
+
+
+# --- 2. DÉCODAGE ---
+def charger_image(scan):
+    """Image 8 bits du scan : coupe centrale fenêtrée pour un DICOM, sinon tout format lisible par Pillow"""
+    try:
+        with Volume.du_scan(scan, coupes_en_cache=1) as volume:
+            return Image.fromarray(volume.coupe_8bits(len(volume) // 2))
+    except PasDicom:
+        pass
+    with scan.image_dicom.open('rb') as fichier:
+        image = Image.open(fichier)
+        image.draft('L', (max(TAILLES_APERCU),) * 2)  # JPEG : décodage directement réduit
+        image.load()
+    if image.mode in ('I', 'I;16', 'F'):
+        # Profondeur > 8 bits : étirement de la dynamique plutôt qu'un écrêtage
+        image = ImageOps.autocontrast(image.convert('I').point(lambda v: v * (1 / 256)).convert('L'))
+    elif image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    return image
+
+
+# --- 3. GÉNÉRATION ---
+def _ecrire(nom, image, format_pillow, options):
+    """
+    Stockage local : écriture atomique (fichier temporaire + rename), un aperçu n'est jamais servi à moitié
+    écrit. Stockage sans chemin local (objets distants) : remplacement par l'API du stockage.
+    """
+    tampon = io.BytesIO()
+    image.save(tampon, format_pillow, **options)
+    try:
+        chemin = default_storage.path(nom)
+    except NotImplementedError:
+        default_storage.delete(nom)
+        default_storage.save(nom, ContentFile(tampon.getvalue()))
+        return
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(tampon.getbuffer())
+    os.replace(temporaire, chemin)
+
+
+def generer(scan):
+    """Produit toutes les tailles et tous les formats ; chaque taille est réduite depuis la précédente"""
+    image = charger_image(scan)
+    for taille in sorted(TAILLES_APERCU, reverse=True):
+        image.thumbnail((taille, taille), Image.LANCZOS)
+        for extension, format_pillow, options in FORMATS_APERCU:
+            _ecrire(nom_apercu(scan.image_dicom.name, taille, extension), image, format_pillow, options)
+    scan.date_apercu = timezone.now()
+    # update() : ni signaux ni recalcul d'empreinte pour une simple date
+    ScannerCT.objects.filter(pk=scan.pk).update(date_apercu=scan.date_apercu)
+    fragments.invalider(ScannerCT)
+
+
+def generer_lot(scans):
+    """Aperçus d'un lot (worker) ; un fichier illisible est journalisé sans faire échouer le lot"""
+    generes = 0
+    for scan in scans:
+        try:
+            generer(scan)
+            generes += 1
+        except (FileNotFoundError, UnidentifiedImageError, OSError, ValueError) as erreur:
+            logger.warning("Aperçu du scan %s impossible : %s", scan.pk, erreur)
+    return generes
+
+
+def supprimer(nom_original):
+    """Aperçus d'un scan supprimé, retrouvés par l'API du stockage (local ou distant)"""
+    dossier, base = posixpath.split(nom_original)
+    try:
+        _, fichiers = default_storage.listdir(dossier)
+    except FileNotFoundError:
+        return
+    for fichier in fichiers:
+        if fichier.startswith(f'{base}.apercu-'):
+            default_storage.delete(posixpath.join(dossier, fichier))
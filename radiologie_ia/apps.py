@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RadiologieIaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'radiologie_ia'
+
+    def ready(self):
+        from . import signaux  # noqa: F401
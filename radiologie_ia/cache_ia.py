@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+
+from django.db.models import F
+
+from . import compteurs
+from .models import CacheInference
+
+
+def inferer_avec_cache(scans, moteur):
+    """
+    Inférence d'un lot en passant par le cache (empreinte, version du moteur).
+    Seuls les contenus jamais vus par cette version sont envoyés au modèle, une fois chacun.
+    Renvoie une liste de (score, details) dans l'ordre des scans.
+    """
+    if not scans:
+        return []
+    version = moteur.version
+    empreintes = {scan.empreinte_sha256 for scan in scans if scan.empreinte_sha256}
+    connus = {
+        entree.empreinte_sha256: entree
+        for entree in CacheInference.objects.filter(version_moteur=version, empreinte_sha256__in=empreintes)
+    }
+
+    # Les scans sans empreinte sont toujours inférés ; les doublons du lot ne le sont qu'une fois
+    a_inferer, vus = [], set()
+    for scan in scans:
+        cle = scan.empreinte_sha256
+        if not cle or (cle not in connus and cle not in vus):
+            a_inferer.append(scan)
+            if cle:
+                vus.add(cle)
+    predictions = dict(zip((id(scan) for scan in a_inferer), moteur.predict_batch(a_inferer)))
+
+    nouvelles = {}
+    for scan in a_inferer:
+        if scan.empreinte_sha256:
+            score, details = predictions[id(scan)]
+            nouvelles[scan.empreinte_sha256] = CacheInference(
+                empreinte_sha256=scan.empreinte_sha256, version_moteur=version,
+                score_malignite=score, details_nodules=details,
+            )
+    creees = CacheInference.objects.bulk_create(nouvelles.values(), ignore_conflicts=True)
+
+    resultats, hits = [], Counter()
+    for scan in scans:
+        if id(scan) in predictions:
+            resultats.append(predictions[id(scan)])
+            continue
+        entree = connus.get(scan.empreinte_sha256) or nouvelles[scan.empreinte_sha256]
+        if scan.empreinte_sha256 in connus:
+            hits[entree.pk] += 1
+        resultats.append((entree.score_malignite, entree.details_nodules))
+    _compter_hits(hits)
+    # Un conflit (autre worker sur le même contenu) peut surestimer les entrées : corrigé à la réconciliation
+    compteurs.ajuster({'cache_entrees': len(creees), 'cache_hits': sum(hits.values())})
+    return resultats
+
+
+def _compter_hits(hits):
+    """Incrémente nb_hits avec un UPDATE par valeur d'incrément distincte (souvent un seul)"""
+    par_increment = defaultdict(list)
+    for pk, nombre in hits.items():
+        par_increment[nombre].append(pk)
+    for nombre, pks in par_increment.items():
+        CacheInference.objects.filter(pk__in=pks).update(nb_hits=F('nb_hits') + nombre)
+
+
+def statistiques_cache():
+    """Taux de réutilisation lu dans les compteurs maintenus (pas d'agrégat sur la table du cache)"""
+    return compteurs.lire_compteurs()['cache']
+
+
+def purger_cache(version=None, sauf_version=None):
+    """Supprime les entrées d'une version de moteur, ou toutes sauf celles d'une version"""
+    qs = CacheInference.objects.all()
+    if version is not None:
+        qs = qs.filter(version_moteur=version)
+    if sauf_version is not None:
+        qs = qs.exclude(version_moteur=sauf_version)
+    supprimees, _ = qs.delete()
+    compteurs.reconcilier(compteurs.compter_cache())
+    return supprimees
@@ -0,0 +1,147 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from administration import evenements
+from administration.models import ScannerCT
+from .models import CacheInference, CompteurRadiologie
+
+# Au-delà de ce score, le scan compte comme une alerte (même seuil que le dashboard et le PDF)
+SEUIL_ALERTE = 0.6
+# Au-delà, la fin de l'analyse déclenche l'alerte critique du dashboard (flux SSE comme polling)
+SEUIL_CRITIQUE = 0.8
+# Entrées et réutilisations du cache d'inférence, tenues par radiologie_ia.cache_ia
+CLES_CACHE = ('cache_entrees', 'cache_hits')
+CLES_GLOBALES = ('non_analyses', 'benins', 'alertes') + CLES_CACHE
+# Cartes du dashboard radiologie, poussées en direct (événement 'compteurs')
+CLES_AFFICHEES = ('total_aujourdhui', 'non_analyses', 'benins', 'alertes')
+# Nombre de jours de compteurs quotidiens conservés
+RETENTION_JOURS = 7
+
+
+def cle_jour(jour):
+    return f"jour:{jour.isoformat()}"
+
+
+def jour_upload(scan):
+    return timezone.localtime(scan.date_upload).date()
+
+
+def categorie(score):
+    """Compteur d'une analyse selon son score (None tant que le score n'est pas connu)"""
+    if score is None:
+        return None
+    return 'alertes' if score > SEUIL_ALERTE else 'benins'
+
+
+def est_critique(score):
+    return score is not None and score > SEUIL_CRITIQUE
+
+
+# --- 1. MISE À JOUR INCRÉMENTALE ---
+def ajuster(deltas):
+    """Applique des deltas {cle: n} dans la transaction courante (F() : pas de lecture préalable)"""
+    for cle, delta in deltas.items():
+        if not delta:
+            continue
+        if CompteurRadiologie.objects.filter(cle=cle).update(valeur=F('valeur') + delta):
+            continue
+        # Compteur global absent : démarrage à froid, la réconciliation l'initialisera
+        if not cle.startswith('jour:'):
+            continue
+        try:
+            with transaction.atomic():
+                CompteurRadiologie.objects.create(cle=cle, valeur=max(delta, 0))
+        except IntegrityError:
+            CompteurRadiologie.objects.filter(cle=cle).update(valeur=F('valeur') + delta)
+    # Compteurs affichés modifiés : les dashboards ouverts reçoivent les nouvelles valeurs
+    if any(delta for cle, delta in deltas.items() if cle not in CLES_CACHE):
+        publier_compteurs()
+
+
+def valeurs_affichees():
+    stats = lire_compteurs()
+    return {cle: stats[cle] for cle in CLES_AFFICHEES}
+
+
+def publier_compteurs():
+    # Un seul événement par transaction, aux valeurs lues après son commit
+    evenements.publier('compteurs', valeurs_affichees, 'RADIO', cle='compteurs')
+
+
+def deltas_analyses(avant_apres):
+    """Deltas pour une série de transitions (catégorie avant, catégorie après) d'analyses"""
+    deltas = Counter()
+    for avant, apres in avant_apres:
+        if avant != apres:
+            if avant:
+                deltas[avant] -= 1
+            if apres:
+                deltas[apres] += 1
+    return deltas
+
+
+# --- 2. LECTURE ---
+def lire_compteurs():
+    """Statistiques du dashboard en une requête ; réconciliation si les compteurs sont froids"""
+    aujourdhui = cle_jour(timezone.localdate())
+    valeurs = dict(
+        CompteurRadiologie.objects.filter(cle__in=CLES_GLOBALES + (aujourdhui,)).values_list('cle', 'valeur')
+    )
+    if any(cle not in valeurs for cle in CLES_GLOBALES):
+        valeurs = reconcilier()
+    return {
+        'total_aujourdhui': valeurs.get(aujourdhui, 0),
+        'non_analyses': valeurs['non_analyses'],
+        'benins': valeurs['benins'],
+        'alertes': valeurs['alertes'],
+        'cache': taux_cache(valeurs['cache_entrees'], valeurs['cache_hits']),
+    }
+
+
+def taux_cache(entrees, hits):
+    """Chaque entrée correspond à un miss (une inférence) ; hits cumule les réutilisations"""
+    total = entrees + hits
+    return {
+        'entrees': entrees,
+        'hits': hits,
+        'taux_hit': round(hits / total, 3) if total else None,
+    }
+
+
+# --- 3. RÉCONCILIATION ---
+def compter_depuis_la_base():
+    """Recalcul exact en une seule requête d'agrégats conditionnels"""
+    aujourdhui = timezone.localdate()
+    debut = timezone.make_aware(datetime.combine(aujourdhui, time.min))
+    agregat = ScannerCT.objects.aggregate(
+        non_analyses=Count('pk', filter=Q(resultat__isnull=True)),
+        benins=Count('pk', filter=Q(resultat__score_malignite__lte=SEUIL_ALERTE)),
+        alertes=Count('pk', filter=Q(resultat__score_malignite__gt=SEUIL_ALERTE)),
+        aujourdhui=Count('pk', filter=Q(date_upload__gte=debut, date_upload__lt=debut + timedelta(days=1))),
+    )
+    agregat[cle_jour(aujourdhui)] = agregat.pop('aujourdhui')
+    agregat.update(compter_cache())
+    return agregat
+
+
+def compter_cache():
+    agregat = CacheInference.objects.aggregate(cache_entrees=Count('pk'), cache_hits=Sum('nb_hits'))
+    return {'cache_entrees': agregat['cache_entrees'], 'cache_hits': agregat['cache_hits'] or 0}
+
+
+def reconcilier(valeurs=None):
+    """Réécrit les compteurs à partir de la base (corrige toute dérive) et purge les vieux jours"""
+    valeurs = compter_depuis_la_base() if valeurs is None else valeurs
+    maintenant = timezone.now()
+    with transaction.atomic():
+        for cle, valeur in valeurs.items():
+            CompteurRadiologie.objects.update_or_create(
+                cle=cle, defaults={'valeur': valeur, 'date_reconciliation': maintenant}
+            )
+        limite = cle_jour(timezone.localdate() - timedelta(days=RETENTION_JOURS))
+        CompteurRadiologie.objects.filter(cle__startswith='jour:', cle__lt=limite).delete()
+    return valeurs
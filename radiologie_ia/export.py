@@ -0,0 +1,168 @@
+import collections
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.utils import timezone
+
+from administration.models import ScannerCT
+from . import rapports
+
+# Processus du pool de rendu partagé par les exports d'un worker web (0 = rendu dans le processus courant)
+PROCESSUS_EXPORT = getattr(settings, 'PULMOCARE_EXPORT_PROCESSUS', min(4, os.cpu_count() or 1))
+# Rapports en vol au plus : la mémoire de l'export ne dépend pas du nombre de rapports
+FENETRE_EXPORT = getattr(settings, 'PULMOCARE_EXPORT_FENETRE', 32)
+
+
+# --- 1. SÉLECTION DES SCANS ---
+def _minuit(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def scans_a_exporter(debut=None, fin=None, score_min=None, patients=None):
+    """Scans analysés filtrés par jour d'upload, score minimal et codes anonymes, du plus ancien au plus récent"""
+    qs = ScannerCT.objects.filter(resultat__score_malignite__isnull=False).select_related('patient', 'resultat')
+    if debut:
+        qs = qs.filter(date_upload__gte=_minuit(debut))
+    if fin:
+        qs = qs.filter(date_upload__lt=_minuit(fin + timedelta(days=1)))
+    if score_min is not None:
+        qs = qs.filter(resultat__score_malignite__gte=score_min)
+    if patients:
+        qs = qs.filter(patient__code_anonyme__in=patients)
+    return qs.order_by('date_upload', 'id_scan')
+
+
+def nom_fichier(scan):
+    return f"{timezone.localtime(scan.date_upload):%Y%m%d}_{scan.patient.code_anonyme}_{str(scan.pk)[:8]}.pdf"
+
+
+# --- 2. RENDU PARALLÈLE ---
+# Un pool par processus web, créé au premier export et partagé par les requêtes suivantes : aucun fork
+# par requête. Les processus de rendu partent d'un forkserver (jamais d'un fork du worker et de ses threads).
+_pool = None
+_pool_pid = None
+_verrou_pool = threading.Lock()
+
+
+def _nouveau_pool(processus):
+    # django.setup lui-même : dépiclé dans le processus fils sans importer de modèles avant la configuration
+    return ProcessPoolExecutor(
+        processus, mp_context=multiprocessing.get_context('forkserver'), initializer=django.setup
+    )
+
+
+def pool_export(casse=None):
+    """Pool de rendu du processus (PROCESSUS_EXPORT processus) ; `casse` : pool cassé à remplacer"""
+    global _pool, _pool_pid
+    with _verrou_pool:
+        if _pool is None or _pool is casse or _pool_pid != os.getpid():
+            _pool, _pool_pid = _nouveau_pool(PROCESSUS_EXPORT), os.getpid()
+        return _pool
+
+
+def _soumettre(pool, donnees, partage):
+    """(pool, Future) : le pool partagé est recréé une fois si un processus de rendu a été tué (OOM...)"""
+    try:
+        return pool, pool.submit(rapports.rendre_rapport_pdf, donnees)
+    except BrokenProcessPool:
+        if not partage:
+            raise
+        pool = pool_export(casse=pool)
+        return pool, pool.submit(rapports.rendre_rapport_pdf, donnees)
+
+
+def _contenu(scan, cle, donnees, travail):
+    """Octets du rapport : rendu du pool (alors stocké pour les téléchargements suivants) ou fichier stocké"""
+    if isinstance(travail, Future):
+        contenu = travail.result()
+        rapports.enregistrer(scan.pk, cle, contenu)
+        return contenu
+    try:
+        with open(travail, 'rb') as fichier:
+            return fichier.read()
+    except FileNotFoundError:
+        # Invalidé entre-temps : rendu ici plutôt que d'interrompre l'archive
+        return rapports.rendre_rapport_pdf(donnees)
+
+
+def rapports_pdf(scans, processus=None, fenetre=FENETRE_EXPORT):
+    """
+    Génère (nom, octets PDF) dans l'ordre des scans. Les rapports déjà stockés sont relus,
+    les autres rendus dans le pool partagé (`processus` None), un pool dédié de `processus`
+    processus (commande d'export) ou ici (0) ; au plus `fenetre` rapports sont en vol.
+    """
+    partage = processus is None
+    if partage:
+        pool = pool_export() if PROCESSUS_EXPORT else None
+    else:
+        pool = _nouveau_pool(processus) if processus else None
+    en_vol = collections.deque()
+    try:
+        for scan in scans:
+            donnees = rapports.donnees_rapport(scan)
+            cle = rapports.cle_rapport(donnees)
+            travail = rapports.chemin_stocke(scan.pk, cle)
+            if travail is None:
+                if pool is None:
+                    travail = rapports.enregistrer(scan.pk, cle, rapports.rendre_rapport_pdf(donnees))
+                else:
+                    pool, travail = _soumettre(pool, donnees, partage)
+            en_vol.append((scan, cle, donnees, travail))
+            while len(en_vol) >= fenetre:
+                scan, *reste = en_vol.popleft()
+                yield nom_fichier(scan), _contenu(scan, *reste)
+        while en_vol:
+            scan, *reste = en_vol.popleft()
+            yield nom_fichier(scan), _contenu(scan, *reste)
+    finally:
+        # Client déconnecté : les rendus de cet export encore en file sont abandonnés (pas ceux des autres)
+        for *_, travail in en_vol:
+            if isinstance(travail, Future):
+                travail.cancel()
+        if pool is not None and not partage:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# --- 3. ARCHIVE ZIP EN FLUX ---
+class _Tampon:
+    """Flux d'écriture non positionnable : zipfile y écrit, le générateur le vide après chaque fichier"""
+
+    def __init__(self):
+        self.morceaux = []
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self.morceaux)
+        self.morceaux.clear()
+        return donnees
+
+
+def flux_zip(fichiers):
+    """Archive ZIP produite morceau par morceau à partir d'un itérable de (nom, octets)"""
+    tampon = _Tampon()
+    with zipfile.ZipFile(tampon, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for nom, contenu in fichiers:
+            archive.writestr(nom, contenu)
+            morceau = tampon.vider()
+            if morceau:
+                yield morceau
+    # Répertoire central, écrit à la fermeture de l'archive
+    yield tampon.vider()
+
+
+def exporter_zip(scans, processus=None, fenetre=FENETRE_EXPORT):
+    """Flux ZIP des rapports d'un queryset de scans (lu par morceaux, jamais entièrement en mémoire)"""
+    return flux_zip(rapports_pdf(scans.iterator(chunk_size=100), processus, fenetre))
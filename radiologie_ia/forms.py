@@ -0,0 +1,22 @@
+from django import forms
+
+
+class FiltreExportForm(forms.Form):
+    """Filtre de l'export groupé des rapports PDF (tous les champs sont facultatifs)"""
+    debut = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    fin = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    score_min = forms.FloatField(required=False, min_value=0, max_value=1, widget=forms.NumberInput(
+        attrs={'step': '0.05', 'class': 'form-control form-control-sm', 'placeholder': 'Score min.'}
+    ))
+    patients = forms.CharField(required=False, widget=forms.TextInput(
+        attrs={'class': 'form-control form-control-sm', 'placeholder': 'Codes anonymes, séparés par des virgules'}
+    ))
+
+    def clean_patients(self):
+        return [code.strip() for code in self.cleaned_data['patients'].split(',') if code.strip()]
+
+    def clean(self):
+        donnees = super().clean()
+        if donnees.get('debut') and donnees.get('fin') and donnees['debut'] > donnees['fin']:
+            raise forms.ValidationError("La date de début doit précéder la date de fin.")
+        return donnees
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Analyse par lots tous les scans encore sans résultat IA (écritures groupées)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=None,
+                            help="Nombre de scans inférés et écrits par transaction")
+        parser.add_argument('--limite', type=int, default=None,
+                            help="Nombre maximal de scans à traiter")
+        parser.add_argument('--file', action='store_true',
+                            help="Mettre les scans en file pour les workers au lieu de les analyser ici")
+
+    def handle(self, *args, **options):
+        from radiologie_ia.pipeline import TAILLE_LOT, analyser_scans_en_attente, soumettre_scans_en_attente
+
+        taille_lot = options['taille_lot'] or TAILLE_LOT
+        debut = time.monotonic()
+
+        if options['file']:
+            total = soumettre_scans_en_attente(taille_lot=taille_lot)
+            self.stdout.write(self.style.SUCCESS(f"{total} scan(s) mis en file d'attente"))
+            return
+
+        def progression(total):
+            self.stdout.write(f"  {total} scan(s) analysé(s)...")
+
+        total = analyser_scans_en_attente(taille_lot=taille_lot, limite=options['limite'], progression=progression)
+        duree = time.monotonic() - debut
+        debit = total / duree if duree else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} scan(s) analysé(s) en {duree:.1f} s ({debit:.0f} scans/s)"
+        ))
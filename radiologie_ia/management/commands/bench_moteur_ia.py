@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from administration.models import ScannerCT
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (scans/s) d'un moteur IA pour plusieurs tailles de lot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--moteur', default=None,
+                            help="Classe du moteur (défaut : PULMOCARE_MOTEUR_IA)")
+        parser.add_argument('--tailles', default='1,8,32,128',
+                            help="Tailles de lot séparées par des virgules")
+        parser.add_argument('--scans', type=int, default=512,
+                            help="Nombre de scans inférés par taille de lot")
+        parser.add_argument('--octets', type=int, default=256 * 1024,
+                            help="Taille des fichiers synthétiques")
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        chemin = options['moteur'] or getattr(settings, 'PULMOCARE_MOTEUR_IA', 'radiologie_ia.moteurs.MoteurSimulation')
+        moteur = import_string(chemin)()
+        debut = time.perf_counter()
+        moteur.charger()
+        self.stdout.write(f"Moteur {moteur.nom} ({moteur.version}) chargé en {(time.perf_counter() - debut) * 1000:.1f} ms")
+
+        # Scans non persistés adossés à des fichiers en mémoire : aucun accès disque ni base
+        scans = []
+        for i in range(options['scans']):
+            scan = ScannerCT()
+            scan.image_dicom = ContentFile(os.urandom(options['octets']), name=f'bench_{i}.dcm')
+            scans.append(scan)
+
+        self.stdout.write(f"{'Lot':>6} {'scans/s':>12} {'ms/lot':>10}")
+        for taille in [int(t) for t in options['tailles'].split(',')]:
+            lots = [scans[i:i + taille] for i in range(0, len(scans), taille)]
+            moteur.predict_batch(lots[0])  # échauffement
+            debut = time.perf_counter()
+            for lot in lots:
+                moteur.predict_batch(lot)
+            duree = time.perf_counter() - debut
+            self.stdout.write(f"{taille:>6} {len(scans) / duree:>12.0f} {duree / len(lots) * 1000:>10.2f}")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from administration.models import ScannerCT, empreinte_fichier
+
+
+class Command(BaseCommand):
+    help = "Calcule l'empreinte SHA-256 des scans importés avant l'ajout de la colonne."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=500)
+
+    def handle(self, *args, **options):
+        total, dernier = 0, None
+        while True:
+            # Lots paginés par clé : on modifie la colonne filtrée pendant le parcours
+            qs = ScannerCT.objects.filter(empreinte_sha256='').only('id_scan', 'image_dicom').order_by('id_scan')
+            if dernier is not None:
+                qs = qs.filter(id_scan__gt=dernier)
+            lot = list(qs[:options['taille_lot']])
+            if not lot:
+                break
+            for scan in lot:
+                try:
+                    empreinte = empreinte_fichier(scan.image_dicom)
+                except FileNotFoundError:
+                    self.stderr.write(f"Fichier manquant pour le scan {scan.pk}")
+                    continue
+                ScannerCT.objects.filter(pk=scan.pk).update(empreinte_sha256=empreinte)
+                total += 1
+            dernier = lot[-1].pk
+        self.stdout.write(self.style.SUCCESS(f"{total} empreinte(s) calculée(s)"))
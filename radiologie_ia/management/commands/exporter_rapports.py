@@ -0,0 +1,30 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Exporte les rapports PDF filtrés dans une archive ZIP (rendu parallèle, écriture en flux)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help="Chemin de l'archive ZIP à écrire")
+        parser.add_argument('--debut', type=date.fromisoformat, default=None, help="AAAA-MM-JJ")
+        parser.add_argument('--fin', type=date.fromisoformat, default=None, help="AAAA-MM-JJ")
+        parser.add_argument('--score-min', type=float, default=None)
+        parser.add_argument('--patient', action='append', default=[], help="Code anonyme (option répétable)")
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Processus de rendu (défaut : PULMOCARE_EXPORT_PROCESSUS, 0 = sans pool)")
+
+    def handle(self, *args, **options):
+        from radiologie_ia.export import exporter_zip, scans_a_exporter
+
+        scans = scans_a_exporter(options['debut'], options['fin'], options['score_min'], options['patient'])
+        debut, taille = time.monotonic(), 0
+        with open(options['sortie'], 'wb') as archive:
+            for morceau in exporter_zip(scans, options['processus']):
+                archive.write(morceau)
+                taille += len(morceau)
+        self.stdout.write(self.style.SUCCESS(
+            f"{options['sortie']} : {taille / 1024:.0f} Ko écrits en {time.monotonic() - debut:.1f} s"
+        ))
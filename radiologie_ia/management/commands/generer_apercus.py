@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Planifie (ou génère directement avec --synchrone) les aperçus WebP/JPEG des scans "
+        "qui n'en ont pas encore, par exemple pour les scans antérieurs au pipeline d'aperçus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help="Régénère aussi les aperçus existants")
+        parser.add_argument('--synchrone', action='store_true', help="Génère dans ce processus, sans worker")
+        parser.add_argument('--taille-lot', type=int, default=200)
+
+    def handle(self, *args, **options):
+        from administration.models import ScannerCT
+        from radiologie_ia.apercus import generer_lot
+        from radiologie_ia.taches import soumettre_apercu
+
+        scans = ScannerCT.objects.order_by('pk')
+        if not options['tous']:
+            scans = scans.filter(date_apercu__isnull=True)
+
+        # Pagination par clé : les scans traités sortent du filtre sans décaler les pages suivantes
+        traites, dernier = 0, None
+        while True:
+            lot = scans.filter(pk__gt=dernier) if dernier else scans
+            lot = list(lot[:options['taille_lot']])
+            if not lot:
+                break
+            if options['synchrone']:
+                traites += generer_lot(lot)
+            else:
+                for scan in lot:
+                    soumettre_apercu(scan)
+                traites += len(lot)
+            dernier = lot[-1].pk
+
+        if options['synchrone']:
+            self.stdout.write(self.style.SUCCESS(f"{traites} scan(s) avec aperçus générés"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{traites} génération(s) d'aperçus planifiée(s)"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Évince les résultats en cache d'une version de moteur (par défaut : toutes sauf la courante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--version-moteur', default=None,
+                            help="Version de moteur à évincer")
+        parser.add_argument('--tout', action='store_true',
+                            help="Vider entièrement le cache")
+
+    def handle(self, *args, **options):
+        from radiologie_ia.cache_ia import purger_cache, statistiques_cache
+        from radiologie_ia.moteurs import get_moteur
+
+        if options['tout']:
+            supprimees = purger_cache()
+        elif options['version_moteur']:
+            supprimees = purger_cache(version=options['version_moteur'])
+        else:
+            supprimees = purger_cache(sauf_version=get_moteur().version)
+        stats = statistiques_cache()
+        self.stdout.write(self.style.SUCCESS(
+            f"{supprimees} entrée(s) supprimée(s) ; {stats['entrees']} restante(s), taux de hit {stats['taux_hit']}"
+        ))
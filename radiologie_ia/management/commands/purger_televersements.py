@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Supprime les téléversements DICOM abandonnés et leurs fichiers partiels."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delai', type=int, default=None,
+                            help="Inactivité en secondes (défaut : PULMOCARE_TELEVERSEMENT_DELAI_ABANDON)")
+
+    def handle(self, *args, **options):
+        from radiologie_ia.televersement import DELAI_ABANDON, purger_abandonnes
+
+        supprimes = purger_abandonnes(options['delai'] if options['delai'] is not None else DELAI_ABANDON)
+        self.stdout.write(self.style.SUCCESS(f"{supprimes} téléversement(s) abandonné(s) supprimé(s)"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs du dashboard radiologie à partir de la base (correction de dérive)."
+
+    def handle(self, *args, **options):
+        from radiologie_ia.compteurs import reconcilier
+
+        for cle, valeur in sorted(reconcilier().items()):
+            self.stdout.write(f"  {cle} = {valeur}")
+        self.stdout.write(self.style.SUCCESS("Compteurs réconciliés"))
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'agrégat journalier des scans (backfill) à partir de ScannerCT et AnalyseIA."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--debut', type=date.fromisoformat, default=None, help="AAAA-MM-JJ")
+        parser.add_argument('--fin', type=date.fromisoformat, default=None, help="AAAA-MM-JJ")
+
+    def handle(self, *args, **options):
+        from radiologie_ia.statistiques import reconstruire
+
+        lignes = reconstruire(options['debut'], options['fin'])
+        self.stdout.write(self.style.SUCCESS(f"{lignes} ligne(s) d'agrégat reconstruite(s)"))
@@ -0,0 +1,77 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+
+def _processus_worker(arret, intervalle, taille_lot):
+    """Point d'entrée d'un processus fils (compatible fork et spawn)"""
+    import django
+    django.setup()
+    from django.db import connections
+    from radiologie_ia.moteurs import get_moteur
+    from radiologie_ia.taches import boucle_worker
+
+    # Les connexions héritées du parent ne doivent jamais être partagées
+    connections.close_all()
+    # Poids chargés une fois au démarrage du worker, pas à la première tâche
+    get_moteur()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    boucle_worker(arret, intervalle, taille_lot)
+
+
+class Command(BaseCommand):
+    help = "Lance le pool de workers qui consomme la file d'attente des analyses IA."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Nombre de processus d'inférence (défaut : nombre de CPU)")
+        parser.add_argument('--intervalle', type=float, default=1.0,
+                            help="Attente en secondes quand la file est vide")
+        parser.add_argument('--taille-lot', type=int, default=8,
+                            help="Nombre de tâches réservées et inférées ensemble par un worker")
+        parser.add_argument('--reconciliation', type=int, default=300,
+                            help="Période en secondes de la réconciliation des compteurs (0 : jamais)")
+
+    def handle(self, *args, **options):
+        from django.db import connections
+        from radiologie_ia.compteurs import reconcilier
+        from radiologie_ia.taches import recuperer_taches_orphelines
+
+        remises = recuperer_taches_orphelines()
+        if remises:
+            self.stdout.write(self.style.WARNING(f"{remises} tâche(s) orpheline(s) remise(s) en file"))
+        connections.close_all()
+
+        arret = multiprocessing.Event()
+        processus = [
+            multiprocessing.Process(target=_processus_worker, args=(arret, options['intervalle'], options['taille_lot']), daemon=True)
+            for _ in range(max(1, options['workers']))
+        ]
+        for p in processus:
+            p.start()
+        self.stdout.write(self.style.SUCCESS(f"{len(processus)} worker(s) IA démarré(s)"))
+
+        # Le gestionnaire lève KeyboardInterrupt : pas de verrou pris dans un signal
+        def _arreter(*_):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, _arreter)
+        periode = options['reconciliation']
+        prochaine = time.monotonic() + periode
+        try:
+            while any(p.is_alive() for p in processus):
+                time.sleep(1.0)
+                # Le processus parent corrige périodiquement la dérive des compteurs
+                if periode and time.monotonic() >= prochaine:
+                    reconcilier()
+                    connections.close_all()
+                    prochaine = time.monotonic() + periode
+        except KeyboardInterrupt:
+            pass
+        finally:
+            arret.set()
+            for p in processus:
+                p.join(timeout=30)
+        self.stdout.write("Workers IA arrêtés")
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('administration', '0003_analyseia_consulte_par_medecin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacheAnalyse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', 'En attente'), ('EN_COURS', 'En cours'), ('TERMINEE', 'Terminée'), ('ECHEC', 'Échec')], default='EN_ATTENTE', max_length=12)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('tentatives', models.PositiveSmallIntegerField(default=0)),
+                ('disponible_apres', models.DateTimeField(default=django.utils.timezone.now)),
+                ('worker', models.CharField(blank=True, max_length=64)),
+                ('erreur', models.TextField(blank=True)),
+                ('demandee_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('scan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taches', to='administration.scannerct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['statut', 'date_creation'], name='radiologie__statut_39638d_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('statut__in', ['EN_ATTENTE', 'EN_COURS'])), fields=('scan',), name='tache_active_unique_par_scan')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiologie_ia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheInference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte_sha256', models.CharField(max_length=64)),
+                ('version_moteur', models.CharField(max_length=50)),
+                ('score_malignite', models.FloatField()),
+                ('details_nodules', models.JSONField(blank=True, null=True)),
+                ('nb_hits', models.PositiveIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['version_moteur'], name='radiologie__version_f5fdef_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empreinte_sha256', 'version_moteur'), name='cache_inference_unique')],
+            },
+        ),
+    ]
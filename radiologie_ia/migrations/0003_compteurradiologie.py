@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiologie_ia', '0002_cacheinference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurRadiologie',
+            fields=[
+                ('cle', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('valeur', models.BigIntegerField(default=0)),
+                ('date_reconciliation', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('radiologie_ia', '0003_compteurradiologie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('version_moteur', models.CharField(blank=True, max_length=50)),
+                ('nb_scans', models.IntegerField(default=0)),
+                ('nb_benins', models.IntegerField(default=0)),
+                ('nb_alertes', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('jour', 'version_moteur'), name='statistique_jour_moteur_unique')],
+            },
+        ),
+    ]
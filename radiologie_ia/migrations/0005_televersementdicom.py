@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:22
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0008_analyseia_date_modification'),
+        ('radiologie_ia', '0004_statistiquejournaliere'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeleversementDicom',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('chemin_partiel', models.CharField(max_length=255)),
+                ('taille_totale', models.BigIntegerField()),
+                ('recu', models.BigIntegerField(default=0)),
+                ('sha256_attendu', models.CharField(blank=True, max_length=64)),
+                ('statut', models.CharField(choices=[('EN_COURS', 'En cours'), ('TERMINE', 'Terminé')], default='EN_COURS', max_length=10)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to='administration.patient')),
+                ('scan', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='televersement', to='administration.scannerct')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['statut', 'date_maj'], name='radiologie__statut_d83082_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administration', '0009_scannerct_date_apercu'),
+        ('radiologie_ia', '0005_televersementdicom'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='tacheanalyse',
+            name='tache_active_unique_par_scan',
+        ),
+        migrations.AddField(
+            model_name='tacheanalyse',
+            name='nature',
+            field=models.CharField(choices=[('ANALYSE', 'Analyse IA'), ('APERCU', 'Génération des aperçus')], default='ANALYSE', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='tacheanalyse',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut__in', ['EN_ATTENTE', 'EN_COURS'])), fields=('scan', 'nature'), name='tache_active_unique_par_scan_nature'),
+        ),
+    ]
@@ -1,3 +1,154 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from administration.models import Patient, ScannerCT
+
+# ==========================================
+# FILE D'ATTENTE DES ANALYSES IA
+# ==========================================
+class TacheAnalyse(models.Model):
+    """
+    Tâche d'analyse persistée, consommée par les workers (manage.py worker_ia).
+    """
+    STATUTS = [
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_COURS', 'En cours'),
+        ('TERMINEE', 'Terminée'),
+        ('ECHEC', 'Échec'),
+    ]
+    STATUTS_ACTIFS = ('EN_ATTENTE', 'EN_COURS')
+    NATURES = [
+        ('ANALYSE', 'Analyse IA'),
+        ('APERCU', "Génération des aperçus"),
+    ]
+
+    scan = models.ForeignKey(ScannerCT, on_delete=models.CASCADE, related_name='taches')
+    nature = models.CharField(max_length=10, choices=NATURES, default='ANALYSE')
+    statut = models.CharField(max_length=12, choices=STATUTS, default='EN_ATTENTE')
+    demandee_par = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    # Après un échec, la tâche n'est reprise qu'une fois ce délai écoulé (attente exponentielle)
+    disponible_apres = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=64, blank=True)
+    erreur = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['statut', 'date_creation'])]
+        constraints = [
+            # Une seule tâche active par scan et par nature : un double clic ne relance pas l'IA
+            models.UniqueConstraint(
+                fields=['scan', 'nature'],
+                condition=models.Q(statut__in=['EN_ATTENTE', 'EN_COURS']),
+                name='tache_active_unique_par_scan_nature',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Tâche {self.pk} {self.get_nature_display()} ({self.get_statut_display()}) - Scan {self.scan_id}"
+
+    @property
+    def est_active(self):
+        return self.statut in self.STATUTS_ACTIFS
+
+
+# ==========================================
+# CACHE DES RÉSULTATS D'INFÉRENCE
+# ==========================================
+class CacheInference(models.Model):
+    """
+    Résultat d'inférence indexé par contenu : une étude renvoyée à l'identique
+    par le PACS réutilise le score au lieu de relancer le modèle.
+    """
+    empreinte_sha256 = models.CharField(max_length=64)
+    version_moteur = models.CharField(max_length=50)
+    score_malignite = models.FloatField()
+    details_nodules = models.JSONField(null=True, blank=True)
+    nb_hits = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empreinte_sha256', 'version_moteur'], name='cache_inference_unique'),
+        ]
+        indexes = [models.Index(fields=['version_moteur'])]
+
+    def __str__(self):
+        return f"{self.empreinte_sha256[:12]} ({self.version_moteur})"
+
+
+# ==========================================
+# COMPTEURS DU DASHBOARD RADIOLOGIE
+# ==========================================
+class CompteurRadiologie(models.Model):
+    """
+    Compteurs maintenus par signaux (radiologie_ia.compteurs) : le dashboard
+    les lit en une requête au lieu de quatre COUNT(*) sur ScannerCT.
+    """
+    cle = models.CharField(max_length=32, primary_key=True)
+    valeur = models.BigIntegerField(default=0)
+    date_reconciliation = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.cle} = {self.valeur}"
+
+
+# ==========================================
+# STATISTIQUES JOURNALIÈRES (ANALYTIQUE)
+# ==========================================
+class StatistiqueJournaliere(models.Model):
+    """
+    Agrégat par jour d'upload et par moteur, tenu à jour par signaux
+    (radiologie_ia.statistiques). Les uploads sont comptés sur version_moteur=''.
+    """
+    jour = models.DateField()
+    version_moteur = models.CharField(max_length=50, blank=True)
+    nb_scans = models.IntegerField(default=0)
+    nb_benins = models.IntegerField(default=0)
+    nb_alertes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Sert aussi d'index pour les requêtes par plage de jours
+            models.UniqueConstraint(fields=['jour', 'version_moteur'], name='statistique_jour_moteur_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} {self.version_moteur or 'uploads'}"
+
+
+# ==========================================
+# TÉLÉVERSEMENTS DICOM PAR MORCEAUX
+# ==========================================
+class TeleversementDicom(models.Model):
+    """
+    Téléversement reprenable : les morceaux sont écrits directement dans le fichier
+    partiel (stockage MEDIA), `recu` indique où reprendre après une coupure.
+    """
+    STATUTS = [
+        ('EN_COURS', 'En cours'),
+        ('TERMINE', 'Terminé'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='televersements')
+    cree_par = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    nom_fichier = models.CharField(max_length=255)
+    chemin_partiel = models.CharField(max_length=255)  # Relatif à MEDIA_ROOT
+    taille_totale = models.BigIntegerField()
+    recu = models.BigIntegerField(default=0)
+    sha256_attendu = models.CharField(max_length=64, blank=True)
+    statut = models.CharField(max_length=10, choices=STATUTS, default='EN_COURS')
+    scan = models.OneToOneField(ScannerCT, on_delete=models.SET_NULL, null=True, blank=True, related_name='televersement')
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['statut', 'date_maj'])]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.recu}/{self.taille_totale} octets)"
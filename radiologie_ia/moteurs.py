@@ -0,0 +1,159 @@
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from administration.models import resultat_ia_simule
+from .volumes import ErreurVolume, Volume
+
+ZONES = ["Lobe Supérieur Gauche", "Lobe Inférieur Droit", "Aucune"]
+
+
+# ==========================================
+# 1. CONTRAT DES MOTEURS D'INFÉRENCE
+# ==========================================
+class MoteurInference:
+    """
+    Un moteur charge ses poids une seule fois par processus (charger) puis
+    score des lots : predict_batch(scans) -> [(score_malignite, details_nodules), ...]
+    """
+    nom = 'base'
+    version = '0'
+
+    def charger(self):
+        pass
+
+    def predict_batch(self, scans):
+        raise NotImplementedError
+
+
+class MoteurSimulation(MoteurInference):
+    """Moteur de référence : le tirage aléatoire historique de simuler_ia"""
+    nom = 'simulation'
+    version = 'simulation-1'
+
+    def predict_batch(self, scans):
+        return [resultat_ia_simule() for _ in scans]
+
+
+class MoteurNumpy(MoteurInference):
+    """
+    Moteur CPU vectorisé : le lot entier est transformé en une matrice de
+    caractéristiques (n, d), puis scoré par quelques produits matriciels.
+    Les poids viennent de PULMOCARE_MOTEUR_IA_POIDS (.npz) ou d'une graine fixe.
+    Les volumes DICOM sont lus par coupes échantillonnées (memmap), jamais en entier.
+    """
+    nom = 'numpy'
+    version = 'numpy-2'
+    dimension = 64
+    octets_lus = 64 * 1024
+    coupes_echantillonnees = 8
+
+    def charger(self):
+        try:
+            import numpy as np
+        except ImportError as exc:
+            raise ImproperlyConfigured("Le moteur NumPy nécessite le paquet 'numpy'.") from exc
+        self.np = np
+
+        chemin = getattr(settings, 'PULMOCARE_MOTEUR_IA_POIDS', None)
+        if chemin:
+            poids = np.load(chemin)
+            self.w_score, self.b_score = poids['w_score'], float(poids['b_score'])
+            self.w_nodules, self.b_nodules = poids['w_nodules'], float(poids['b_nodules'])
+            self.w_zone, self.b_zone = poids['w_zone'], poids['b_zone']
+            self.version = str(poids['version']) if 'version' in poids else self.version
+        else:
+            rng = np.random.default_rng(20260201)
+            echelle = 1.0 / np.sqrt(self.dimension)
+            self.w_score = rng.normal(0.0, echelle, self.dimension).astype(np.float32)
+            self.b_score = 0.0
+            self.w_nodules = rng.normal(0.0, echelle, self.dimension).astype(np.float32)
+            self.b_nodules = 2.0
+            self.w_zone = rng.normal(0.0, echelle, (self.dimension, len(ZONES))).astype(np.float32)
+            self.b_zone = np.zeros(len(ZONES), dtype=np.float32)
+
+    def lire_octets(self, scan):
+        with scan.image_dicom.open('rb') as fichier:
+            return fichier.read(self.octets_lus)
+
+    def octets_du_scan(self, scan):
+        """Caractéristiques historiques : moyenne par bloc des premiers octets du fichier"""
+        np = self.np
+        brut = np.zeros(self.octets_lus, dtype=np.uint8)
+        octets = np.frombuffer(self.lire_octets(scan), dtype=np.uint8)
+        brut[:octets.size] = octets
+        return brut.reshape(self.dimension, -1).mean(axis=1, dtype=np.float32)
+
+    def volume_du_scan(self, scan):
+        """
+        Moyennes par bloc (grille côté x côté) de quelques coupes réparties dans le volume :
+        la mémoire du processus ne dépend que de la taille d'une coupe, pas du nombre de coupes.
+        """
+        np = self.np
+        cote = int(np.sqrt(self.dimension))
+        with Volume.du_scan(scan, coupes_en_cache=1) as volume:
+            indices = np.unique(np.linspace(0, len(volume) - 1, self.coupes_echantillonnees).astype(int))
+            somme = np.zeros((cote, cote), dtype=np.float32)
+            for indice in indices:
+                coupe = volume.coupe(int(indice))
+                lignes, colonnes = coupe.shape[0] // cote * cote, coupe.shape[1] // cote * cote
+                if not (lignes and colonnes):
+                    raise ErreurVolume("Coupe plus petite que la grille de caractéristiques")
+                somme += coupe[:lignes, :colonnes].reshape(cote, lignes // cote, cote, -1).mean(axis=(1, 3))
+        return somme.ravel() / len(indices)
+
+    def caracteristiques(self, scans):
+        """Matrice (n, dimension) : volume DICOM si lisible, sinon octets du fichier ; centrée-réduite par ligne"""
+        np = self.np
+        x = np.empty((len(scans), self.dimension), dtype=np.float32)
+        for i, scan in enumerate(scans):
+            try:
+                x[i] = self.volume_du_scan(scan)
+            except ErreurVolume:
+                x[i] = self.octets_du_scan(scan)
+        x -= x.mean(axis=1, keepdims=True)
+        x /= x.std(axis=1, keepdims=True) + 1e-6
+        return x
+
+    def predict_batch(self, scans):
+        if not scans:
+            return []
+        np = self.np
+        x = self.caracteristiques(scans)
+
+        scores = 0.1 + 0.85 / (1.0 + np.exp(-(x @ self.w_score + self.b_score)))
+        nodules = np.clip(np.rint(x @ self.w_nodules + self.b_nodules), 0, 4).astype(int)
+        zones = np.argmax(x @ self.w_zone + self.b_zone, axis=1)
+        confiances = (85 + np.abs(scores - 0.525) / 0.425 * 14).astype(int)
+
+        return [
+            (round(float(score), 2), {
+                "statut": "Analyse Complétée",
+                "nodules_detectes": int(nb),
+                "zone_critique": ZONES[zone] if nb else "Aucune",
+                "niveau_confiance": f"{confiance}%",
+            })
+            for score, nb, zone, confiance in zip(scores, nodules, zones, confiances)
+        ]
+
+
+# ==========================================
+# 2. MOTEUR DU PROCESSUS (chargé une fois)
+# ==========================================
+_moteur = None
+_verrou = threading.Lock()
+
+
+def get_moteur():
+    """Moteur configuré par PULMOCARE_MOTEUR_IA, instancié et chargé au premier appel du processus"""
+    global _moteur
+    if _moteur is None:
+        with _verrou:
+            if _moteur is None:
+                chemin = getattr(settings, 'PULMOCARE_MOTEUR_IA', 'radiologie_ia.moteurs.MoteurSimulation')
+                moteur = import_string(chemin)()
+                moteur.charger()
+                _moteur = moteur
+    return _moteur
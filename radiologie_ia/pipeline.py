@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from administration import evenements
+from administration.models import ScannerCT, AnalyseIA
+from core import fragments
+from . import compteurs, statistiques
+from .cache_ia import inferer_avec_cache
+from .moteurs import get_moteur
+from .models import TacheAnalyse
+from .signaux import analyses_creees_en_masse, evenement_analyse
+
+# Taille des lots d'inférence et d'écriture (une transaction par lot)
+TAILLE_LOT = getattr(settings, 'PULMOCARE_TAILLE_LOT_IA', 256)
+
+# Un scan est "à analyser" s'il n'a pas de résultat ou un résultat vide
+FILTRE_EN_ATTENTE = Q(resultat__isnull=True) | Q(resultat__score_malignite__isnull=True)
+
+
+def lots_en_attente(taille_lot=TAILLE_LOT):
+    """
+    Parcourt les scans à analyser par lots, paginés par clé (id_scan) et non par OFFSET :
+    chaque lot coûte une requête indexée, quelle que soit la taille du backlog.
+    """
+    dernier = None
+    while True:
+        qs = ScannerCT.objects.filter(FILTRE_EN_ATTENTE).order_by('id_scan')
+        if dernier is not None:
+            qs = qs.filter(id_scan__gt=dernier)
+        lot = list(qs[:taille_lot])
+        if not lot:
+            return
+        yield lot
+        dernier = lot[-1].pk
+
+
+def inferer_lot(scans):
+    """Inférence sur un lot de scans (via le cache) : une liste de (score, details) dans le même ordre"""
+    return inferer_avec_cache(scans, get_moteur())
+
+
+def analyser_lot(scans, taille_lot=TAILLE_LOT):
+    """
+    Analyse un lot de scans et persiste les résultats en écritures groupées :
+    un SELECT des analyses existantes, un bulk_create, un bulk_update.
+    """
+    if not scans:
+        return 0
+    resultats = inferer_lot(scans)
+    version = get_moteur().version
+    existantes = {a.scan_id: a for a in AnalyseIA.objects.filter(scan__in=scans)}
+    maintenant = timezone.now()
+
+    a_creer, a_maj, transitions, journaliers = [], [], [], []
+    for scan, (score, details) in zip(scans, resultats):
+        analyse = existantes.get(scan.pk)
+        apres = compteurs.categorie(score)
+        if analyse is None:
+            a_creer.append(AnalyseIA(
+                scan=scan, score_malignite=score, details_nodules=details, version_moteur=version
+            ))
+            avant, version_avant = None, ''
+        else:
+            avant, version_avant = compteurs.categorie(analyse.score_malignite), analyse.version_moteur
+            analyse.score_malignite, analyse.details_nodules = score, details
+            analyse.version_moteur = version
+            analyse.date_modification = maintenant  # bulk_update n'applique pas auto_now
+            a_maj.append(analyse)
+        transitions.append((avant, apres))
+        journaliers.append((compteurs.jour_upload(scan), (version_avant, avant), (version, apres)))
+
+    # Les écritures groupées n'émettent pas de signaux : compteurs et agrégats ajustés en un passage
+    deltas = compteurs.deltas_analyses(transitions)
+    deltas['non_analyses'] -= len(a_creer)
+
+    with transaction.atomic():
+        AnalyseIA.objects.bulk_create(a_creer, batch_size=taille_lot)
+        AnalyseIA.objects.bulk_update(
+            a_maj, ['score_malignite', 'details_nodules', 'version_moteur', 'date_modification'],
+            batch_size=taille_lot,
+        )
+        # Les tâches encore en file pour ces scans n'ont plus rien à faire
+        TacheAnalyse.objects.filter(
+            scan__in=scans, nature='ANALYSE', statut='EN_ATTENTE'
+        ).update(statut='TERMINEE', date_fin=maintenant)
+        compteurs.ajuster(deltas)
+        statistiques.ajuster_journalier(statistiques.deltas_journaliers(journaliers))
+        analyses_creees_en_masse.send(sender=AnalyseIA, analyses=a_creer)
+        fragments.invalider(AnalyseIA, TacheAnalyse)
+        evenements.publier_lot([
+            evenement_analyse(scan.pk, scan.patient_id, score) for scan, (score, _) in zip(scans, resultats)
+        ])
+    return len(a_creer) + len(a_maj)
+
+
+def analyser_scans_en_attente(taille_lot=TAILLE_LOT, limite=None, progression=None):
+    """Vide le backlog des scans non analysés, lot par lot. Renvoie le nombre de scans traités."""
+    total = 0
+    for lot in lots_en_attente(taille_lot):
+        if limite is not None:
+            lot = lot[:limite - total]
+        total += analyser_lot(lot, taille_lot)
+        if progression:
+            progression(total)
+        if limite is not None and total >= limite:
+            break
+    return total
+
+
+def soumettre_scans_en_attente(utilisateur=None, taille_lot=TAILLE_LOT):
+    """
+    Met en file d'attente tous les scans à analyser (bulk_create des tâches), en ignorant
+    ceux qui ont déjà une tâche active. Les workers les consomment ensuite par lots.
+    """
+    total = 0
+    for lot in lots_en_attente(taille_lot):
+        deja = set(
+            TacheAnalyse.objects.filter(
+                scan__in=lot, nature='ANALYSE', statut__in=TacheAnalyse.STATUTS_ACTIFS
+            ).values_list('scan_id', flat=True)
+        )
+        nouvelles = [
+            TacheAnalyse(scan=scan, demandee_par=utilisateur)
+            for scan in lot if scan.pk not in deja
+        ]
+        with transaction.atomic():
+            TacheAnalyse.objects.bulk_create(nouvelles, batch_size=taille_lot, ignore_conflicts=True)
+            fragments.invalider(TacheAnalyse)
+        total += len(nouvelles)
+    return total
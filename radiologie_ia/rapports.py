@@ -0,0 +1,190 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from core.instrumentation import mesurer_rendu
+from .compteurs import SEUIL_ALERTE
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter à chaque modification de la mise en page : invalide tous les rapports stockés
+VERSION_GABARIT = 1
+
+
+# --- 1. DONNÉES DU RAPPORT ---
+def donnees_rapport(scan):
+    """Tout ce que le rapport affiche, en types simples (sérialisable, transmissible à un autre processus)"""
+    patient, analyse = scan.patient, scan.resultat
+    aujourdhui = date.today()
+    naissance = patient.date_naissance
+    age = aujourdhui.year - naissance.year - ((aujourdhui.month, aujourdhui.day) < (naissance.month, naissance.day))
+    return {
+        'scan_id': str(scan.pk),
+        'nom_complet': patient.nom_complet,
+        'code_anonyme': patient.code_anonyme,
+        'genre': patient.get_genre_display(),
+        'age': age,
+        'score': analyse.score_malignite,
+        'details': analyse.details_nodules or {},
+        'version_moteur': analyse.version_moteur,
+        'date_analyse': analyse.date_modification.strftime('%d/%m/%Y %H:%M'),
+    }
+
+
+def cle_rapport(donnees):
+    """Empreinte du contenu : toute modification de l'analyse ou du patient change la clé"""
+    brut = json.dumps([VERSION_GABARIT, donnees], sort_keys=True, default=str)
+    return hashlib.sha256(brut.encode()).hexdigest()
+
+
+# --- 2. RENDU (fonction pure : données -> octets PDF) ---
+def rendre_rapport_pdf(donnees):
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    largeur, hauteur = A4
+
+    # En-tête
+    p.setFont("Helvetica-Bold", 18)
+    p.drawString(50, hauteur - 50, "PULMOCARE - RAPPORT D'ANALYSE IA")
+    p.setFont("Helvetica", 10)
+    p.drawString(50, hauteur - 65, f"Date de l'analyse : {donnees['date_analyse']}")
+    p.line(50, hauteur - 75, 550, hauteur - 75)
+
+    # Section Patient
+    p.setFont("Helvetica-Bold", 13)
+    p.drawString(50, hauteur - 110, "IDENTITÉ DU PATIENT")
+    p.setFont("Helvetica", 11)
+    p.drawString(60, hauteur - 130, f"Nom complet : {donnees['nom_complet']}")
+    p.drawString(60, hauteur - 150, f"ID Anonyme : {donnees['code_anonyme']}")
+    p.drawString(60, hauteur - 170, f"Genre : {donnees['genre']}")
+    p.drawString(60, hauteur - 190, f"Âge : {donnees['age']} ans")
+
+    # Section IA
+    p.setFont("Helvetica-Bold", 13)
+    p.drawString(50, hauteur - 230, "RÉSULTATS DE L'ALGORITHME IA")
+
+    score = donnees['score']
+    p.setFont("Helvetica-Bold", 14)
+
+    if score > SEUIL_ALERTE:
+        p.setFillColor(colors.red)
+        conclusion = "ALERTE : HAUTE PROBABILITÉ DE MALIGNITÉ"
+    else:
+        p.setFillColor(colors.green)
+        conclusion = "STABLE : FAIBLE PROBABILITÉ DE MALIGNITÉ"
+
+    p.drawString(60, hauteur - 260, f"Score de malignité : {score * 100}%")
+    p.drawString(60, hauteur - 285, f"Conclusion IA : {conclusion}")
+
+    # Détails techniques (issus du JSONField de l'analyse)
+    p.setFillColor(colors.black)
+    p.setFont("Helvetica", 11)
+    details = donnees['details']
+    p.drawString(60, hauteur - 320, f"Nodules détectés : {details.get('nodules_detectes', 'N/A')}")
+    p.drawString(60, hauteur - 340, f"Zone critique : {details.get('zone_critique', 'N/A')}")
+
+    # Pied de page
+    p.setFont("Helvetica-Oblique", 8)
+    p.drawString(50, 40, "Ce document est une aide au diagnostic. La signature du radiologue est requise pour validation.")
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+# --- 3. STOCKAGE SUR DISQUE ---
+def dossier_rapports():
+    # Lu à chaque appel : suit override_settings (les tests écrivent dans un dossier jetable)
+    return getattr(settings, 'PULMOCARE_RAPPORTS_DIR', os.path.join(settings.BASE_DIR, 'var', 'rapports'))
+
+
+def dossier_scan(scan_id):
+    return os.path.join(dossier_rapports(), str(scan_id))
+
+
+def enregistrer(scan_id, cle, contenu):
+    """Écriture atomique (fichier temporaire + rename) puis suppression des versions précédentes"""
+    dossier = dossier_scan(scan_id)
+    os.makedirs(dossier, exist_ok=True)
+    chemin = os.path.join(dossier, f'{cle}.pdf')
+    descripteur, temporaire = tempfile.mkstemp(dir=dossier, suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(contenu)
+    os.replace(temporaire, chemin)
+    for nom in os.listdir(dossier):
+        if nom != f'{cle}.pdf' and nom.endswith('.pdf'):
+            try:
+                os.remove(os.path.join(dossier, nom))
+            except FileNotFoundError:
+                pass
+    return chemin
+
+
+def chemin_stocke(scan_id, cle):
+    """Chemin du rapport stocké pour cette clé, ou None s'il reste à rendre"""
+    chemin = os.path.join(dossier_scan(scan_id), f'{cle}.pdf')
+    return chemin if os.path.exists(chemin) else None
+
+
+def rapport(scan):
+    """
+    Chemin et clé du rapport à jour du scan (scan.patient et scan.resultat chargés) :
+    lu sur disque s'il existe, rendu et stocké sinon.
+    """
+    donnees = donnees_rapport(scan)
+    cle = cle_rapport(donnees)
+    chemin = chemin_stocke(scan.pk, cle)
+    if chemin is None:
+        with mesurer_rendu():
+            contenu = rendre_rapport_pdf(donnees)
+        chemin = enregistrer(scan.pk, cle, contenu)
+    return chemin, cle
+
+
+def ouvrir_rapport(scan):
+    """
+    (fichier ouvert, clé, date de modification) du rapport à jour. Le fichier est ouvert une seule fois
+    et la date lue sur son descripteur : un invalider() concurrent (rmtree) ne fait plus échouer la requête.
+    """
+    for _ in range(2):
+        chemin, cle = rapport(scan)
+        try:
+            fichier = open(chemin, 'rb')
+        except FileNotFoundError:
+            # Supprimé entre le rendu et l'ouverture : rendu à nouveau
+            continue
+        return fichier, cle, os.fstat(fichier.fileno()).st_mtime
+    # Invalidé deux fois de suite : servi depuis la mémoire, sans passer par le stockage
+    donnees = donnees_rapport(scan)
+    with mesurer_rendu():
+        contenu = rendre_rapport_pdf(donnees)
+    return io.BytesIO(contenu), cle_rapport(donnees), time.time()
+
+
+def pre_rendre(scans):
+    """Rend à l'avance les rapports des scans analysés (worker) ; une erreur n'interrompt pas le lot"""
+    rendus = 0
+    for scan in scans:
+        try:
+            rapport(scan)
+            rendus += 1
+        except Exception:
+            logger.exception("Pré-rendu du rapport du scan %s impossible", scan.pk)
+    return rendus
+
+
+def invalider(scan_ids):
+    """Supprime les rapports stockés des scans (la clé suffit à ne jamais servir un rapport périmé)"""
+    for scan_id in scan_ids:
+        shutil.rmtree(dossier_scan(scan_id), ignore_errors=True)
@@ -0,0 +1,141 @@
+from django.db import transaction
+from django.urls import reverse
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import Signal, receiver
+
+from administration import evenements
+from administration.models import Patient, ScannerCT, AnalyseIA
+from core import fragments
+from . import apercus, compteurs, rapports, statistiques
+from .models import TacheAnalyse
+
+# Envoyé par le pipeline après un bulk_create d'analyses (qui n'émet pas post_save),
+# dans la même transaction : argument `analyses`, scans déjà chargés
+analyses_creees_en_masse = Signal()
+
+
+# --- ÉTAT INITIAL DES ANALYSES (pour calculer les transitions au save) ---
+@receiver(post_init, sender=AnalyseIA)
+def memoriser_etat_analyse(sender, instance, **kwargs):
+    # Champ différé : on ne déclenche pas de requête, la transition sera ignorée
+    instance._score_initial = instance.__dict__.get('score_malignite')
+    instance._version_initiale = instance.__dict__.get('version_moteur', '')
+    instance._etat_connu = 'score_malignite' in instance.__dict__
+
+
+# --- ÉVÉNEMENTS TEMPS RÉEL (flux SSE) ---
+def evenement_analyse(scan_id, patient_id, score):
+    """(type, données, service) d'une analyse terminée, pour publier ou publier_lot"""
+    return ('analyse_terminee', {
+        'scan': str(scan_id),
+        'patient': str(patient_id),
+        'score': score,
+        'alerte': compteurs.categorie(score) == 'alertes',  # Couleur du badge
+        'critique': compteurs.est_critique(score),  # Alerte critique, comme statut_tache
+        'url_pdf': reverse('generer_pdf', args=[scan_id]),
+    }, '')
+
+
+@receiver(post_save, sender=ScannerCT)
+def publier_scan_ajoute(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        evenements.publier('scan_ajoute', {'scan': str(instance.pk), 'patient': str(instance.patient_id)}, 'RADIO')
+
+
+@receiver(post_save, sender=AnalyseIA)
+def publier_analyse(sender, instance, created, raw=False, **kwargs):
+    # Connecté avant compter_analyse_enregistree, qui remet _score_initial à jour
+    if raw or instance.score_malignite is None:
+        return
+    if created or (instance._etat_connu and instance._score_initial != instance.score_malignite):
+        evenements.publier(*evenement_analyse(instance.scan_id, instance.scan.patient_id, instance.score_malignite))
+
+
+# --- COMPTEURS DU DASHBOARD ---
+@receiver(post_save, sender=ScannerCT)
+def compter_scan_ajoute(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        compteurs.ajuster({'non_analyses': 1, compteurs.cle_jour(compteurs.jour_upload(instance)): 1})
+        statistiques.compter_upload(instance, 1)
+
+
+@receiver(post_delete, sender=ScannerCT)
+def compter_scan_supprime(sender, instance, **kwargs):
+    # L'analyse éventuelle est supprimée avant (cascade) et a déjà rendu le scan "non analysé"
+    compteurs.ajuster({'non_analyses': -1, compteurs.cle_jour(compteurs.jour_upload(instance)): -1})
+    statistiques.compter_upload(instance, -1)
+
+
+@receiver(post_save, sender=AnalyseIA)
+def compter_analyse_enregistree(sender, instance, created, raw=False, **kwargs):
+    if raw or not (created or instance._etat_connu):
+        return
+    avant = None if created else compteurs.categorie(instance._score_initial)
+    apres = compteurs.categorie(instance.score_malignite)
+    deltas = compteurs.deltas_analyses([(avant, apres)])
+    if created:
+        deltas['non_analyses'] -= 1
+    compteurs.ajuster(deltas)
+
+    version_avant = '' if created else instance._version_initiale
+    if (version_avant, avant) != (instance.version_moteur, apres):
+        statistiques.ajuster_journalier(statistiques.deltas_journaliers([
+            (compteurs.jour_upload(instance.scan), (version_avant, avant), (instance.version_moteur, apres)),
+        ]))
+    instance._score_initial, instance._version_initiale = instance.score_malignite, instance.version_moteur
+    instance._etat_connu = True
+
+
+@receiver(post_delete, sender=AnalyseIA)
+def compter_analyse_supprimee(sender, instance, **kwargs):
+    avant = compteurs.categorie(instance._score_initial)
+    deltas = compteurs.deltas_analyses([(avant, None)])
+    deltas['non_analyses'] += 1
+    compteurs.ajuster(deltas)
+    if avant:
+        statistiques.ajuster_journalier(statistiques.deltas_journaliers([
+            (compteurs.jour_upload(instance.scan), (instance._version_initiale, avant), ('', None)),
+        ]))
+
+
+# --- RAPPORTS PDF STOCKÉS ---
+@receiver(post_save, sender=AnalyseIA)
+@receiver(post_delete, sender=AnalyseIA)
+def invalider_rapport_analyse(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rapports.invalider([instance.scan_id])
+
+
+@receiver(post_save, sender=Patient)
+def invalider_rapports_patient(sender, instance, created, raw=False, **kwargs):
+    # Identité affichée dans le rapport ; un nouveau patient n'a encore aucun rapport
+    if not (created or raw):
+        rapports.invalider(instance.scans.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=ScannerCT)
+def supprimer_rapports_scan(sender, instance, **kwargs):
+    rapports.invalider([instance.pk])
+
+
+# --- APERÇUS ---
+@receiver(post_save, sender=ScannerCT)
+def planifier_apercus(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Import local : taches -> pipeline -> signaux. La tâche n'est visible du worker qu'après le commit
+        from .taches import soumettre_apercu
+        transaction.on_commit(lambda: soumettre_apercu(instance))
+
+
+@receiver(post_delete, sender=ScannerCT)
+def supprimer_apercus_scan(sender, instance, **kwargs):
+    if instance.image_dicom:
+        apercus.supprimer(instance.image_dicom.name)
+
+
+# --- CACHE DES FRAGMENTS (badge "En cours" du dashboard) ---
+@receiver(post_save, sender=TacheAnalyse)
+@receiver(post_delete, sender=TacheAnalyse)
+def invalider_fragments_tache(sender, instance, using=None, **kwargs):
+    if instance.nature == 'ANALYSE':
+        fragments.invalider(sender, using=using)
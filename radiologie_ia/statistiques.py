@@ -0,0 +1,125 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncDate
+
+from administration.models import ScannerCT, AnalyseIA
+from .compteurs import SEUIL_ALERTE, jour_upload
+from .models import StatistiqueJournaliere
+
+CHAMPS = {'benins': 'nb_benins', 'alertes': 'nb_alertes'}
+
+
+# --- 1. MISE À JOUR INCRÉMENTALE ---
+def deltas_journaliers(transitions):
+    """
+    transitions : [(jour, (version, categorie) avant, (version, categorie) après)]
+    Renvoie {(jour, version): {champ: delta}} pour ajuster_journalier.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for jour, (version_avant, avant), (version_apres, apres) in transitions:
+        if (version_avant, avant) == (version_apres, apres):
+            continue
+        if avant:
+            deltas[(jour, version_avant)][CHAMPS[avant]] -= 1
+        if apres:
+            deltas[(jour, version_apres)][CHAMPS[apres]] += 1
+    return deltas
+
+
+def ajuster_journalier(deltas):
+    """Une mise à jour F() par (jour, moteur) ; la ligne est créée au premier événement du jour"""
+    for (jour, version), champs in deltas.items():
+        champs = {champ: delta for champ, delta in champs.items() if delta}
+        if not champs:
+            continue
+        increments = {champ: F(champ) + delta for champ, delta in champs.items()}
+        if StatistiqueJournaliere.objects.filter(jour=jour, version_moteur=version).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                StatistiqueJournaliere.objects.create(
+                    jour=jour, version_moteur=version,
+                    **{champ: max(delta, 0) for champ, delta in champs.items()}
+                )
+        except IntegrityError:
+            StatistiqueJournaliere.objects.filter(jour=jour, version_moteur=version).update(**increments)
+
+
+def compter_upload(scan, delta):
+    ajuster_journalier({(jour_upload(scan), ''): {'nb_scans': delta}})
+
+
+# --- 2. LECTURE ---
+def lire_periode(debut, fin):
+    """Toutes les lignes de la plage [debut, fin] en une requête sur l'index (jour, version_moteur)"""
+    return list(
+        StatistiqueJournaliere.objects.filter(jour__range=(debut, fin)).values_list(
+            'jour', 'version_moteur', 'nb_scans', 'nb_benins', 'nb_alertes'
+        )
+    )
+
+
+def series(lignes, debut, fin, par_mois=False):
+    """Séries pour les graphiques : volume, bénins/alertes par période et alertes par moteur"""
+    cle = (lambda jour: jour.replace(day=1)) if par_mois else (lambda jour: jour)
+    periodes, jour = [], debut
+    while jour <= fin:
+        if cle(jour) not in periodes:
+            periodes.append(cle(jour))
+        jour += timedelta(days=1)
+
+    index = {periode: i for i, periode in enumerate(periodes)}
+    scans, benins, alertes = [0] * len(periodes), [0] * len(periodes), [0] * len(periodes)
+    par_moteur = defaultdict(lambda: [0] * len(periodes))
+    for jour, version, nb_scans, nb_benins, nb_alertes in lignes:
+        i = index[cle(jour)]
+        scans[i] += nb_scans
+        benins[i] += nb_benins
+        alertes[i] += nb_alertes
+        if version:
+            par_moteur[version][i] += nb_benins + nb_alertes
+
+    return {
+        'labels': [p.strftime('%m/%Y' if par_mois else '%d/%m') for p in periodes],
+        'scans': scans,
+        'benins': benins,
+        'alertes': alertes,
+        'par_moteur': dict(par_moteur),
+    }
+
+
+# --- 3. RECONSTRUCTION (BACKFILL) ---
+def reconstruire(debut=None, fin=None):
+    """Recalcule l'agrégat à partir de ScannerCT/AnalyseIA (deux requêtes GROUP BY) sur une plage"""
+    scans = ScannerCT.objects.annotate(jour=TruncDate('date_upload'))
+    analyses = AnalyseIA.objects.filter(score_malignite__isnull=False).annotate(jour=TruncDate('scan__date_upload'))
+    if debut:
+        scans, analyses = scans.filter(jour__gte=debut), analyses.filter(jour__gte=debut)
+    if fin:
+        scans, analyses = scans.filter(jour__lte=fin), analyses.filter(jour__lte=fin)
+
+    lignes = {}
+    for ligne in scans.values('jour').annotate(n=Count('pk')):
+        lignes[(ligne['jour'], '')] = StatistiqueJournaliere(jour=ligne['jour'], version_moteur='', nb_scans=ligne['n'])
+    for ligne in analyses.values('jour', 'version_moteur').annotate(
+        benins=Count('pk', filter=Q(score_malignite__lte=SEUIL_ALERTE)),
+        alertes=Count('pk', filter=Q(score_malignite__gt=SEUIL_ALERTE)),
+    ):
+        stat = lignes.setdefault(
+            (ligne['jour'], ligne['version_moteur']),
+            StatistiqueJournaliere(jour=ligne['jour'], version_moteur=ligne['version_moteur']),
+        )
+        stat.nb_benins, stat.nb_alertes = ligne['benins'], ligne['alertes']
+
+    existantes = StatistiqueJournaliere.objects.all()
+    if debut:
+        existantes = existantes.filter(jour__gte=debut)
+    if fin:
+        existantes = existantes.filter(jour__lte=fin)
+    with transaction.atomic():
+        existantes.delete()
+        StatistiqueJournaliere.objects.bulk_create(lignes.values(), batch_size=500)
+    return len(lignes)
@@ -0,0 +1,189 @@
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from administration import evenements
+from administration.models import AnalyseIA
+from core import fragments
+from . import apercus, compteurs, rapports
+from .models import TacheAnalyse
+from .pipeline import analyser_lot
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'essais avant de marquer une tâche en échec définitif
+MAX_TENTATIVES = getattr(settings, 'PULMOCARE_TACHES_MAX_TENTATIVES', 3)
+# Une tâche EN_COURS plus vieille que ce délai appartient à un worker mort
+DELAI_ORPHELINE = getattr(settings, 'PULMOCARE_TACHES_DELAI_ORPHELINE', 600)
+# Attente avant le premier nouvel essai (secondes), doublée à chaque échec
+DELAI_REESSAI = getattr(settings, 'PULMOCARE_TACHES_DELAI_REESSAI', 30)
+
+
+# --- 1. SOUMISSION (côté web) ---
+def soumettre_analyse(scan, utilisateur=None, nature='ANALYSE'):
+    """Met le scan en file d'attente et renvoie la tâche active (existante ou créée)"""
+    actives = TacheAnalyse.objects.filter(scan=scan, nature=nature, statut__in=TacheAnalyse.STATUTS_ACTIFS)
+    tache = actives.first()
+    if tache:
+        return tache
+    try:
+        with transaction.atomic():
+            return TacheAnalyse.objects.create(scan=scan, nature=nature, demandee_par=utilisateur)
+    except IntegrityError:
+        # Course avec une autre requête : la contrainte garantit l'unicité
+        return actives.get()
+
+
+def soumettre_apercu(scan, utilisateur=None):
+    """Génération des aperçus en arrière-plan (après un upload ou à la demande)"""
+    return soumettre_analyse(scan, utilisateur, nature='APERCU')
+
+
+def taches_actives_par_scan(scan_ids):
+    """{scan_id: tache_id} des analyses en cours pour une page du dashboard (une requête)"""
+    return dict(
+        TacheAnalyse.objects.filter(
+            scan_id__in=scan_ids, nature='ANALYSE', statut__in=TacheAnalyse.STATUTS_ACTIFS
+        ).values_list('scan_id', 'pk')
+    )
+
+
+# --- 2. CONSOMMATION (côté worker) ---
+def identifiant_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def reserver_taches(worker, taille=1):
+    """
+    Réserve jusqu'à `taille` tâches en attente et disponibles, les plus anciennes d'abord.
+    L'UPDATE conditionnel sur le statut sert de verrou entre workers concurrents.
+    """
+    ids = list(
+        TacheAnalyse.objects.filter(
+            statut='EN_ATTENTE', disponible_apres__lte=timezone.now()
+        ).order_by('date_creation').values_list('pk', flat=True)[:taille]
+    )
+    if not ids:
+        return []
+    TacheAnalyse.objects.filter(pk__in=ids, statut='EN_ATTENTE').update(
+        statut='EN_COURS',
+        date_debut=timezone.now(),
+        worker=worker,
+        tentatives=F('tentatives') + 1,
+    )
+    # Un worker traite ses lots séquentiellement : ses tâches EN_COURS sont celles qu'il vient de prendre
+    return list(
+        TacheAnalyse.objects.filter(
+            pk__in=ids, statut='EN_COURS', worker=worker
+        ).select_related('scan__patient')
+    )
+
+
+def executer_taches(taches):
+    """Exécute un lot de tâches réservées (analyses et aperçus séparément) et enregistre leur issue"""
+    taches_analyse = [tache for tache in taches if tache.nature == 'ANALYSE']
+    taches_apercu = [tache for tache in taches if tache.nature == 'APERCU']
+    return _executer(taches_analyse, _analyser) + _executer(taches_apercu, _generer_apercus)
+
+
+def _analyser(taches):
+    analyser_lot([tache.scan for tache in taches])
+    # Rapports PDF rendus d'avance : le premier téléchargement est servi depuis le disque
+    analyses = {analyse.scan_id: analyse for analyse in AnalyseIA.objects.filter(scan__in=[t.scan for t in taches])}
+    scans = [tache.scan for tache in taches if tache.scan_id in analyses]
+    for scan in scans:
+        scan.resultat = analyses[scan.pk]
+    rapports.pre_rendre(scans)
+
+
+def _generer_apercus(taches):
+    apercus.generer_lot([tache.scan for tache in taches])
+
+
+def _executer(taches, traitement):
+    if not taches:
+        return 0
+    try:
+        traitement(taches)
+    except Exception:
+        erreur = traceback.format_exc()
+        maintenant = timezone.now()
+        for tache in taches:
+            tache.erreur = erreur
+            tache.statut = 'EN_ATTENTE' if tache.tentatives < MAX_TENTATIVES else 'ECHEC'
+            tache.date_fin = maintenant if tache.statut == 'ECHEC' else None
+            tache.disponible_apres = maintenant + delai_reessai(tache.tentatives)
+        TacheAnalyse.objects.bulk_update(taches, ['statut', 'erreur', 'date_fin', 'disponible_apres'])
+        fragments.invalider(TacheAnalyse)
+        return 0
+
+    TacheAnalyse.objects.filter(pk__in=[tache.pk for tache in taches]).update(
+        statut='TERMINEE', date_fin=timezone.now(), erreur=''
+    )
+    fragments.invalider(TacheAnalyse)
+    return len(taches)
+
+
+def delai_reessai(tentatives):
+    """Attente exponentielle : une panne durable (modèle absent, disque plein) n'occupe pas les workers en boucle"""
+    return timedelta(seconds=DELAI_REESSAI * 2 ** max(tentatives - 1, 0))
+
+
+def recuperer_taches_orphelines(delai=DELAI_ORPHELINE):
+    """Remet en file les tâches abandonnées par un worker arrêté brutalement"""
+    limite = timezone.now() - timedelta(seconds=delai)
+    return TacheAnalyse.objects.filter(statut='EN_COURS', date_debut__lt=limite).update(
+        statut='EN_ATTENTE', worker=''
+    )
+
+
+def purger_evenements():
+    """Journal des flux SSE borné par les workers eux-mêmes : aucune tâche cron à planifier"""
+    try:
+        evenements.purger()
+    except DatabaseError:
+        logger.exception("Purge des événements impossible (nouvel essai au prochain intervalle)")
+
+
+def boucle_worker(arret, intervalle=1.0, taille_lot=1):
+    """Boucle d'un processus worker : réserve un lot, l'exécute, recommence jusqu'à l'arrêt"""
+    worker = identifiant_worker()
+    prochaine_purge = time.monotonic()
+    while not arret.is_set():
+        close_old_connections()
+        if time.monotonic() >= prochaine_purge:
+            prochaine_purge = time.monotonic() + evenements.INTERVALLE_PURGE
+            purger_evenements()
+        taches = reserver_taches(worker, taille_lot)
+        if not taches:
+            arret.wait(intervalle)
+            continue
+        executer_taches(taches)
+
+
+def statut_tache(tache):
+    """Représentation JSON d'une tâche pour le polling du dashboard"""
+    donnees = {
+        'id': tache.pk,
+        'scan': str(tache.scan_id),
+        'statut': tache.statut,
+        'libelle': tache.get_statut_display(),
+        'tentatives': tache.tentatives,
+        'url_statut': reverse('statut_analyse', args=[tache.pk]),
+    }
+    if tache.statut == 'TERMINEE':
+        analyse = AnalyseIA.objects.filter(scan_id=tache.scan_id).only('score_malignite').first()
+        if analyse:
+            donnees['score_malignite'] = analyse.score_malignite
+            donnees['critique'] = compteurs.est_critique(analyse.score_malignite)
+    return donnees
+
@@ -0,0 +1,204 @@
+import fcntl
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from administration.models import ScannerCT
+from .models import TeleversementDicom
+
+# Taille maximale d'un morceau et taille des lectures dans le flux de la requête
+TAILLE_MAX_MORCEAU = getattr(settings, 'PULMOCARE_TELEVERSEMENT_MORCEAU', 8 * 1024 * 1024)
+TAILLE_LECTURE = 64 * 1024
+# Au-delà, un téléversement EN_COURS sans nouveau morceau est purgé
+DELAI_ABANDON = getattr(settings, 'PULMOCARE_TELEVERSEMENT_DELAI_ABANDON', 24 * 3600)
+
+
+class ErreurTeleversement(Exception):
+    """Requête invalide (400) ; `statut` précise le code HTTP à renvoyer"""
+    statut = 400
+
+
+class ConflitDecalage(ErreurTeleversement):
+    """Le morceau ne commence pas là où le serveur en est : le client doit reprendre à `recu`"""
+    statut = 409
+
+
+# --- 1. HACHAGE INCRÉMENTAL ---
+# SHA-256 en cours par téléversement, propre au processus : {id: (octets hachés, date_maj, objet sha256)}.
+# Valable seulement si ce processus a écrit le dernier morceau (même `recu` et même `date_maj` qu'en base) :
+# sinon (autre worker, redémarrage, remise à zéro) le fichier partiel est re-haché depuis le disque.
+_hachages = OrderedDict()
+_verrou = threading.Lock()
+MAX_HACHAGES = 256
+
+
+def _hachage(televersement, fichier):
+    with _verrou:
+        etat = _hachages.pop(televersement.pk, None)
+    if etat and etat[:2] == (televersement.recu, televersement.date_maj):
+        return etat[2]
+    sha, restant = hashlib.sha256(), televersement.recu
+    fichier.seek(0)
+    while restant:
+        donnees = fichier.read(min(TAILLE_LECTURE, restant))
+        if not donnees:
+            raise ErreurTeleversement("Fichier partiel plus court que les octets reçus")
+        sha.update(donnees)
+        restant -= len(donnees)
+    return sha
+
+
+def _memoriser(televersement, sha):
+    with _verrou:
+        _hachages[televersement.pk] = (televersement.recu, televersement.date_maj, sha)
+        while len(_hachages) > MAX_HACHAGES:
+            _hachages.popitem(last=False)
+
+
+@contextmanager
+def _ecrivain_unique(televersement):
+    """
+    Fichier partiel ouvert et verrouillé (flock, tous les workers du nœud) : un seul envoi à la fois
+    par téléversement. L'état est relu en base une fois le verrou obtenu, avant toute écriture.
+    """
+    try:
+        fichier = open(default_storage.path(televersement.chemin_partiel), 'r+b')
+    except FileNotFoundError:
+        raise ErreurTeleversement("Fichier partiel introuvable (téléversement purgé ou finalisé)")
+    with fichier:
+        try:
+            fcntl.flock(fichier, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ConflitDecalage("Un autre envoi est en cours pour ce téléversement")
+        televersement.refresh_from_db(fields=['recu', 'statut', 'date_maj'])
+        if televersement.statut != 'EN_COURS':
+            raise ErreurTeleversement("Téléversement déjà finalisé")
+        yield fichier
+
+
+# --- 2. CYCLE DE VIE ---
+def creer(patient, nom_fichier, taille_totale, sha256_attendu='', utilisateur=None):
+    """Réserve le fichier partiel dans scanners/%Y/%m/%d/ (même dossier que le fichier final)"""
+    if taille_totale <= 0:
+        raise ErreurTeleversement("Taille totale invalide")
+    televersement = TeleversementDicom(
+        patient=patient, cree_par=utilisateur, nom_fichier=os.path.basename(nom_fichier)[:255],
+        taille_totale=taille_totale, sha256_attendu=(sha256_attendu or '').lower(),
+    )
+    champ = ScannerCT._meta.get_field('image_dicom')
+    dossier = os.path.dirname(champ.generate_filename(None, televersement.nom_fichier or 'scan.dcm'))
+    televersement.chemin_partiel = os.path.join(dossier, f'{televersement.pk}.part')
+    chemin = default_storage.path(televersement.chemin_partiel)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    open(chemin, 'wb').close()
+    televersement.save()
+    return televersement
+
+
+def ecrire_morceau(televersement, decalage, flux, longueur):
+    """
+    Ajoute `longueur` octets lus par blocs dans `flux` (le corps de la requête) à partir de `decalage`.
+    Rien n'est bufferisé au-delà d'un bloc ; une coupure en cours de morceau garde les octets écrits.
+    """
+    if longueur <= 0 or longueur > TAILLE_MAX_MORCEAU:
+        raise ErreurTeleversement(f"Morceau de 1 à {TAILLE_MAX_MORCEAU} octets attendu")
+
+    # Le décalage est vérifié sous le verrou : un envoi concurrent du même morceau échoue
+    # avant d'avoir touché au fichier
+    with _ecrivain_unique(televersement) as fichier:
+        if decalage != televersement.recu:
+            raise ConflitDecalage(f"Reprendre à l'octet {televersement.recu}")
+        if decalage + longueur > televersement.taille_totale:
+            raise ErreurTeleversement("Le morceau dépasse la taille annoncée")
+
+        sha = _hachage(televersement, fichier)
+        ecrits = 0
+        # Un morceau interrompu a pu écrire au-delà de `recu` : on repart de l'état validé
+        fichier.seek(decalage)
+        fichier.truncate()
+        while ecrits < longueur:
+            donnees = flux.read(min(TAILLE_LECTURE, longueur - ecrits))
+            if not donnees:
+                break
+            fichier.write(donnees)
+            sha.update(donnees)
+            ecrits += len(donnees)
+        fichier.flush()
+
+        maintenant = timezone.now()
+        # UPDATE conditionnel : garde-fou si le verrou n'a pas joué (stockage partagé entre nœuds)
+        if not TeleversementDicom.objects.filter(
+            pk=televersement.pk, recu=decalage, statut='EN_COURS'
+        ).update(recu=decalage + ecrits, date_maj=maintenant):
+            raise ConflitDecalage("Morceau concurrent déjà reçu à ce décalage")
+        televersement.recu, televersement.date_maj = decalage + ecrits, maintenant
+        _memoriser(televersement, sha)
+    return ecrits
+
+
+def finaliser(televersement, sha256_attendu=''):
+    """
+    Vérifie taille et empreinte, renomme le fichier partiel et crée le ScannerCT. Le fichier n'est
+    relu que si ce processus n'a pas haché lui-même tous les morceaux (voir _hachage).
+    """
+    with _ecrivain_unique(televersement) as fichier:
+        if televersement.recu != televersement.taille_totale:
+            raise ConflitDecalage(f"{televersement.recu} octet(s) reçu(s) sur {televersement.taille_totale}")
+
+        chemin = default_storage.path(televersement.chemin_partiel)
+        empreinte = _hachage(televersement, fichier).hexdigest()
+        attendu = (sha256_attendu or televersement.sha256_attendu).lower()
+        if attendu and attendu != empreinte:
+            # Contenu corrompu : on repart de zéro plutôt que de garder des octets douteux
+            TeleversementDicom.objects.filter(pk=televersement.pk).update(recu=0, date_maj=timezone.now())
+            fichier.truncate(0)
+            raise ErreurTeleversement(f"Empreinte SHA-256 différente ({empreinte}) : téléversement à reprendre")
+
+        nom_final = default_storage.get_available_name(
+            os.path.join(
+                os.path.dirname(televersement.chemin_partiel),
+                default_storage.get_valid_name(televersement.nom_fichier or 'scan.dcm'),
+            )
+        )
+        os.replace(chemin, default_storage.path(nom_final))
+        with transaction.atomic():
+            scan = ScannerCT(patient_id=televersement.patient_id, image_dicom=nom_final, empreinte_sha256=empreinte)
+            scan.save()
+            televersement.scan, televersement.statut = scan, 'TERMINE'
+            televersement.save(update_fields=['scan', 'statut', 'date_maj'])
+    with _verrou:
+        _hachages.pop(televersement.pk, None)
+    return scan
+
+
+def etat(televersement):
+    """Représentation JSON pour le client (reprise : envoyer le morceau suivant à partir de `recu`)"""
+    return {
+        'id': str(televersement.pk),
+        'statut': televersement.statut,
+        'recu': televersement.recu,
+        'taille_totale': televersement.taille_totale,
+        'taille_max_morceau': TAILLE_MAX_MORCEAU,
+        'scan': str(televersement.scan_id) if televersement.scan_id else None,
+    }
+
+
+def purger_abandonnes(delai=DELAI_ABANDON):
+    """Supprime les téléversements inactifs depuis `delai` secondes et leurs fichiers partiels"""
+    limite = timezone.now() - timedelta(seconds=delai)
+    abandonnes = list(TeleversementDicom.objects.filter(statut='EN_COURS', date_maj__lt=limite))
+    for televersement in abandonnes:
+        try:
+            os.remove(default_storage.path(televersement.chemin_partiel))
+        except FileNotFoundError:
+            pass
+    TeleversementDicom.objects.filter(pk__in=[t.pk for t in abandonnes]).delete()
+    return len(abandonnes)
@@ -0,0 +1,23 @@
+from django import template
+
+from radiologie_ia.apercus import TAILLES_APERCU, urls_apercu
+
+register = template.Library()
+
+
+@register.inclusion_tag('partials/apercu.html')
+def apercu(scan, taille=None, largeur=None):
+    """
+    <picture> WebP/JPEG chargé en différé, affiché sur `largeur` pixels (défaut : taille de l'aperçu).
+    Icône de remplacement tant que les aperçus n'existent pas.
+    """
+    taille = int(taille or min(TAILLES_APERCU))
+    largeur = int(largeur or taille)
+    if not scan.date_apercu:
+        return {'largeur': largeur}
+    return {
+        'largeur': largeur,
+        'urls': urls_apercu(scan, taille),
+        'url_agrandie': urls_apercu(scan, max(TAILLES_APERCU))['jpg'],
+        'alt': f"Aperçu du scan du {scan.date_upload:%d/%m/%Y}",
+    }
@@ -1,3 +1,656 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from administration.models import AnalyseIA, ScannerCT, Utilisateur
+from administration.tests import creer_patient
+from . import apercus, compteurs, moteurs, taches, televersement as televersements
+from .cache_ia import inferer_avec_cache
+from .export import exporter_zip, nom_fichier, scans_a_exporter
+from .forms import FiltreExportForm
+from .models import CacheInference, StatistiqueJournaliere, TacheAnalyse, TeleversementDicom
+from .pipeline import analyser_lot
+from .statistiques import reconstruire
+from .volumes import EXPLICITE_LE, IMPLICITE_LE, LONGUEUR_INDEFINIE, VR_LONGS, ErreurVolume, PasDicom, Volume, lire_entete
+
+
+class FichiersTemporaires:
+    """Fichiers écrits par l'application (MEDIA_ROOT, rapports, métriques, cache des fragments) dans un dossier jetable"""
+
+    @classmethod
+    def setUpClass(cls):
+        dossier = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=os.path.join(dossier, 'media'),
+            PULMOCARE_RAPPORTS_DIR=os.path.join(dossier, 'rapports'),
+            PULMOCARE_METRIQUES_FICHIER=os.path.join(dossier, 'metriques.bin'),
+            CACHES={**settings.CACHES, 'fragments': {
+                **settings.CACHES['fragments'], 'LOCATION': os.path.join(dossier, 'fragments'),
+            }},
+        ))
+        super().setUpClass()
+
+
+def creer_scan(patient, contenu=b'DICM', nom='scan.dcm'):
+    return ScannerCT.objects.create(patient=patient, image_dicom=ContentFile(contenu, name=nom))
+
+
+class TachesTests(FichiersTemporaires, TestCase):
+    """File des analyses : réservation exclusive entre workers, nouvel essai différé, échec définitif, reprise"""
+
+    def setUp(self):
+        self.patient = creer_patient('PC-001', 'Jean Martin')
+        self.client.force_login(Utilisateur.objects.create_user('radio', service='RADIO'))
+
+    def tache(self, numero=1):
+        return taches.soumettre_analyse(creer_scan(self.patient, bytes([numero])))
+
+    def test_reservation_concurrente(self):
+        soumises = {self.tache(i).pk for i in range(4)}
+        autre, course = [], []
+
+        def concurrent(execute, sql, params, many, context):
+            # Un second worker a lu les mêmes tâches et les réserve juste avant notre UPDATE
+            if sql.startswith('UPDATE') and not course:
+                course.append(sql)
+                autre.extend(taches.reserver_taches('worker-b', 2))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(concurrent):
+            miennes = taches.reserver_taches('worker-a', 4)
+        a, b = {tache.pk for tache in miennes}, {tache.pk for tache in autre}
+        self.assertEqual(len(b), 2)
+        self.assertFalse(a & b)
+        self.assertEqual(a | b, soumises)
+        self.assertEqual(
+            dict(TacheAnalyse.objects.values_list('pk', 'worker')),
+            {**{pk: 'worker-a' for pk in a}, **{pk: 'worker-b' for pk in b}},
+        )
+        self.assertEqual(set(TacheAnalyse.objects.values_list('tentatives', flat=True)), {1})
+
+    def test_execution(self):
+        tache = self.tache()
+        self.assertEqual(taches.executer_taches(taches.reserver_taches('worker')), 1)
+        tache.refresh_from_db()
+        self.assertEqual((tache.statut, tache.erreur), ('TERMINEE', ''))
+        self.assertIsNotNone(tache.date_fin)
+        self.assertTrue(AnalyseIA.objects.filter(scan_id=tache.scan_id).exists())
+
+    def test_echec_apres_max_tentatives(self):
+        tache = self.tache()
+        with mock.patch.object(taches, '_analyser', side_effect=RuntimeError('modèle indisponible')):
+            for essai in range(1, taches.MAX_TENTATIVES + 1):
+                reservees = taches.reserver_taches('worker')
+                self.assertEqual([t.pk for t in reservees], [tache.pk])
+                avant = timezone.now()
+                self.assertEqual(taches.executer_taches(reservees), 0)
+                tache.refresh_from_db()
+                self.assertEqual(tache.tentatives, essai)
+                self.assertIn('modèle indisponible', tache.erreur)
+                if essai < taches.MAX_TENTATIVES:
+                    self.assertEqual(tache.statut, 'EN_ATTENTE')
+                    self.assertGreaterEqual(tache.disponible_apres, avant + taches.delai_reessai(essai))
+                    # Pas de nouvel essai avant l'échéance, même avec des workers libres
+                    self.assertEqual(taches.reserver_taches('worker'), [])
+                    TacheAnalyse.objects.filter(pk=tache.pk).update(disponible_apres=timezone.now())
+        self.assertEqual(tache.statut, 'ECHEC')
+        self.assertIsNotNone(tache.date_fin)
+        self.assertEqual(taches.reserver_taches('worker'), [])
+
+    def test_attente_exponentielle(self):
+        delais = [taches.delai_reessai(tentatives).total_seconds() for tentatives in (1, 2, 3)]
+        self.assertEqual(delais, [taches.DELAI_REESSAI, 2 * taches.DELAI_REESSAI, 4 * taches.DELAI_REESSAI])
+
+    def test_taches_orphelines(self):
+        orpheline, recente = self.tache(1), self.tache(2)
+        taches.reserver_taches('worker-mort', 2)
+        TacheAnalyse.objects.filter(pk=orpheline.pk).update(
+            date_debut=timezone.now() - timedelta(seconds=taches.DELAI_ORPHELINE + 60)
+        )
+        self.assertEqual(taches.recuperer_taches_orphelines(), 1)
+        orpheline.refresh_from_db()
+        recente.refresh_from_db()
+        self.assertEqual((orpheline.statut, orpheline.worker), ('EN_ATTENTE', ''))
+        self.assertEqual((recente.statut, recente.worker), ('EN_COURS', 'worker-mort'))
+
+        reprise, = taches.reserver_taches('worker', 2)
+        self.assertEqual((reprise.pk, reprise.tentatives), (orpheline.pk, 2))
+
+    def test_statut_json(self):
+        tache = self.tache()
+        url = reverse('statut_analyse', args=[tache.pk])
+        self.assertEqual(self.client.get(url).json(), {
+            'id': tache.pk,
+            'scan': str(tache.scan_id),
+            'statut': 'EN_ATTENTE',
+            'libelle': 'En attente',
+            'tentatives': 0,
+            'url_statut': url,
+        })
+        TacheAnalyse.objects.filter(pk=tache.pk).update(statut='TERMINEE')
+        AnalyseIA.objects.create(scan_id=tache.scan_id, score_malignite=0.9)
+        donnees = self.client.get(url).json()
+        self.assertEqual((donnees['statut'], donnees['libelle']), ('TERMINEE', 'Terminée'))
+        self.assertEqual((donnees['score_malignite'], donnees['critique']), (0.9, True))
+
+    def test_lancer_analyse_en_post(self):
+        scan = creer_scan(self.patient)
+        url = reverse('lancer_analyse', args=[scan.pk])
+        self.assertEqual(self.client.get(url).status_code, 405)
+        self.assertFalse(TacheAnalyse.objects.filter(nature='ANALYSE').exists())
+
+        premiere = self.client.post(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(premiere.status_code, 202)
+        self.assertEqual(premiere.json()['statut'], 'EN_ATTENTE')
+        # Double clic : la tâche active est renvoyée, pas dupliquée
+        self.assertEqual(self.client.post(url, HTTP_ACCEPT='application/json').json()['id'], premiere.json()['id'])
+
+        sans_jeton = Client(enforce_csrf_checks=True)
+        sans_jeton.force_login(Utilisateur.objects.get(username='radio'))
+        self.assertEqual(sans_jeton.post(url).status_code, 403)
+
+
+class MoteursTests(FichiersTemporaires, TestCase):
+    """Moteur choisi par PULMOCARE_MOTEUR_IA, chargé une fois par processus ; un lot vaut la somme des unitaires"""
+
+    def test_moteur_configure(self):
+        with mock.patch.object(moteurs, '_moteur', None):
+            self.assertIsInstance(moteurs.get_moteur(), moteurs.MoteurSimulation)
+        with mock.patch.object(moteurs, '_moteur', None), \
+                override_settings(PULMOCARE_MOTEUR_IA='radiologie_ia.moteurs.MoteurNumpy'):
+            moteur = moteurs.get_moteur()
+            self.assertIsInstance(moteur, moteurs.MoteurNumpy)
+            self.assertIs(moteurs.get_moteur(), moteur)
+
+    def test_charge_une_fois(self):
+        with mock.patch.object(moteurs, '_moteur', None), \
+                mock.patch.object(moteurs.MoteurSimulation, 'charger') as charger:
+            self.assertIs(moteurs.get_moteur(), moteurs.get_moteur())
+        charger.assert_called_once()
+
+    def test_lot_egal_aux_unitaires(self):
+        patient = creer_patient('PC-001', 'Jean Martin')
+        scans = [
+            creer_scan(patient, bytes((graine * k + 7) % 256 for k in range(taille)))
+            for graine, taille in ((1, 1), (3, 100), (7, 5000), (11, 70000))
+        ]
+        moteur = moteurs.MoteurNumpy()
+        moteur.charger()
+        self.assertEqual(moteur.predict_batch(scans), [moteur.predict_batch([scan])[0] for scan in scans])
+        self.assertEqual(moteur.predict_batch([]), [])
+
+
+class MoteurCompteur(moteurs.MoteurInference):
+    """Moteur de test : score tiré du contenu, scans reçus comptés"""
+    version = 'compteur-1'
+
+    def __init__(self, version=None):
+        self.version = version or self.version
+        self.inferes = 0
+
+    def predict_batch(self, scans):
+        self.inferes += len(scans)
+        return [(self.score(scan), {'version': self.version}) for scan in scans]
+
+    def score(self, scan):
+        with scan.image_dicom.open('rb') as fichier:
+            return fichier.read(1)[0] / 255
+
+
+class CacheInferenceTests(FichiersTemporaires, TestCase):
+    """Cache d'inférence : un contenu déjà vu par une version du moteur n'est plus envoyé au modèle"""
+
+    def setUp(self):
+        self.patient = creer_patient('PC-001', 'Jean Martin')
+
+    def scan(self, contenu):
+        return creer_scan(self.patient, contenu)
+
+    def test_contenus_deja_vus(self):
+        moteur = MoteurCompteur()
+        premiers = inferer_avec_cache([self.scan(b'A'), self.scan(b'A'), self.scan(b'B')], moteur)
+        # Doublon du lot inféré une fois
+        self.assertEqual(moteur.inferes, 2)
+        self.assertEqual(premiers[0], premiers[1])
+        self.assertEqual(CacheInference.objects.count(), 2)
+
+        # Nouveaux scans au contenu connu : servis par le cache, sans appel au modèle
+        seconds = inferer_avec_cache([self.scan(b'B'), self.scan(b'A'), self.scan(b'A')], moteur)
+        self.assertEqual(moteur.inferes, 2)
+        self.assertEqual(seconds, [premiers[2], premiers[0], premiers[0]])
+        self.assertEqual(
+            dict(CacheInference.objects.values_list('empreinte_sha256', 'nb_hits')),
+            {hashlib.sha256(b'A').hexdigest(): 2, hashlib.sha256(b'B').hexdigest(): 1},
+        )
+
+    def test_version_du_moteur(self):
+        inferer_avec_cache([self.scan(b'A')], MoteurCompteur())
+        nouveau = MoteurCompteur('compteur-2')
+        (_, details), = inferer_avec_cache([self.scan(b'A')], nouveau)
+        self.assertEqual((nouveau.inferes, details), (1, {'version': 'compteur-2'}))
+        self.assertEqual(CacheInference.objects.count(), 2)
+
+    def test_scan_sans_empreinte(self):
+        scan = self.scan(b'A')
+        ScannerCT.objects.filter(pk=scan.pk).update(empreinte_sha256='')
+        scan = ScannerCT.objects.get(pk=scan.pk)
+        moteur = MoteurCompteur()
+        for _ in range(2):
+            inferer_avec_cache([scan], moteur)
+        self.assertEqual(moteur.inferes, 2)
+        self.assertFalse(CacheInference.objects.exists())
+
+    def test_empreinte_calculee_a_l_ecriture_du_fichier(self):
+        scan = self.scan(b'A')
+        self.assertEqual(scan.empreinte_sha256, hashlib.sha256(b'A').hexdigest())
+        # Ligne antérieure à la colonne : un save() ne relit pas le fichier, la commande complète
+        ScannerCT.objects.filter(pk=scan.pk).update(empreinte_sha256='')
+        ancien = ScannerCT.objects.get(pk=scan.pk)
+        with mock.patch('administration.models.empreinte_fichier') as empreinte:
+            ancien.save()
+        empreinte.assert_not_called()
+        call_command('calculer_empreintes', stdout=io.StringIO())
+        ancien.refresh_from_db()
+        self.assertEqual(ancien.empreinte_sha256, hashlib.sha256(b'A').hexdigest())
+
+        ancien.image_dicom = ContentFile(b'B', name='scan.dcm')
+        ancien.save()
+        self.assertEqual(ancien.empreinte_sha256, hashlib.sha256(b'B').hexdigest())
+
+
+class CompteursTests(FichiersTemporaires, TestCase):
+    """Compteurs du dashboard tenus par les signaux et le pipeline : toujours égaux au recalcul par COUNT"""
+
+    def setUp(self):
+        self.patient = creer_patient('PC-001', 'Jean Martin')
+        compteurs.reconcilier()
+
+    def scan(self, contenu=b'DICM'):
+        return creer_scan(self.patient, contenu)
+
+    def assertCompteursExacts(self):
+        attendu = compteurs.compter_depuis_la_base()
+        stats = compteurs.lire_compteurs()
+        self.assertEqual(
+            {cle: stats[cle] for cle in ('non_analyses', 'benins', 'alertes')},
+            {cle: attendu[cle] for cle in ('non_analyses', 'benins', 'alertes')},
+        )
+        self.assertEqual(stats['total_aujourdhui'], attendu[compteurs.cle_jour(timezone.localdate())])
+
+    def test_creation_modification_suppression(self):
+        scans = [self.scan(bytes([i])) for i in range(3)]
+        self.assertCompteursExacts()
+        analyse = AnalyseIA.objects.create(scan=scans[0], score_malignite=0.3)
+        AnalyseIA.objects.create(scan=scans[1], score_malignite=0.9)
+        self.assertCompteursExacts()
+
+        # Bénin -> alerte, puis retour depuis une instance relue
+        analyse.score_malignite = 0.7
+        analyse.save()
+        self.assertCompteursExacts()
+        analyse = AnalyseIA.objects.get(pk=analyse.pk)
+        analyse.score_malignite = 0.2
+        analyse.save()
+        self.assertCompteursExacts()
+
+        analyse.delete()
+        self.assertCompteursExacts()
+        # Suppression en cascade de l'analyse avec son scan
+        scans[1].delete()
+        self.assertCompteursExacts()
+        self.assertEqual(compteurs.lire_compteurs()['non_analyses'], 2)
+
+    def test_analyses_en_masse(self):
+        scans = [self.scan(bytes([i])) for i in range(4)]
+        analyser_lot(scans[:3])
+        self.assertCompteursExacts()
+        # Deuxième passage : bulk_update des analyses existantes
+        analyser_lot(scans)
+        self.assertCompteursExacts()
+        self.assertEqual(compteurs.lire_compteurs()['non_analyses'], 0)
+
+
+class StatistiquesTests(FichiersTemporaires, TestCase):
+    """Agrégat journalier tenu par les signaux et le pipeline : identique à une reconstruction complète"""
+
+    def etat(self):
+        return {
+            ligne for ligne in StatistiqueJournaliere.objects.values_list(
+                'jour', 'version_moteur', 'nb_scans', 'nb_benins', 'nb_alertes'
+            ) if any(ligne[2:])
+        }
+
+    def test_agregat_egal_a_la_reconstruction(self):
+        patient = creer_patient('PC-001', 'Jean Martin')
+        scans = [creer_scan(patient, bytes([i])) for i in range(6)]
+        benin = AnalyseIA.objects.create(scan=scans[0], score_malignite=0.3, version_moteur='v1')
+        alerte = AnalyseIA.objects.create(scan=scans[1], score_malignite=0.9, version_moteur='v1')
+        analyser_lot(scans[2:5])
+        analyser_lot(scans[2:4])
+
+        # Re-scorés : bénin -> alerte, puis alerte -> bénin par un autre moteur
+        benin.score_malignite = 0.8
+        benin.save()
+        alerte.score_malignite, alerte.version_moteur = 0.2, 'v2'
+        alerte.save()
+        AnalyseIA.objects.get(pk=benin.pk).delete()
+        scans[2].delete()
+
+        attendu = self.etat()
+        self.assertTrue(attendu)
+        reconstruire()
+        self.assertEqual(self.etat(), attendu)
+
+
+class ExportTests(FichiersTemporaires, TestCase):
+    """Export groupé : archive ZIP lisible, rapports dans l'ordre des uploads, filtres du formulaire"""
+
+    @classmethod
+    def setUpTestData(cls):
+        jean, marie = creer_patient('PC-001', 'Jean Martin'), creer_patient('PC-002', 'Marie Curie')
+        cls.scans = []
+        for numero, (patient, jour, score) in enumerate((
+            (marie, date(2025, 3, 2), 0.7), (jean, date(2025, 3, 1), 0.2), (jean, date(2025, 3, 2), 0.9),
+        )):
+            scan = creer_scan(patient, bytes([numero]))
+            ScannerCT.objects.filter(pk=scan.pk).update(
+                date_upload=timezone.make_aware(datetime.combine(jour, time(9, numero)))
+            )
+            AnalyseIA.objects.create(scan=scan, score_malignite=score)
+            cls.scans.append(scan)
+        # Scan non analysé : jamais exporté
+        creer_scan(jean, b'attente')
+
+    def noms(self, *indices):
+        scans = ScannerCT.objects.select_related('patient').in_bulk([self.scans[i].pk for i in indices])
+        return [nom_fichier(scans[self.scans[i].pk]) for i in indices]
+
+    def exporter(self, **filtres):
+        flux = exporter_zip(scans_a_exporter(**filtres), processus=0, fenetre=2)
+        return zipfile.ZipFile(io.BytesIO(b''.join(flux)))
+
+    def test_archive_en_flux(self):
+        archive = self.exporter()
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), self.noms(1, 0, 2))
+        self.assertTrue(archive.namelist()[0].startswith('20250301_PC-001_'))
+        contenus = [archive.read(nom) for nom in archive.namelist()]
+        self.assertTrue(all(contenu.startswith(b'%PDF-') for contenu in contenus))
+        # Deuxième export : rapports relus sur le disque, identiques
+        self.assertEqual([self.exporter().read(nom) for nom in archive.namelist()], contenus)
+
+    def test_filtres(self):
+        self.assertEqual(self.exporter(debut=date(2025, 3, 2)).namelist(), self.noms(0, 2))
+        self.assertEqual(self.exporter(fin=date(2025, 3, 1)).namelist(), self.noms(1))
+        self.assertEqual(self.exporter(score_min=0.5, patients=['PC-001']).namelist(), self.noms(2))
+
+    def test_formulaire(self):
+        form = FiltreExportForm({'debut': '2025-03-02', 'fin': '2025-03-01'})
+        self.assertFalse(form.is_valid())
+        self.assertIn('__all__', form.errors)
+        form = FiltreExportForm({'debut': '2025-03-01', 'fin': '2025-03-01', 'patients': ' PC-001, ,PC-002 '})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['patients'], ['PC-001', 'PC-002'])
+
+
+class TeleversementTests(FichiersTemporaires, TestCase):
+    """Téléversement par morceaux : reprise au décalage du serveur, empreinte vérifiée à la finalisation"""
+
+    contenu = bytes(range(256)) * 40
+
+    def setUp(self):
+        self.patient = creer_patient('PC-001', 'Jean Martin')
+        televersements._hachages.clear()
+
+    def creer(self, sha256=''):
+        return televersements.creer(self.patient, 'etude.dcm', len(self.contenu), sha256)
+
+    def envoyer(self, televersement, debut, fin):
+        return televersements.ecrire_morceau(
+            televersement, debut, io.BytesIO(self.contenu[debut:fin]), fin - debut,
+        )
+
+    def test_reprise_apres_coupure(self):
+        televersement = self.creer(hashlib.sha256(self.contenu).hexdigest())
+        self.envoyer(televersement, 0, 4000)
+        # Morceau coupé en route : seuls les octets reçus comptent, le client reprend à `recu`
+        flux = io.BytesIO(self.contenu[4000:5000])
+        self.assertEqual(televersements.ecrire_morceau(televersement, 4000, flux, 3000), 1000)
+
+        # Reprise par un autre processus (état relu en base, fichier partiel re-haché)
+        televersements._hachages.clear()
+        reprise = TeleversementDicom.objects.get(pk=televersement.pk)
+        self.assertEqual(televersements.etat(reprise)['recu'], 5000)
+        with self.assertRaises(televersements.ConflitDecalage):
+            self.envoyer(reprise, 4000, 6000)
+        self.envoyer(reprise, 5000, len(self.contenu))
+
+        scan = televersements.finaliser(reprise)
+        self.assertEqual(scan.empreinte_sha256, hashlib.sha256(self.contenu).hexdigest())
+        with default_storage.open(scan.image_dicom.name) as fichier:
+            self.assertEqual(fichier.read(), self.contenu)
+        self.assertEqual(TeleversementDicom.objects.get(pk=televersement.pk).statut, 'TERMINE')
+
+    def test_finalisation_incomplete(self):
+        televersement = self.creer()
+        self.envoyer(televersement, 0, 100)
+        with self.assertRaises(televersements.ConflitDecalage):
+            televersements.finaliser(televersement)
+
+    def test_empreinte_differente(self):
+        televersement = self.creer('0' * 64)
+        self.envoyer(televersement, 0, len(self.contenu))
+        with self.assertRaises(televersements.ErreurTeleversement):
+            televersements.finaliser(televersement)
+        # Contenu douteux : tout est à renvoyer, aucun scan créé
+        televersement.refresh_from_db()
+        self.assertEqual((televersement.recu, televersement.statut), (0, 'EN_COURS'))
+        self.assertEqual(default_storage.size(televersement.chemin_partiel), 0)
+        self.assertFalse(ScannerCT.objects.exists())
+
+        self.envoyer(televersement, 0, len(self.contenu))
+        scan = televersements.finaliser(televersement, hashlib.sha256(self.contenu).hexdigest())
+        self.assertEqual(scan.empreinte_sha256, hashlib.sha256(self.contenu).hexdigest())
+
+    def test_fichier_partiel_altere(self):
+        televersement = self.creer(hashlib.sha256(self.contenu).hexdigest())
+        self.envoyer(televersement, 0, 4000)
+        # Octets reçus modifiés sur le disque : un processus sans hachage en mémoire relit le fichier
+        with open(default_storage.path(televersement.chemin_partiel), 'r+b') as fichier:
+            fichier.write(b'\xff')
+        televersements._hachages.clear()
+        self.envoyer(televersement, 4000, len(self.contenu))
+        with self.assertRaises(televersements.ErreurTeleversement):
+            televersements.finaliser(televersement)
+
+
+def image_png(largeur=800, hauteur=600):
+    tampon = io.BytesIO()
+    Image.linear_gradient('L').resize((largeur, hauteur)).save(tampon, 'PNG')
+    return tampon.getvalue()
+
+
+class StockageSansChemin(Storage):
+    """Stockage d'objets distant simulé : l'API de Storage sur MEDIA_ROOT, sans chemin local (path)"""
+
+    def __init__(self):
+        self.local = FileSystemStorage()
+
+    def _open(self, name, mode='rb'):
+        return self.local.open(name, mode)
+
+    def _save(self, name, content):
+        return self.local.save(name, content)
+
+    def delete(self, name):
+        self.local.delete(name)
+
+    def exists(self, name):
+        return self.local.exists(name)
+
+    def listdir(self, path):
+        return self.local.listdir(path)
+
+
+class ApercusTests(FichiersTemporaires, TestCase):
+    """Aperçus WebP/JPEG : toutes les tailles écrites, balise <picture>, suppression avec le scan"""
+
+    def setUp(self):
+        self.scan = creer_scan(creer_patient('PC-001', 'Jean Martin'), image_png(), 'radio.png')
+
+    def apercus(self, stockage=default_storage):
+        dossier, base = os.path.split(self.scan.image_dicom.name)
+        return sorted(nom for nom in stockage.listdir(dossier)[1] if nom.startswith(f'{base}.apercu-'))
+
+    def test_generation(self):
+        apercus.generer(self.scan)
+        for taille in apercus.TAILLES_APERCU:
+            for extension, format_pillow, _ in apercus.FORMATS_APERCU:
+                with default_storage.open(apercus.nom_apercu(self.scan.image_dicom.name, taille, extension)) as fichier:
+                    image = Image.open(fichier)
+                    self.assertEqual((image.format, max(image.size)), (format_pillow, taille))
+        self.assertEqual(ScannerCT.objects.get(pk=self.scan.pk).date_apercu, self.scan.date_apercu)
+
+    def test_balise(self):
+        gabarit = Template('{% load apercus %}{% apercu scan 160 48 %}')
+        self.assertNotIn('<picture>', gabarit.render(Context({'scan': self.scan})))
+        apercus.generer(self.scan)
+        html = gabarit.render(Context({'scan': self.scan}))
+        self.assertIn('<picture>', html)
+        self.assertIn(f'.apercu-160.webp?v={int(self.scan.date_apercu.timestamp())}', html)
+        self.assertIn('width="48"', html)
+
+    def test_suppression_avec_le_scan(self):
+        apercus.generer(self.scan)
+        self.assertEqual(len(self.apercus()), 4)
+        self.scan.delete()
+        self.assertEqual(self.apercus(), [])
+
+    def test_stockage_sans_chemin_local(self):
+        stockage = StockageSansChemin()
+        with mock.patch.object(apercus, 'default_storage', stockage):
+            apercus.generer(self.scan)
+            # Régénération : mêmes noms remplacés, pas de copie suffixée par le stockage
+            apercus.generer(self.scan)
+            self.assertEqual(len(self.apercus(stockage)), 4)
+            apercus.supprimer(self.scan.image_dicom.name)
+            self.assertEqual(self.apercus(stockage), [])
+
+
+def element(groupe, numero, vr, valeur, explicite=True):
+    """Élément DICOM little endian, VR explicite ou implicite"""
+    if len(valeur) % 2:
+        valeur += b'\0' if vr in (b'OB', b'UI') else b' '
+    etiquette = struct.pack('<HH', groupe, numero)
+    if not explicite:
+        return etiquette + struct.pack('<I', len(valeur)) + valeur
+    if vr in VR_LONGS:
+        return etiquette + vr + b'\0\0' + struct.pack('<I', len(valeur)) + valeur
+    return etiquette + vr + struct.pack('<H', len(valeur)) + valeur
+
+
+def sequence_indefinie(contenu, explicite=True):
+    """VOI LUT Sequence de longueur indéfinie, avec un item lui aussi de longueur indéfinie"""
+    debut = struct.pack('<HH', 0x0028, 0x3010) + (b'SQ\0\0' if explicite else b'')
+    item = struct.pack('<HHI', 0xFFFE, 0xE000, LONGUEUR_INDEFINIE) + contenu + struct.pack('<HHI', 0xFFFE, 0xE00D, 0)
+    return debut + struct.pack('<I', LONGUEUR_INDEFINIE) + item + struct.pack('<HHI', 0xFFFE, 0xE0DD, 0)
+
+
+def fichier_dicom(volume, explicite=True, syntaxe=None, pente=2, ordonnee=-1024):
+    """Fichier Part 10 minimal : volume int16 (coupes, lignes, colonnes) et une séquence à sauter"""
+    syntaxe = syntaxe or (EXPLICITE_LE if explicite else IMPLICITE_LE)
+    meta = element(0x0002, 0x0010, b'UI', syntaxe.encode())
+    meta = element(0x0002, 0x0000, b'UL', struct.pack('<I', len(meta))) + meta
+    nb, lignes, colonnes = volume.shape
+    entier = lambda valeur: struct.pack('<H', valeur)
+    corps = b''.join(element(0x0028, numero, vr, valeur, explicite) for numero, vr, valeur in (
+        (0x0002, b'US', entier(1)), (0x0004, b'CS', b'MONOCHROME2'), (0x0008, b'IS', str(nb).encode()),
+        (0x0010, b'US', entier(lignes)), (0x0011, b'US', entier(colonnes)), (0x0100, b'US', entier(16)),
+        (0x0103, b'US', entier(1)), (0x1052, b'DS', str(ordonnee).encode()), (0x1053, b'DS', str(pente).encode()),
+    ))
+    # Un faux nombre de lignes dans la séquence : lu seulement si la séquence n'est pas sautée
+    corps += sequence_indefinie(element(0x0028, 0x0010, b'US', entier(999), explicite), explicite)
+    corps += element(0x7FE0, 0x0010, b'OW', volume.astype('<i2').tobytes(), explicite)
+    return b'\0' * 128 + b'DICM' + meta + corps
+
+
+class VolumesTests(SimpleTestCase):
+    """Lecteur DICOM : en-tête parcouru sans lire les pixels, volume projeté en mémoire coupe par coupe"""
+
+    volume = (np.arange(2 * 4 * 6).reshape(2, 4, 6) - 10).astype(np.int16)
+
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+
+    def ecrire(self, contenu):
+        chemin = os.path.join(self.dossier, f'{len(os.listdir(self.dossier))}.dcm')
+        with open(chemin, 'wb') as fichier:
+            fichier.write(contenu)
+        return chemin
+
+    def test_little_endian_explicite_et_implicite(self):
+        for explicite in (True, False):
+            with self.subTest(explicite=explicite):
+                chemin = self.ecrire(fichier_dicom(self.volume, explicite))
+                entete = lire_entete(chemin)
+                self.assertEqual(entete['syntaxe_transfert'], EXPLICITE_LE if explicite else IMPLICITE_LE)
+                # 999 : valeur de la séquence de longueur indéfinie, sautée
+                self.assertEqual((entete['nb_coupes'], entete['lignes'], entete['colonnes']), ('2', 4, 6))
+                self.assertEqual(entete['taille_pixels'], self.volume.nbytes)
+                with Volume(chemin) as volume:
+                    self.assertEqual(len(volume), 2)
+                    self.assertEqual(volume.coupe(1).tolist(), (self.volume[1] * 2.0 - 1024).tolist())
+                    self.assertEqual(volume.coupe_8bits(0).shape, (4, 6))
+
+    def test_fichier_tronque(self):
+        contenu = fichier_dicom(self.volume)
+        with self.assertRaisesMessage(ErreurVolume, 'plus courtes'):
+            Volume(self.ecrire(contenu[:-10]))
+        # Coupé dans la séquence, puis dans un élément d'en-tête
+        debut_sequence = contenu.index(struct.pack('<HH', 0x0028, 0x3010))
+        for coupure in (debut_sequence + 14, 140):
+            with self.subTest(coupure=coupure), self.assertRaises(ErreurVolume) as erreur:
+                lire_entete(self.ecrire(contenu[:coupure]))
+            self.assertNotIsInstance(erreur.exception, PasDicom)
+
+    def test_syntaxe_compressee_refusee(self):
+        with self.assertRaisesMessage(ErreurVolume, 'non prise en charge'):
+            lire_entete(self.ecrire(fichier_dicom(self.volume, syntaxe='1.2.840.10008.1.2.4.50')))
+        # Pixels encapsulés (longueur indéfinie) même sous une syntaxe annoncée non compressée
+        contenu = fichier_dicom(self.volume)
+        pixels = contenu.index(struct.pack('<HH', 0x7FE0, 0x0010))
+        encapsules = contenu[:pixels] + struct.pack('<HH', 0x7FE0, 0x0010) + b'OB\0\0' + struct.pack('<I', LONGUEUR_INDEFINIE)
+        with self.assertRaisesMessage(ErreurVolume, 'encapsulés'):
+            lire_entete(self.ecrire(encapsules))
+
+    def test_pas_dicom(self):
+        with self.assertRaises(PasDicom):
+            lire_entete(self.ecrire(image_png(8, 8)))
+
+    def test_fermer_avec_une_coupe_referencee(self):
+        volume = Volume(self.ecrire(fichier_dicom(self.volume)), coupes_en_cache=1)
+        coupe = volume.coupe(0)
+        volume.fermer()
+        self.assertIsNone(volume.pixels)
+        # La coupe décodée est une copie : toujours lisible une fois la projection fermée
+        self.assertEqual(coupe.tolist(), (self.volume[0] * 2.0 - 1024).tolist())
@@ -1,153 +1,307 @@
-import io
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.views.decorators.http import require_GET, require_POST
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.utils import timezone
 from datetime import timedelta, date
-from django.http import FileResponse
-
-# Imports pour ReportLab
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
 from administration.models import Patient, ScannerCT, AnalyseIA
+from administration.recherche import filtre_recherche
+from core.concurrence import en_parallele
+from core.fragments import fragment
+from core.pagination import PaginateurCurseur
+from core.routeurs import lecture_replica
+from . import rapports
+from .compteurs import lire_compteurs
+from .export import exporter_zip, scans_a_exporter
+from .forms import FiltreExportForm
+from .statistiques import lire_periode, series
+from . import televersement as televersements
+from .models import TacheAnalyse, TeleversementDicom
+from .pipeline import soumettre_scans_en_attente
+from .taches import soumettre_analyse, statut_tache, taches_actives_par_scan
 
 # --- PERMISSIONS ---
 def est_radiologue(user):
     return user.is_authenticated and hasattr(user, 'service') and user.service == 'RADIO'
 
 # --- 1. LE DASHBOARD ---
+def _scans(query):
+    if query:
+        return ScannerCT.objects.filter(
+            filtre_recherche(query, 'patient_id', ('code',))
+        ).select_related('patient', 'resultat').order_by('-date_upload')
+    return ScannerCT.objects.select_related('patient', 'resultat').all().order_by('-date_upload')
+
+
+def _page_scans(query, curseur, total_approx=None):
+    # Pagination par curseur (date_upload, id_scan) : pas de COUNT(*) ni d'OFFSET
+    scans_pagines = PaginateurCurseur(_scans(query), ('date_upload', 'id_scan'), 10, total_approx).get_page(curseur)
+
+    # Badge "En cours" pour les scans de la page déjà en file d'attente
+    taches = taches_actives_par_scan([scan.pk for scan in scans_pagines])
+    for scan in scans_pagines:
+        scan.tache_active = taches.get(scan.pk)
+    return scans_pagines
+
+
+def _total_scans(stats):
+    return stats['non_analyses'] + stats['benins'] + stats['alertes']
+
+
+def _table_scans(query, curseur, total_approx=None):
+    """
+    Tableau paginé des scans (fragment en cache) : identique pour tous les radiologues, par recherche
+    et par page, jusqu'au prochain changement d'un scan, d'une analyse, d'un patient ou d'une tâche
+    """
+    return fragment(
+        'radiologie:scans', (ScannerCT, AnalyseIA, Patient, TacheAnalyse), (query, curseur),
+        lambda: render_to_string('partials/table_scans.html', {
+            'scans': _page_scans(query, curseur, total_approx), 'search_query': query,
+        }),
+    )
+
+
 @login_required
 @user_passes_test(est_radiologue)
+@lecture_replica
 def dashboard_radiologie(request):
     query = request.GET.get('search', '')
-    if query:
-        liste_scans = ScannerCT.objects.filter(
-            patient__code_anonyme__icontains=query
-        ).select_related('patient', 'resultat').order_by('-date_upload')
-    else:
-        liste_scans = ScannerCT.objects.select_related('patient', 'resultat').all().order_by('-date_upload')
-    
-    paginator = Paginator(liste_scans, 10)
-    page_number = request.GET.get('page')
-    scans_pagines = paginator.get_page(page_number)
-
-    aujourdhui = timezone.now().date()
-    tous_les_scans = ScannerCT.objects.all()
-    stats = {
-        'total_aujourdhui': tous_les_scans.filter(date_upload__date=aujourdhui).count(),
-        'non_analyses': tous_les_scans.filter(resultat__isnull=True).count(),
-        'benins': tous_les_scans.filter(resultat__score_malignite__lte=0.6).count(),
-        'alertes': tous_les_scans.filter(resultat__score_malignite__gt=0.6).count(),
-    }
     
+    # Compteurs maintenus par signaux (dont le cache IA) : une lecture au lieu de quatre COUNT(*)
+    stats = lire_compteurs()
+    table_scans = _table_scans(
+        query, request.GET.get('curseur'), None if query else (lambda: _total_scans(stats))
+    )
+
     return render(request, 'dashboards/radiologie.html', {
-        'scans': scans_pagines,
+        'table_scans': table_scans,
+        'stats': stats,
+        'search_query': query,
+        'form_export': FiltreExportForm(),
+    })
+
+
+@login_required
+@user_passes_test(est_radiologue)
+@lecture_replica
+async def dashboard_radiologie_async(request):
+    """Variante ASGI : compteurs et tableau des scans (cache ou base) lus en même temps"""
+    request.user = await request.auser()
+    query, curseur = request.GET.get('search', ''), request.GET.get('curseur')
+
+    # Total relu avec les compteurs en cas d'absence du fragment seulement (une requête de plus)
+    stats, table_scans = await en_parallele(lire_compteurs, lambda: _table_scans(
+        query, curseur, None if query else (lambda: _total_scans(lire_compteurs()))
+    ))
+
+    return await sync_to_async(render, thread_sensitive=False)(request, 'dashboards/radiologie.html', {
+        'table_scans': table_scans,
         'stats': stats,
         'search_query': query,
+        'form_export': FiltreExportForm(),
     })
 
 # --- 2. LA VUE ANALYTIQUE ---
+PERIODES_ANALYTIQUE = {
+    '7j': ("7 derniers jours", 7, False),
+    '90j': ("90 derniers jours", 90, False),
+    '12m': ("12 derniers mois", 12, True),
+}
+
+def _contexte_analytique(periode):
+    if periode not in PERIODES_ANALYTIQUE:
+        periode = '7j'
+    libelle, duree, par_mois = PERIODES_ANALYTIQUE[periode]
+
+    fin = timezone.localdate()
+    if par_mois:
+        # Du 1er du mois, (duree - 1) mois en arrière, jusqu'à aujourd'hui
+        mois = fin.year * 12 + fin.month - duree
+        debut = date(mois // 12, mois % 12 + 1, 1)
+    else:
+        debut = fin - timedelta(days=duree - 1)
+    donnees = series(lire_periode(debut, fin), debut, fin, par_mois)
+
+    return {
+        'jours_labels': donnees['labels'],
+        'donnees_scans': donnees['scans'],
+        'donnees_benins': donnees['benins'],
+        'donnees_alertes': donnees['alertes'],
+        'moteurs_labels': list(donnees['par_moteur'].keys()),
+        'donnees_moteurs': list(donnees['par_moteur'].values()),
+        'periode': periode,
+        'periode_libelle': libelle,
+        'periodes': [(cle, valeur[0]) for cle, valeur in PERIODES_ANALYTIQUE.items()],
+    }
+
+
 @login_required
 @user_passes_test(est_radiologue)
+@lecture_replica
 def analytique_radiologie(request):
-    aujourdhui = timezone.now().date()
-    jours_labels = []
-    donnees_scans = []
-    
-    for i in range(6, -1, -1):
-        date_cible = aujourdhui - timedelta(days=i)
-        jours_labels.append(date_cible.strftime('%d/%m'))
-        count = ScannerCT.objects.filter(date_upload__date=date_cible).count()
-        donnees_scans.append(count)
-    
-    return render(request, 'dashboards/analytics.html', {
-        'jours_labels': jours_labels,
-        'donnees_scans': donnees_scans,
-    })
+    """Tendances servies par l'agrégat journalier : une requête par plage, quelle que soit sa taille"""
+    return render(request, 'dashboards/analytics.html', _contexte_analytique(request.GET.get('periode', '7j')))
+
+
+@login_required
+@user_passes_test(est_radiologue)
+@lecture_replica
+async def analytique_radiologie_async(request):
+    """Variante ASGI : l'unique requête (agrégat journalier) et les séries sont calculées hors de la boucle"""
+    request.user = await request.auser()
+    periode = request.GET.get('periode', '7j')
+    contexte, = await en_parallele(lambda: _contexte_analytique(periode))
+    return await sync_to_async(render, thread_sensitive=False)(request, 'dashboards/analytics.html', contexte)
 
 # --- 3. ACTION : LANCER L'IA ---
 @login_required
 @user_passes_test(est_radiologue)
+@require_POST
 def lancer_analyse(request, scan_id):
-    scan = get_object_or_404(ScannerCT, pk=scan_id)
-    analyse, created = AnalyseIA.objects.get_or_create(scan=scan)
-    analyse.simuler_ia()
-    
-    if analyse.score_malignite > 0.8:
-        messages.error(request, f"ALERTE CRITIQUE : Scan {scan.patient.code_anonyme} (Score: {analyse.score_malignite})")
-    else:
-        messages.success(request, f"Analyse terminée pour {scan.patient.code_anonyme}")
+    """Met l'analyse en file d'attente ; l'inférence est exécutée par les workers (worker_ia)"""
+    scan = get_object_or_404(ScannerCT.objects.select_related('patient'), pk=scan_id)
+    tache = soumettre_analyse(scan, request.user)
 
+    if 'application/json' in request.headers.get('Accept', ''):
+        return JsonResponse(statut_tache(tache), status=202)
+
+    messages.info(request, f"Analyse mise en file d'attente pour {scan.patient.code_anonyme}")
+    return redirect('dashboard_radiologie')
+
+@login_required
+@user_passes_test(est_radiologue)
+def statut_analyse(request, tache_id):
+    """Point de polling du dashboard : état d'une tâche d'analyse"""
+    tache = get_object_or_404(TacheAnalyse, pk=tache_id)
+    return JsonResponse(statut_tache(tache))
+
+@login_required
+@user_passes_test(est_radiologue)
+@require_POST
+def analyser_tout(request):
+    """Met en file d'attente tous les scans non analysés ; les workers les traitent par lots"""
+    total = soumettre_scans_en_attente(request.user)
+    if total:
+        messages.info(request, f"{total} scan(s) mis en file d'attente pour analyse")
+    else:
+        messages.info(request, "Aucun nouveau scan à analyser")
     return redirect('dashboard_radiologie')
 
 # --- 4. ACTION : GÉNÉRER RAPPORT PDF ---
 @login_required
 @user_passes_test(est_radiologue)
 def generer_rapport_pdf(request, scan_id):
-    scan = get_object_or_404(ScannerCT, pk=scan_id)
+    """Rapport servi depuis le stockage (pré-rendu par le worker) ; 304 si le client l'a déjà"""
+    scan = get_object_or_404(ScannerCT.objects.select_related('patient', 'resultat'), pk=scan_id)
     
     if not hasattr(scan, 'resultat'):
         messages.error(request, "Veuillez d'abord effectuer l'analyse IA.")
         return redirect('dashboard_radiologie')
 
-    # Calcul de l'âge à partir de date_naissance
-    aujourdhui = date.today()
-    naissance = scan.patient.date_naissance
-    age = aujourdhui.year - naissance.year - ((aujourdhui.month, aujourdhui.day) < (naissance.month, naissance.day))
-
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    largeur, hauteur = A4
-
-    # En-tête
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(50, hauteur - 50, "PULMOCARE - RAPPORT D'ANALYSE IA")
-    p.setFont("Helvetica", 10)
-    p.drawString(50, hauteur - 65, f"Date du rapport : {timezone.now().strftime('%d/%m/%Y %H:%M')}")
-    p.line(50, hauteur - 75, 550, hauteur - 75)
-
-    # Section Patient
-    p.setFont("Helvetica-Bold", 13)
-    p.drawString(50, hauteur - 110, "IDENTITÉ DU PATIENT")
-    p.setFont("Helvetica", 11)
-    p.drawString(60, hauteur - 130, f"Nom complet : {scan.patient.nom_complet}")
-    p.drawString(60, hauteur - 150, f"ID Anonyme : {scan.patient.code_anonyme}")
-    # Correction Sexe & Age basés sur votre modèle
-    p.drawString(60, hauteur - 170, f"Genre : {scan.patient.get_genre_display()}")
-    p.drawString(60, hauteur - 190, f"Âge : {age} ans")
-
-    # Section IA
-    p.setFont("Helvetica-Bold", 13)
-    p.drawString(50, hauteur - 230, "RÉSULTATS DE L'ALGORITHME IA")
-    
-    score = scan.resultat.score_malignite
-    p.setFont("Helvetica-Bold", 14)
-    
-    if score > 0.6:
-        p.setFillColor(colors.red)
-        conclusion = "ALERTE : HAUTE PROBABILITÉ DE MALIGNITÉ"
+    fichier, cle, modification = rapports.ouvrir_rapport(scan)
+    etag = quote_etag(cle)
+    derniere_modification = int(modification)
+    reponse = get_conditional_response(request, etag=etag, last_modified=derniere_modification)
+    if reponse is None:
+        reponse = FileResponse(fichier, as_attachment=True, filename=f"Rapport_{scan.patient.code_anonyme}.pdf")
     else:
-        p.setFillColor(colors.green)
-        conclusion = "STABLE : FAIBLE PROBABILITÉ DE MALIGNITÉ"
-
-    p.drawString(60, hauteur - 260, f"Score de malignité : {score * 100}%")
-    p.drawString(60, hauteur - 285, f"Conclusion IA : {conclusion}")
-
-    # Détails techniques (issus du JSONField de votre modèle)
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica", 11)
-    details = scan.resultat.details_nodules or {}
-    p.drawString(60, hauteur - 320, f"Nodules détectés : {details.get('nodules_detectes', 'N/A')}")
-    p.drawString(60, hauteur - 340, f"Zone critique : {details.get('zone_critique', 'N/A')}")
-
-    # Pied de page
-    p.setFont("Helvetica-Oblique", 8)
-    p.drawString(50, 40, "Ce document est une aide au diagnostic. La signature du radiologue est requise pour validation.")
-
-    p.showPage()
-    p.save()
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f"Rapport_{scan.patient.code_anonyme}.pdf")
\ No newline at end of file
+        fichier.close()
+    reponse['ETag'] = etag
+    reponse['Last-Modified'] = http_date(derniere_modification)
+    reponse['Cache-Control'] = 'private, no-cache'
+    return reponse
+
+
+# --- 5. EXPORT GROUPÉ DES RAPPORTS (ZIP) ---
+@login_required
+@user_passes_test(est_radiologue)
+def exporter_rapports(request):
+    """Archive ZIP des rapports filtrés, produite en flux : mémoire constante quel que soit le volume"""
+    form = FiltreExportForm(request.GET)
+    if not form.is_valid():
+        messages.error(request, "Filtre d'export invalide : " + " ".join(
+            erreur for erreurs in form.errors.values() for erreur in erreurs
+        ))
+        return redirect('dashboard_radiologie')
+
+    reponse = StreamingHttpResponse(exporter_zip(scans_a_exporter(**form.cleaned_data)), content_type='application/zip')
+    reponse['Content-Disposition'] = f'attachment; filename="rapports_{timezone.localdate():%Y%m%d}.zip"'
+    return reponse
+
+
+# --- 6. TÉLÉVERSEMENT DICOM PAR MORCEAUX (API JSON) ---
+def _erreur_televersement(erreur, televersement=None):
+    donnees = {'erreur': str(erreur)}
+    if televersement is not None:
+        televersement.refresh_from_db()
+        donnees.update(televersements.etat(televersement))
+    return JsonResponse(donnees, status=erreur.statut)
+
+def _televersement_de(request, televersement_id):
+    """Un téléversement n'est repris, complété ou finalisé que par le radiologue qui l'a ouvert"""
+    return get_object_or_404(TeleversementDicom, pk=televersement_id, cree_par=request.user)
+
+@login_required
+@user_passes_test(est_radiologue)
+@require_POST
+def creer_televersement(request):
+    """Ouvre un téléversement : {patient (code anonyme), nom_fichier, taille, sha256 (facultatif)}"""
+    try:
+        donnees = json.loads(request.body or b'{}')
+        taille = int(donnees.get('taille', 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'erreur': "Corps JSON invalide"}, status=400)
+    patient = Patient.objects.filter(code_anonyme=donnees.get('patient', '')).first()
+    if patient is None:
+        return JsonResponse({'erreur': "Patient inconnu"}, status=404)
+    try:
+        televersement = televersements.creer(
+            patient, donnees.get('nom_fichier', ''), taille, donnees.get('sha256', ''), request.user
+        )
+    except televersements.ErreurTeleversement as erreur:
+        return _erreur_televersement(erreur)
+    return JsonResponse(televersements.etat(televersement), status=201)
+
+@login_required
+@user_passes_test(est_radiologue)
+@require_GET
+def etat_televersement(request, televersement_id):
+    """Point de reprise après une coupure : nombre d'octets déjà reçus"""
+    televersement = _televersement_de(request, televersement_id)
+    return JsonResponse(televersements.etat(televersement))
+
+@login_required
+@user_passes_test(est_radiologue)
+@require_POST
+def envoyer_morceau(request, televersement_id):
+    """Corps brut = octets du morceau, écrits en flux à partir de ?decalage= (égal à `recu`)"""
+    televersement = _televersement_de(request, televersement_id)
+    try:
+        decalage = int(request.GET.get('decalage', -1))
+        longueur = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'erreur': "Décalage ou longueur invalide"}, status=400)
+    try:
+        televersements.ecrire_morceau(televersement, decalage, request, longueur)
+    except televersements.ErreurTeleversement as erreur:
+        return _erreur_televersement(erreur, televersement)
+    return JsonResponse(televersements.etat(televersement))
+
+@login_required
+@user_passes_test(est_radiologue)
+@require_POST
+def finaliser_televersement(request, televersement_id):
+    """Vérifie taille et SHA-256 (?sha256= ou celui annoncé à l'ouverture) puis crée le scan"""
+    televersement = _televersement_de(request, televersement_id)
+    try:
+        televersements.finaliser(televersement, request.GET.get('sha256', ''))
+    except televersements.ErreurTeleversement as erreur:
+        return _erreur_televersement(erreur, televersement)
+    return JsonResponse(televersements.etat(televersement), status=201)
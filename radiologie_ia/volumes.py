@@ -0,0 +1,254 @@
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import default_storage
+
+try:
+    import numpy as np
+except ImportError:  # Lecture DICOM indisponible : les appelants retombent sur leur chemin historique
+    np = None
+
+# Coupes décodées (float32, unités Hounsfield) conservées par volume ouvert
+COUPES_EN_CACHE = getattr(settings, 'PULMOCARE_VOLUMES_COUPES_CACHE', 8)
+
+# Syntaxes de transfert non compressées, little endian : les pixels sont lisibles tels quels sur le disque
+IMPLICITE_LE = '1.2.840.10008.1.2'
+EXPLICITE_LE = '1.2.840.10008.1.2.1'
+# VR explicites dont la longueur est codée sur 4 octets (précédés de 2 octets réservés)
+VR_LONGS = {b'OB', b'OD', b'OF', b'OL', b'OV', b'OW', b'SQ', b'SV', b'UC', b'UN', b'UR', b'UT', b'UV'}
+LONGUEUR_INDEFINIE = 0xFFFFFFFF
+
+FIN_ITEM, FIN_SEQUENCE = (0xFFFE, 0xE00D), (0xFFFE, 0xE0DD)
+PIXELS = (0x7FE0, 0x0010)
+# Éléments d'en-tête retenus : (groupe, élément) -> nom
+ATTRIBUTS = {
+    (0x0002, 0x0010): 'syntaxe_transfert',
+    (0x0028, 0x0002): 'echantillons',
+    (0x0028, 0x0004): 'photometrie',
+    (0x0028, 0x0008): 'nb_coupes',
+    (0x0028, 0x0010): 'lignes',
+    (0x0028, 0x0011): 'colonnes',
+    (0x0028, 0x0100): 'bits_alloues',
+    (0x0028, 0x0103): 'signe',
+    (0x0028, 0x1050): 'centre_fenetre',
+    (0x0028, 0x1051): 'largeur_fenetre',
+    (0x0028, 0x1052): 'ordonnee',
+    (0x0028, 0x1053): 'pente',
+}
+# Attributs de VR US (entier binaire sur 2 octets) ; les autres sont textuels (IS, DS, CS, UI)
+ENTIERS = {'echantillons', 'lignes', 'colonnes', 'bits_alloues', 'signe'}
+
+
+class ErreurVolume(ValueError):
+    """Fichier DICOM illisible par ce lecteur (compressé, big endian, tronqué...)"""
+
+
+class PasDicom(ErreurVolume):
+    """Pas un fichier DICOM sur disque (PNG, JPEG, octets bruts) : l'appelant choisit un autre décodeur"""
+
+
+# --- 1. EN-TÊTE ---
+def _valeur(nom, brut):
+    """US ou texte ; les valeurs multiples 'a\\b' gardent la première"""
+    if nom in ENTIERS:
+        if len(brut) < 2:
+            raise ErreurVolume(f"Attribut {nom} invalide")
+        return struct.unpack('<H', brut[:2])[0]
+    return brut.rstrip(b'\x00 ').decode('ascii', 'replace').split('\\')[0].strip()
+
+
+class _Lecteur:
+    """Parcours des éléments d'en-tête sans lire les valeurs inutiles (seek) jusqu'aux pixels"""
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+
+    def _lire(self, n):
+        donnees = self.fichier.read(n)
+        if len(donnees) != n:
+            raise ErreurVolume("Fichier DICOM tronqué")
+        return donnees
+
+    def element(self, explicite):
+        """(étiquette, VR, longueur) de l'élément suivant, ou None en fin de fichier"""
+        debut = self.fichier.read(4)
+        if not debut:
+            return None
+        if len(debut) != 4:
+            raise ErreurVolume("Fichier DICOM tronqué")
+        groupe, numero = struct.unpack('<HH', debut)
+        etiquette = (groupe, numero)
+        # Délimiteurs d'items et de séquences : jamais de VR, même en syntaxe explicite
+        if not explicite or groupe == 0xFFFE:
+            return etiquette, None, struct.unpack('<I', self._lire(4))[0]
+        vr = self._lire(2)
+        if vr in VR_LONGS:
+            self._lire(2)
+            return etiquette, vr, struct.unpack('<I', self._lire(4))[0]
+        return etiquette, vr, struct.unpack('<H', self._lire(2))[0]
+
+    def sauter_indefini(self, explicite):
+        """Saute une séquence (ou un item) de longueur indéfinie, imbrications comprises"""
+        while True:
+            element = self.element(explicite)
+            if element is None:
+                raise ErreurVolume("Séquence DICOM non terminée")
+            etiquette, _, longueur = element
+            if etiquette in (FIN_SEQUENCE, FIN_ITEM):
+                return
+            if longueur == LONGUEUR_INDEFINIE:
+                self.sauter_indefini(explicite)
+            else:
+                self.fichier.seek(longueur, 1)
+
+    def parcourir(self, explicite, entete):
+        """Remplit `entete` jusqu'aux pixels ; renvoie (position, longueur) des données de pixels"""
+        while True:
+            element = self.element(explicite)
+            if element is None:
+                raise ErreurVolume("Aucune donnée de pixels")
+            etiquette, _, longueur = element
+            if etiquette == PIXELS:
+                if longueur == LONGUEUR_INDEFINIE:
+                    raise ErreurVolume("Pixels encapsulés (compressés) non pris en charge")
+                return self.fichier.tell(), longueur
+            if longueur == LONGUEUR_INDEFINIE:
+                self.sauter_indefini(explicite)
+            elif etiquette in ATTRIBUTS:
+                entete[ATTRIBUTS[etiquette]] = _valeur(ATTRIBUTS[etiquette], self._lire(longueur))
+            else:
+                self.fichier.seek(longueur, 1)
+
+
+def lire_entete(chemin):
+    """
+    En-tête utile d'un fichier DICOM Part 10 et position des pixels, sans lire les pixels.
+    Seules les syntaxes non compressées little endian (implicite, explicite) sont acceptées.
+    """
+    with open(chemin, 'rb') as fichier:
+        preambule = fichier.read(132)
+        if len(preambule) < 132 or preambule[128:] != b'DICM':
+            raise PasDicom("Préambule DICM absent")
+        lecteur, entete = _Lecteur(fichier), {}
+
+        # Méta-informations (groupe 0002) : toujours en VR explicite little endian
+        while True:
+            position = fichier.tell()
+            element = lecteur.element(True)
+            if element is None:
+                raise ErreurVolume("Aucune donnée de pixels")
+            etiquette, _, longueur = element
+            if etiquette[0] != 0x0002:
+                fichier.seek(position)
+                break
+            if etiquette in ATTRIBUTS:
+                entete[ATTRIBUTS[etiquette]] = _valeur(ATTRIBUTS[etiquette], lecteur._lire(longueur))
+            else:
+                fichier.seek(longueur, 1)
+
+        syntaxe = entete.get('syntaxe_transfert', IMPLICITE_LE)
+        if syntaxe not in (IMPLICITE_LE, EXPLICITE_LE):
+            raise ErreurVolume(f"Syntaxe de transfert {syntaxe} non prise en charge")
+        entete['position_pixels'], entete['taille_pixels'] = lecteur.parcourir(syntaxe == EXPLICITE_LE, entete)
+    return entete
+
+
+# --- 2. VOLUME ---
+class Volume:
+    """
+    Pixels d'un fichier DICOM projetés en mémoire (numpy.memmap) : seules les coupes lues
+    sont chargées, par le cache de pages du système et non par le processus. Les dernières
+    coupes décodées sont gardées dans un petit LRU.
+    """
+
+    def __init__(self, chemin, coupes_en_cache=COUPES_EN_CACHE):
+        entete = lire_entete(chemin)
+        if np is None:
+            raise ImproperlyConfigured("La lecture des volumes DICOM nécessite le paquet 'numpy'.")
+        self.entete = entete
+        self.lignes, self.colonnes = int(entete.get('lignes', 0)), int(entete.get('colonnes', 0))
+        self.nb_coupes = int(entete.get('nb_coupes') or 1)
+        echantillons = int(entete.get('echantillons', 1))
+        bits = int(entete.get('bits_alloues', 16))
+        if echantillons != 1 or bits not in (8, 16) or not (self.lignes and self.colonnes):
+            raise ErreurVolume(f"Pixels non pris en charge ({echantillons} échantillon(s), {bits} bits)")
+
+        type_pixel = np.dtype(f"<{'i' if int(entete.get('signe', 0)) else 'u'}{bits // 8}")
+        attendu = self.nb_coupes * self.lignes * self.colonnes * type_pixel.itemsize
+        if min(entete['taille_pixels'], os.path.getsize(chemin) - entete['position_pixels']) < attendu:
+            raise ErreurVolume("Données de pixels plus courtes que les dimensions annoncées")
+        self.pixels = np.memmap(
+            chemin, dtype=type_pixel, mode='r', offset=entete['position_pixels'],
+            shape=(self.nb_coupes, self.lignes, self.colonnes),
+        )
+        # Accès par coupes éparses : pas de lecture anticipée des coupes voisines
+        if hasattr(mmap, 'MADV_RANDOM'):
+            self.pixels._mmap.madvise(mmap.MADV_RANDOM)
+        self.pente = float(entete.get('pente') or 1)
+        self.ordonnee = float(entete.get('ordonnee') or 0)
+        self.coupes_en_cache = coupes_en_cache
+        self._coupes = OrderedDict()
+        self._verrou = threading.Lock()
+
+    @classmethod
+    def du_scan(cls, scan, **kwargs):
+        if not scan.image_dicom._committed:
+            # Fichier encore en mémoire (scan non enregistré) : rien à projeter
+            raise PasDicom("Fichier non enregistré sur le disque")
+        return cls(default_storage.path(scan.image_dicom.name), **kwargs)
+
+    def __len__(self):
+        return self.nb_coupes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+
+    def fermer(self):
+        """Libère la projection : les pages lues retournent au cache du système"""
+        with self._verrou:
+            self._coupes.clear()
+        projection = getattr(self.pixels, '_mmap', None)
+        self.pixels = None
+        if projection is not None:
+            projection.close()
+
+    def coupe(self, indice):
+        """Coupe `indice` en float32 (unités Hounsfield après rescale), décodée au premier accès"""
+        with self._verrou:
+            if indice in self._coupes:
+                self._coupes.move_to_end(indice)
+                return self._coupes[indice]
+        valeurs = self.pixels[indice].astype(np.float32)
+        if self.pente != 1 or self.ordonnee:
+            valeurs = valeurs * self.pente + self.ordonnee
+        with self._verrou:
+            self._coupes[indice] = valeurs
+            while len(self._coupes) > self.coupes_en_cache:
+                self._coupes.popitem(last=False)
+        return valeurs
+
+    def fenetre(self, valeurs):
+        """(minimum, maximum) d'affichage : fenêtre DICOM si présente, sinon percentiles 1-99 de la coupe"""
+        centre, largeur = self.entete.get('centre_fenetre'), self.entete.get('largeur_fenetre')
+        try:
+            centre, largeur = float(centre), float(largeur)
+        except (TypeError, ValueError):
+            return tuple(np.percentile(valeurs[::4, ::4], (1, 99)))
+        return centre - largeur / 2, centre + largeur / 2
+
+    def coupe_8bits(self, indice):
+        """Coupe fenêtrée en uint8 (aperçus) ; MONOCHROME1 est inversé pour un affichage habituel"""
+        valeurs = self.coupe(indice)
+        bas, haut = self.fenetre(valeurs)
+        image = np.clip((valeurs - bas) * (255.0 / max(haut - bas, 1e-6)), 0, 255).astype(np.uint8)
+        if self.entete.get('photometrie') == 'MONOCHROME1':
+            image = 255 - image
+        return image